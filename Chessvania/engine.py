@@ -0,0 +1,380 @@
+# engine.py
+
+# Built-in Chessvania engine: negamax alpha-beta over the real Board/Piece rules, so it
+# understands upgraded pawns and knights, ability cooldowns and invulnerability.
+# Iterative deepening, a bounded transposition table, quiescence search and
+# killer/history move ordering.
+
+import time
+
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE + 1
+
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]  # Indexed by piece kind
+TIER_BONUS = [15, 25, 0, 0, 0, 0]  # Per upgrade tier, indexed by piece kind
+
+# Piece-square tables from white's point of view, indexed by square (row * 8 + col, a8 first)
+PAWN_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+     5,  5, 10, 25, 25, 10,  5,  5,
+     0,  0,  0, 20, 20,  0,  0,  0,
+     5, -5,-10,  0,  0,-10, -5,  5,
+     5, 10, 10,-20,-20, 10, 10,  5,
+     0,  0,  0,  0,  0,  0,  0,  0,
+]
+KNIGHT_TABLE = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50,
+]
+BISHOP_TABLE = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20,
+]
+ROOK_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+     5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+     0,  0,  0,  5,  5,  0,  0,  0,
+]
+QUEEN_TABLE = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+     -5,  0,  5,  5,  5,  5,  0, -5,
+      0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20,
+]
+KING_TABLE = [
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+     20, 20,  0,  0,  0,  0, 20, 20,
+     20, 30, 10,  0,  0, 10, 30, 20,
+]
+PIECE_TABLES = [PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+
+# Transposition table entry bounds
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+MAX_PLY = 64
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out.
+    """
+    pass
+
+# ---
+
+def evaluate(board):
+    """
+    Static evaluation in centipawns from the side to move's point of view:
+    material, upgrade tiers and piece-square tables.
+    """
+    score = 0
+    for color, sign in (("white", 1), ("black", -1)):
+        mask = board.color_bb[color]
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            sq = low.bit_length() - 1
+            piece = board.squares[sq]
+            kind = piece.kind
+            table_sq = sq if color == "white" else sq ^ 56  # Mirror the rows for black
+            score += sign * (PIECE_VALUES[kind] + TIER_BONUS[kind] * piece.tier + PIECE_TABLES[kind][table_sq])
+    return score if board.current_turn == "white" else -score
+
+def score_to_tt(score, ply):
+    """
+    Store mate scores relative to the node rather than the root, so they stay valid
+    when the position is reached at a different ply.
+    """
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+# ---
+
+class TranspositionTable:
+    """
+    Fixed-size table indexed by the low bits of the Zobrist key. Each slot keeps one
+    (key, depth, score, bound, move, generation) entry and is replaced when the new
+    result is at least as deep or the stored one is from an earlier search.
+    """
+    def __init__(self, size_bits=18):
+        self.mask = (1 << size_bits) - 1
+        self.entries = [None] * (1 << size_bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1] or entry[0] == key:
+            self.entries[index] = (key, depth, score, bound, move, self.generation)
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+# ---
+
+class Engine:
+    """
+    Alpha-beta searcher that keeps its transposition table and ordering
+    heuristics between calls, so consecutive moves in a game reuse earlier work.
+    """
+    def __init__(self, tt_bits=18, tablebases=None):
+        self.tt = TranspositionTable(tt_bits)
+        self.tablebases = tablebases  # tablebase.Tablebases consulted before searching, if any
+        self.history = {}  # (from_pos, to_pos) -> score, bumped on beta cutoffs
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.nodes = 0
+        self.deadline = None
+        self.last_score = 0  # Score and depth of the last completed iteration
+        self.last_depth = 0
+
+    def best_move(self, board, time_ms=None, depth=None):
+        """
+        Search the position and return the best (from_pos, to_pos) move, or None if
+        there is no legal move. A book move (Board.book_move) or a tablebase move is played
+        without searching; otherwise the search stops at `depth` plies or after `time_ms` milliseconds
+        (default one second), whichever comes first.
+        """
+        moves = list(board.legal_moves())
+        if not moves:
+            return None
+        if len(moves) == 1:
+            return moves[0]
+        move = board.book_move()
+        if move is None and self.tablebases is not None:
+            move = self.tablebases.best_move(board)
+        if move is not None:
+            return move
+
+        if time_ms is None and depth is None:
+            time_ms = 1000
+        self.deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+        max_depth = depth or MAX_PLY - 1
+        self.tt.new_search()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {move: score // 8 for move, score in self.history.items() if score >= 8}  # Age old history
+        self.nodes = 0
+
+        best = moves[0]
+        self.last_score = 0
+        self.last_depth = 0
+        for current_depth in range(1, max_depth + 1):
+            try:
+                score, move = self.search_root(board, current_depth, moves)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best = move
+                self.last_score = score
+                self.last_depth = current_depth
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break  # Found a forced mate; searching deeper won't change the move
+        return best
+
+    def search_root(self, board, depth, moves):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        entry = self.tt.probe(board.zobrist_key)
+        for move in self.order_moves(board, moves, entry[4] if entry else None, 0):
+            undo = board.make_move(move)
+            try:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.unmake_move(undo)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.tt.store(board.zobrist_key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        # A repeated position can be repeated again, so inside the tree once is already a draw
+        if board.is_repetition(2) or board.is_fifty_move_draw():
+            return 0
+
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        key = board.zobrist_key
+        original_alpha = alpha
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, bound = score_from_tt(entry[2], ply), entry[3]
+                if bound == EXACT:
+                    return score
+                if bound == LOWER_BOUND and score >= beta:
+                    return score
+                if bound == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = list(board.legal_moves())
+        if not moves:
+            return -MATE_SCORE + ply if board.is_check() else 0
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(board, moves, tt_move, ply):
+            is_capture = move[0] != move[1] and board.squares[move[1][0] * 8 + move[1][1]] is not None
+            undo = board.make_move(move)
+            try:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move(undo)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not is_capture:
+                    self.record_cutoff(move, depth, ply)
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, score_to_tt(best_score, ply), bound, best_move)
+        return best_score
+
+    def quiescence(self, board, alpha, beta, ply):
+        """
+        Search captures only until the position is quiet, so the static evaluation
+        isn't taken in the middle of an exchange.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if ply >= MAX_PLY - 1:
+            return stand_pat
+
+        captures = []
+        for move in board.legal_moves():
+            from_pos, to_pos = move
+            victim = board.squares[to_pos[0] * 8 + to_pos[1]]
+            if victim is not None and from_pos != to_pos:
+                attacker = board.squares[from_pos[0] * 8 + from_pos[1]]
+                captures.append((PIECE_VALUES[victim.kind] * 10 - PIECE_VALUES[attacker.kind], move))
+        captures.sort(key=lambda item: item[0], reverse=True)
+
+        for _, move in captures:
+            undo = board.make_move(move)
+            try:
+                score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move(undo)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def order_moves(self, board, moves, tt_move, ply):
+        """
+        Order moves: transposition-table move, captures by MVV-LVA, killers, then history.
+        """
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = 1 << 30
+            else:
+                from_pos, to_pos = move
+                victim = board.squares[to_pos[0] * 8 + to_pos[1]]
+                if victim is not None and from_pos != to_pos:
+                    attacker = board.squares[from_pos[0] * 8 + from_pos[1]]
+                    score = (1 << 20) + PIECE_VALUES[victim.kind] * 10 - PIECE_VALUES[attacker.kind]
+                elif move == killers[0]:
+                    score = (1 << 19) + 1
+                elif move == killers[1]:
+                    score = 1 << 19
+                else:
+                    score = self.history.get(move, 0)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, move, depth, ply):
+        """
+        Remember a quiet move that caused a beta cutoff as a killer and in the history table.
+        """
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+# ---
+
+_default_engine = None
+
+def best_move(board, time_ms=None, depth=None):
+    """
+    Convenience wrapper around a shared Engine instance (see Engine.best_move).
+    """
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = Engine()
+    return _default_engine.best_move(board, time_ms=time_ms, depth=depth)
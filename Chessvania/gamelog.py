@@ -0,0 +1,466 @@
+# gamelog.py
+
+# Compact binary game log (.cvgl) with a streaming writer, a generator reader and extended
+# PGN import/export.
+#
+# File layout: MAGIC, then one record per game: a varint body length followed by the body.
+#   body    result byte, reason byte, varint-length FEN (empty for the standard start),
+#           varint tag count and varint-length UTF-8 key/value pairs, then the event stream
+#   events  16-bit little-endian words: bits 0-5 and 6-11 are two 6-bit fields, bits 12-15
+#           the event kind
+#     MOVE        from square, to square (the same square for a manual ability activation)
+#     UPGRADE     square, tier (1-5) -- replayed through Piece.upgrade() with the board
+#     CHECKPOINT  timer count n; followed by the 8-byte Zobrist key and n (square, cooldown,
+#                 invulnerability) varint triples for every running timer
+#
+# A game is buffered by GameRecorder while it is played and appended in one write when it
+# ends, so a log never holds half a game in the middle; an interrupted final write is
+# skipped by the reader. read_games() walks a memory-mapped file and only decodes a game's
+# header up front, so scanning results over millions of games never touches their moves.
+#
+# Extended PGN uses coordinate moves ("e2e4", "b1b1" for a manual activation) and records
+# upgrades as {[%upgrade e2 legendary]} commands in the move text.
+#
+# Usage:
+#   python gamelog.py summary games.cvgl [--verify]
+#   python gamelog.py export games.cvgl games.pgn
+#   python gamelog.py import games.pgn games.cvgl
+
+import argparse
+import mmap
+import os
+import re
+
+from attacks import SQUARE_POSITIONS
+from board import Board
+from piece import UPGRADE_ORDER
+
+MAGIC = b"CVGL\x01"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1"
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+REASONS = ("", "checkmate", "stalemate", "max_plies", "quit", "tablebase", "repetition", "fifty_moves")
+CHECKPOINT_EVERY = 16  # Plies between cooldown/hash checkpoints
+
+MOVE, UPGRADE, CHECKPOINT = "move", "upgrade", "checkpoint"
+EVENT_KINDS = (MOVE, UPGRADE, CHECKPOINT)  # Index = the kind stored in bits 12-15
+
+class TruncatedError(ValueError):
+    """
+    The data ended in the middle of a varint.
+    """
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise TruncatedError("Varint runs past the end of the data")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def _write_string(out, text):
+    encoded = text.encode("utf-8")
+    _write_varint(out, len(encoded))
+    out += encoded
+
+def _read_string(data, offset):
+    length, offset = _read_varint(data, offset)
+    return bytes(data[offset:offset + length]).decode("utf-8"), offset + length
+
+def game_result(board):
+    """
+    (result, reason) for the position: decided by checkmate, stalemate, threefold repetition
+    or the fifty-move rule, else ("*", "").
+    """
+    if next(board.legal_moves(), None) is not None:
+        if board.is_repetition(3):
+            return "1/2-1/2", "repetition"
+        if board.is_fifty_move_draw():
+            return "1/2-1/2", "fifty_moves"
+        return "*", ""
+    if board.is_check():
+        return ("0-1" if board.current_turn == "white" else "1-0"), "checkmate"
+    return "1/2-1/2", "stalemate"
+
+def checkpoint_state(board):
+    """
+    (Zobrist key, ((square, cooldown, invulnerability), ...)) for every piece with a running timer.
+    """
+    timers = []
+    for piece in board.timed_pieces:
+        timed_ability = piece.timed_ability
+        cooldown = piece.cooldown_remaining(timed_ability, board) if timed_ability is not None else 0
+        timers.append((piece.square(), max(cooldown, 0), max(piece.invulnerable_remaining(board), 0)))
+    return board.zobrist_key, tuple(sorted(timers))
+
+# ---
+
+class GameRecord:
+    """
+    One decoded game: starting FEN (None for the standard start), tags, result and events.
+    Events are (MOVE, from_sq, to_sq), (UPGRADE, sq, tier) or (CHECKPOINT, key, timers),
+    decoded from the binary body on first access.
+    """
+    def __init__(self, fen=None, tags=None, result="*", reason="", events=None):
+        self.fen = fen
+        self.tags = dict(tags or {})
+        self.result = result
+        self.reason = reason
+        self._events = events if events is not None else []
+        self._data = None  # Undecoded event stream, when read from a log
+        self._offset = 0
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Parse a game body, leaving its events undecoded until needed.
+        """
+        record = cls(result=RESULTS[data[0]], reason=REASONS[data[1]])
+        fen, offset = _read_string(data, 2)
+        record.fen = fen or None
+        count, offset = _read_varint(data, offset)
+        for _ in range(count):
+            key, offset = _read_string(data, offset)
+            record.tags[key], offset = _read_string(data, offset)
+        record._events = None
+        record._data = data
+        record._offset = offset
+        return record
+
+    @property
+    def events(self):
+        if self._events is None:
+            self._events = decode_events(self._data, self._offset)
+            self._data = None
+        return self._events
+
+    @property
+    def moves(self):
+        """
+        The moves as ((row, col), (row, col)) tuples, in order.
+        """
+        return [(SQUARE_POSITIONS[a], SQUARE_POSITIONS[b]) for kind, a, b in self.events if kind == MOVE]
+
+    def start_board(self):
+        return Board(self.fen or START_FEN)
+
+    def replay(self, validate=False):
+        """
+        Generator of (event, board) after applying each event to a fresh board.
+        Checkpoints are compared with the replayed position and raise ValueError on a mismatch;
+        with validate=True every move is also checked against legal_moves().
+        """
+        board = self.start_board()
+        for event in self.events:
+            kind, a, b = event
+            if kind == MOVE:
+                move = (SQUARE_POSITIONS[a], SQUARE_POSITIONS[b])
+                if validate and move not in set(board.legal_moves()):
+                    raise ValueError(f"Illegal move {board.pos_to_notation(move[0])}{board.pos_to_notation(move[1])} in {board.fen()}")
+                board.make_move(move)
+            elif kind == UPGRADE:
+                piece = board.squares[a]
+                if piece is None:
+                    raise ValueError(f"Upgrade of an empty square {board.pos_to_notation(SQUARE_POSITIONS[a])}")
+                piece.upgrade(UPGRADE_ORDER[b - 1], board, announce=False)
+            elif (a, b) != checkpoint_state(board):
+                raise ValueError(f"Checkpoint mismatch at {board.fen()}")
+            yield event, board
+
+    def end_board(self):
+        board = None
+        for _, board in self.replay():
+            pass
+        return board or self.start_board()
+
+# ---
+
+def decode_events(data, offset=0):
+    events = []
+    end = len(data)
+    while offset < end:
+        word = data[offset] | (data[offset + 1] << 8)
+        offset += 2
+        kind, a, b = word >> 12, word & 63, (word >> 6) & 63
+        if kind == 0:
+            events.append((MOVE, a, b))
+        elif kind == 1:
+            events.append((UPGRADE, a, b))
+        elif kind == 2:
+            key = int.from_bytes(data[offset:offset + 8], "little")
+            offset += 8
+            timers = []
+            for _ in range(a):
+                timer = []
+                for _ in range(3):
+                    value, offset = _read_varint(data, offset)
+                    timer.append(value)
+                timers.append(tuple(timer))
+            timers = tuple(timers)
+            events.append((CHECKPOINT, key, timers))
+        else:
+            raise ValueError(f"Unknown game log event kind {kind}")
+    return events
+
+def _write_event(out, kind, a, b):
+    word = (EVENT_KINDS.index(kind) << 12) | (b << 6) | a
+    out.append(word & 0xFF)
+    out.append(word >> 8)
+
+class GameRecorder:
+    """
+    Encodes one game while it is played. Call record_move()/record_upgrade() after the
+    board changed, then finish() for the encoded record to hand to GameLogWriter.append().
+    """
+    def __init__(self, board, tags=None, checkpoint_every=CHECKPOINT_EVERY):
+        fen = board.fen()
+        self.fen = None if fen == START_FEN else fen
+        self.tags = dict(tags or {})
+        self.checkpoint_every = checkpoint_every
+        self.events = bytearray()
+        self.plies = 0
+
+    def record_move(self, board, move):
+        (from_row, from_col), (to_row, to_col) = move
+        _write_event(self.events, MOVE, from_row * 8 + from_col, to_row * 8 + to_col)
+        self.plies += 1
+        if self.checkpoint_every and self.plies % self.checkpoint_every == 0:
+            self.record_checkpoint(board)
+
+    def record_upgrade(self, board, piece):
+        _write_event(self.events, UPGRADE, piece.square(), piece.tier)
+
+    def record_checkpoint(self, board):
+        key, timers = checkpoint_state(board)
+        _write_event(self.events, CHECKPOINT, len(timers), 0)
+        self.events += key.to_bytes(8, "little")
+        for timer in timers:
+            for value in timer:
+                _write_varint(self.events, value)
+
+    def finish(self, result="*", reason=""):
+        """
+        The complete record (length prefix included) for the game so far.
+        """
+        body = bytearray((RESULTS.index(result), REASONS.index(reason)))
+        _write_string(body, self.fen or "")
+        _write_varint(body, len(self.tags))
+        for key, value in self.tags.items():
+            _write_string(body, str(key))
+            _write_string(body, str(value))
+        body += self.events
+        record = bytearray()
+        _write_varint(record, len(body))
+        return bytes(record + body)
+
+def encode_record(record, checkpoint_every=CHECKPOINT_EVERY):
+    """
+    Re-encode a GameRecord (e.g. imported from PGN) by replaying it, regenerating checkpoints.
+    """
+    board = record.start_board()
+    recorder = GameRecorder(board, record.tags, checkpoint_every)
+    for (kind, a, b), board in record.replay():
+        if kind == MOVE:
+            recorder.record_move(board, (SQUARE_POSITIONS[a], SQUARE_POSITIONS[b]))
+        elif kind == UPGRADE:
+            recorder.record_upgrade(board, board.squares[a])
+    return recorder.finish(record.result, record.reason)
+
+class GameLogWriter:
+    """
+    Appends finished games to a .cvgl file, writing the header when the file is new.
+    """
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def append(self, data):
+        """
+        Append one encoded game (GameRecorder.finish() or encode_record()) and flush it.
+        """
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_games(path):
+    """
+    Generator of GameRecords from a .cvgl file, read through a memory map.
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a Chessvania game log")
+            offset = len(MAGIC)
+            size = len(data)
+            while offset < size:
+                try:
+                    length, start = _read_varint(data, offset)
+                except TruncatedError:
+                    return  # Interrupted final write, inside the length prefix
+                offset = start + length
+                if offset > size:
+                    return  # Interrupted final write
+                yield GameRecord.from_bytes(data[start:offset])
+
+# ---
+
+def _pgn_escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def export_pgn(record):
+    """
+    Extended PGN text for one game.
+    """
+    tags = {"Event": "Chessvania game", "Variant": "Chessvania"}
+    tags.update(record.tags)
+    if record.fen:
+        tags["SetUp"] = "1"
+        tags["FEN"] = record.fen
+    if record.reason:
+        tags["Termination"] = record.reason
+    tags["Result"] = record.result
+    lines = [f'[{key} "{_pgn_escape(str(value))}"]' for key, value in tags.items()]
+
+    board = record.start_board()
+    white_to_move = board.current_turn == "white"
+    number = board.move_count + 1
+    tokens = []
+    need_number = True
+    for kind, a, b in record.events:
+        if kind == UPGRADE:
+            tokens.append(f"{{[%upgrade {board.pos_to_notation(SQUARE_POSITIONS[a])} {UPGRADE_ORDER[b - 1]}]}}")
+            need_number = True
+        elif kind == MOVE:
+            if white_to_move:
+                tokens.append(f"{number}.")
+            elif need_number:
+                tokens.append(f"{number}...")
+            tokens.append(board.pos_to_notation(SQUARE_POSITIONS[a]) + board.pos_to_notation(SQUARE_POSITIONS[b]))
+            need_number = False
+            if not white_to_move:
+                number += 1
+            white_to_move = not white_to_move
+    tokens.append(record.result)
+
+    movetext = []
+    line = ""
+    for token in tokens:  # Wrap the move text at 80 columns
+        if line and len(line) + 1 + len(token) > 80:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n"
+
+PGN_TOKEN = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]|\{([^}]*)\}|;[^\n]*|(\d+\.(?:\.\.)?)|(1-0|0-1|1/2-1/2|\*)|([a-h][1-8][a-h][1-8])|(\S+)')
+UPGRADE_COMMAND = re.compile(r"\[%upgrade\s+([a-h][1-8])\s+(\w+)\]")
+
+def _square(notation):
+    return (8 - int(notation[1])) * 8 + ord(notation[0]) - ord("a")
+
+def import_pgn(text):
+    """
+    Generator of GameRecords from extended PGN text (one or more games).
+    """
+    record = None
+    in_movetext = False
+    for match in PGN_TOKEN.finditer(text):
+        tag, value, comment, _, result, move, other = match.groups()
+        if tag is not None:
+            if record is None or in_movetext:
+                if record is not None:
+                    yield record
+                record = GameRecord()
+                in_movetext = False
+            value = re.sub(r"\\(.)", r"\1", value)
+            if tag == "FEN":
+                record.fen = value
+            elif tag == "Termination" and value in REASONS:
+                record.reason = value
+            elif tag == "Result":
+                record.result = value
+            elif tag not in ("SetUp", "Event", "Variant"):
+                record.tags[tag] = value  # Including a Termination from outside Chessvania, e.g. "time forfeit"
+            continue
+        if record is None:
+            record = GameRecord()
+        in_movetext = True
+        if comment is not None:
+            for square, level in UPGRADE_COMMAND.findall(comment):
+                if level not in UPGRADE_ORDER:
+                    raise ValueError(f"Unknown upgrade level in PGN: {level}")
+                record.events.append((UPGRADE, _square(square), UPGRADE_ORDER.index(level) + 1))
+        elif move is not None:
+            record.events.append((MOVE, _square(move[:2]), _square(move[2:])))
+        elif result is not None:
+            record.result = result
+            yield record
+            record = None
+            in_movetext = False
+        elif other is not None:
+            raise ValueError(f"Unexpected PGN token: {other}")
+    if record is not None and (record.events or record.tags):
+        yield record
+
+# ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania game logs: summaries and PGN conversion.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="count games, results and plies in a log")
+    summary.add_argument("log")
+    summary.add_argument("--verify", action="store_true", help="replay every game, checking moves and checkpoints")
+    export = commands.add_parser("export", help="convert a log to extended PGN")
+    export.add_argument("log")
+    export.add_argument("pgn")
+    imports = commands.add_parser("import", help="append the games of an extended PGN file to a log")
+    imports.add_argument("pgn")
+    imports.add_argument("log")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        games = plies = 0
+        results = dict.fromkeys(RESULTS, 0)
+        for record in read_games(args.log):
+            games += 1
+            results[record.result] += 1
+            if args.verify:
+                for _ in record.replay(validate=True):
+                    pass
+            plies += len(record.moves)
+        size = os.path.getsize(args.log)
+        print(f"{games} games, {plies} plies, {size:,} bytes ({size / max(games, 1):.1f} bytes/game): "
+              + ", ".join(f"{result} {count}" for result, count in results.items()))
+    elif args.command == "export":
+        with open(args.pgn, "w") as out:
+            for record in read_games(args.log):
+                out.write(export_pgn(record) + "\n")
+    else:
+        with open(args.pgn) as file, GameLogWriter(args.log) as writer:
+            for record in import_pgn(file.read()):
+                writer.append(encode_record(record))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+# loadtest.py
+
+# Load generator for server.py. Thousands of simulated players run as asyncio tasks in this
+# process, each over its own localhost TCP connection: they join games, play random legal
+# moves, sometimes upgrade a pawn or knight or activate a knight's invulnerability (a
+# same-square move), and sometimes drop their connection and rejoin their seat. Unless
+# --connect names a running server, the server runs in the same event loop.
+#
+# Recorded: move round-trip latency (move sent -> new state received) as a histogram with
+# p50/p95/p99, moves per second, event loop lag (how late a 10 ms timer fires) and, for an
+# in-process server, memory per live game. Results go to a JSON report.
+#
+# Usage:
+#   python loadtest.py --players 2000 --duration 30 --report loadtest.json
+#   python loadtest.py --players 200 --think-ms 500 --connect 127.0.0.1:8765
+#   python loadtest.py --players 500 --duration 10 --profile   # Where the time goes
+
+import argparse
+import asyncio
+import cProfile
+import gc
+import io
+import json
+import pstats
+import random
+import resource
+import sys
+import time
+
+from board import Board
+from piece import PAWN, KNIGHT, UPGRADE_ORDER
+from server import Connection, serve
+
+LAG_INTERVAL = 0.01  # Seconds between event loop lag probes
+HISTOGRAM_BOUNDS = [0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]  # Bucket upper bounds, ms
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def histogram(values):
+    """
+    {"<=1ms": count, ...} over HISTOGRAM_BOUNDS, plus one bucket for anything slower.
+    """
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for value in values:
+        index = 0
+        while index < len(HISTOGRAM_BOUNDS) and value > HISTOGRAM_BOUNDS[index]:
+            index += 1
+        counts[index] += 1
+    labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+def summarize(values):
+    return {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99), "max": max(values, default=None)}
+
+def deep_size(root):
+    """
+    Bytes reachable from `root`, not counting classes, functions, modules or connections
+    (shared by every game or accounted per connection).
+    """
+    seen = set()
+    pending = [root]
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, (type, Connection)) or callable(obj) or type(obj).__name__ == "module":
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
+
+# ---
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []  # ms, moves and upgrades
+        self.lags = []  # ms
+        self.moves = 0
+        self.upgrades = 0
+        self.abilities = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.games_finished = 0
+
+class SimulatedPlayer:
+    """
+    One player: connects, joins the next open game and plays it out, then joins another,
+    until the deadline.
+    """
+    def __init__(self, host, port, stats, rng, options):
+        self.host, self.port = host, port
+        self.stats = stats
+        self.rng = rng
+        self.options = options
+        self.reader = self.writer = None
+        self.game = self.color = self.token = None
+        self.sent_at = None  # perf_counter when the pending move or upgrade went out
+        self.pending_upgrade = False  # The pending request is an upgrade (answered without a turn change)
+        self.plies = 0
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def send(self, message):
+        self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+    async def run(self, deadline):
+        await self.connect()
+        self.send({"type": "join"})
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    line = await asyncio.wait_for(self.reader.readline(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break  # Nothing more before the deadline, e.g. never paired
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message["type"]
+                if kind == "joined":
+                    self.game, self.color, self.token = message["game"], message["color"], message["token"]
+                    self.plies = 0
+                elif kind == "error":
+                    self.stats.errors += 1
+                    self.sent_at = None
+                elif kind == "state" and message["game"] == self.game:
+                    await self.on_state(message)
+        finally:
+            self.writer.close()
+
+    async def on_state(self, state):
+        stats, options = self.stats, self.options
+        if self.sent_at is not None and (state["turn"] != self.color or state["result"] != "*" or self.pending_upgrade):
+            stats.latencies.append((time.perf_counter() - self.sent_at) * 1000)
+            self.sent_at = None
+            self.pending_upgrade = False
+        if state["result"] != "*":
+            if self.color == "white":
+                stats.games_finished += 1  # Counted by one side only
+            self.send({"type": "join"})
+            self.game = None
+            return
+        if state["turn"] != self.color or state["players"] < 2 or self.sent_at is not None:
+            return
+
+        if options.think_ms:
+            await asyncio.sleep(self.rng.uniform(0, options.think_ms) / 1000)
+        if self.rng.random() < options.reconnect_rate:
+            await self.reconnect()
+            return
+        if self.plies >= options.max_plies:
+            self.send({"type": "resign"})
+            return
+
+        board = Board(state["fen"])
+        rng = self.rng
+        if rng.random() < options.upgrade_rate:
+            upgradable = [piece for kind in (PAWN, KNIGHT) for piece in board.pieces(self.color, kind)]
+            if upgradable:
+                piece = rng.choice(upgradable)
+                self.send({"type": "upgrade", "square": board.pos_to_notation(piece.position),
+                           "level": rng.choice(UPGRADE_ORDER)})
+                self.sent_at = time.perf_counter()
+                self.pending_upgrade = True
+                stats.upgrades += 1
+                return
+        moves = list(board.legal_moves())
+        if not moves:
+            return
+        activations = [move for move in moves if move[0] == move[1]]
+        if activations and rng.random() < options.ability_rate:
+            move = rng.choice(activations)
+            stats.abilities += 1
+        else:
+            move = rng.choice(moves)
+        self.send({"type": "move", "from": board.pos_to_notation(move[0]), "to": board.pos_to_notation(move[1])})
+        self.sent_at = time.perf_counter()
+        self.plies += 2
+        stats.moves += 1
+
+    async def reconnect(self):
+        """
+        Drop the connection and take the same seat back on a new one.
+        """
+        self.writer.close()
+        await self.connect()
+        self.send({"type": "rejoin", "game": self.game, "token": self.token})
+        self.stats.reconnects += 1
+
+# ---
+
+async def monitor_lag(stats, deadline):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        stats.lags.append((time.perf_counter() - start - LAG_INTERVAL) * 1000)
+
+async def run_load(options):
+    stats = LoadStats()
+    game_server = server_task = None
+    host, port = "127.0.0.1", None
+    if options.connect:
+        host, _, port = options.connect.rpartition(":")
+        port = int(port)
+    else:
+        ready = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(serve(host, 0, allow_upgrades=True, ready=ready))
+        game_server, port = await ready
+
+    rng = random.Random(options.seed)
+    players = [SimulatedPlayer(host, port, stats, random.Random(rng.getrandbits(64)), options)
+               for _ in range(options.players)]
+    cpu_start, start = time.process_time(), time.perf_counter()
+    deadline = start + options.duration
+    tasks = [asyncio.create_task(player.run(deadline)) for player in players]
+    monitor = asyncio.create_task(monitor_lag(stats, deadline))
+
+    memory = None
+    await asyncio.sleep(options.duration * 0.9)
+    if game_server is not None and game_server.games:
+        sample = list(game_server.games.values())[:50]
+        memory = {"live_games": len(game_server.games),
+                  "bytes_per_game": sum(deep_size(game) for game in sample) // len(sample)}
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    await monitor
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    if server_task is not None:
+        server_task.cancel()
+
+    failures = [repr(result) for result in results if isinstance(result, Exception)]
+    return {
+        "players": options.players,
+        "duration_s": round(elapsed, 2),
+        "server": options.connect or "in-process",
+        "moves": stats.moves,
+        "moves_per_s": round(stats.moves / elapsed, 1),
+        "upgrades": stats.upgrades,
+        "ability_activations": stats.abilities,
+        "reconnects": stats.reconnects,
+        "games_finished": stats.games_finished,
+        "errors": stats.errors,
+        "player_failures": len(failures),
+        "first_failures": failures[:5],
+        "latency_ms": summarize(stats.latencies),
+        "latency_histogram": histogram(stats.latencies),
+        "loop_lag_ms": summarize(stats.lags),
+        "cpu_utilization": round(cpu / elapsed, 2),
+        "memory": memory,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Chessvania server with simulated players.")
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=0, help="random think time before each move, up to this")
+    parser.add_argument("--upgrade-rate", type=float, default=0.02, help="chance a turn starts with an upgrade")
+    parser.add_argument("--ability-rate", type=float, default=0.5, help="chance to use a ready manual ability")
+    parser.add_argument("--reconnect-rate", type=float, default=0.005, help="chance to drop and rejoin before a move")
+    parser.add_argument("--max-plies", type=int, default=200, help="resign after about this many plies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--connect", metavar="HOST:PORT", help="load an external server instead of one in this process")
+    parser.add_argument("--profile", action="store_true", help="add the hottest functions (server and players) to the report")
+    parser.add_argument("--report", default="loadtest.json")
+    options = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))  # Two sockets per in-process player
+
+    profiler = cProfile.Profile() if options.profile else None
+    if profiler is not None:
+        profiler.enable()
+    report = asyncio.run(run_load(options))
+    if profiler is not None:
+        profiler.disable()
+        listing = io.StringIO()
+        pstats.Stats(profiler, stream=listing).sort_stats("tottime").print_stats(20)
+        report["profile"] = [line for line in listing.getvalue().splitlines() if line.strip()]
+    with open(options.report, "w") as out:
+        json.dump(report, out, indent=2)
+    latency = report["latency_ms"]
+    print(f"{report['players']} players, {report['duration_s']}s: {report['moves']} moves ({report['moves_per_s']}/s), "
+          f"latency p50 {latency['p50']:.1f} / p95 {latency['p95']:.1f} / p99 {latency['p99']:.1f} ms, "
+          f"loop lag p99 {report['loop_lag_ms']['p99']:.1f} ms -> {options.report}" if latency["count"] else
+          f"No moves completed -> {options.report}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
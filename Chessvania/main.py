@@ -1,12 +1,25 @@
 # main.py
 
+import argparse
+import asyncio
+import json
+import sys
+import threading
+
 from board import Board
+from book import OpeningBook
+from engine import Engine
+from gamelog import GameLogWriter, GameRecorder, game_result
 from menus import show_main_menu
 from piece import Pawn, Knight, Bishop, Rook, Queen, King
+from renderer import BoardRenderer
+from spectator import SpectatorView
 from rich.console import Console
 from rich.text import Text
+from tracing import tracer, format_event, CATEGORIES
 
-DEBUG = True # Flag for debug output control (change here to enable/disable debug messages)
+COMPUTER_COLOR = "black"  # The engine plays Black when the computer opponent is on
+COMPUTER_TIME_MS = 1000  # Thinking time per engine move
 
 def parse_chess_notation(move):
     """
@@ -18,44 +31,224 @@ def parse_chess_notation(move):
         start_pos = (8 - int(start[1]), columns[start[0]])
         end_pos = (8 - int(end[1]), columns[end[0]])
 
-        if DEBUG: print(f"[DEBUG] main.py - parse_chess_notation: Parsed move: {start_pos} to {end_pos}")
+        if tracer.input: tracer.event("input", "parsed_move", text=move, start=start_pos, end=end_pos)
 
         return start_pos, end_pos
     except (KeyError, ValueError, IndexError):
         print("Invalid input. Use format 'e2 e4'.")
         return None, None
 
-def main():
-    dev_mode = show_main_menu()  # Get game mode from menu
-    if dev_mode is None:
+def report_game_state(board):
+    """
+    Announce check, checkmate, stalemate or a draw by repetition or the fifty-move rule after
+    a move. Returns True if the game is over.
+    """
+    if board.is_checkmate():
+        print(f"Checkmate! {'Black' if board.current_turn == 'white' else 'White'} wins!")
+        return True
+    elif board.is_stalemate():
+        print("Stalemate! The game is a draw!")
+        return True
+    elif board.is_repetition(3):
+        print("Threefold repetition! The game is a draw!")
+        return True
+    elif board.is_fifty_move_draw():
+        print("Fifty moves without a capture or pawn move! The game is a draw!")
+        return True
+    elif board.is_check():
+        print("Check!")
+    return False
+
+def main(record_path=None, book_path=None, tablebases_path=None):
+    options = show_main_menu()  # Get game mode from menu
+    if options is None:
         return  # Exit if user selects "Quit"
+    dev_mode, vs_computer = options
+    tablebases = None
+    if vs_computer and tablebases_path:
+        from tablebase import Tablebases  # Needs numpy, so only imported when asked for
+        tablebases = Tablebases(tablebases_path)
+    engine = Engine(tablebases=tablebases) if vs_computer else None
     
     board = Board()
+    if book_path:
+        board.book = OpeningBook(book_path)  # The computer opponent plays from it while in book
+    board.render_board()  # Drawn first: on a terminal this pins the board to the top of the screen
     print("Enter moves in standard chess notation (e.g., 'e2 e4'). Type 'quit' to exit.")
     if dev_mode:
         print("Dev Mode Enabled: Type 'upgrade' to instantly upgrade a piece.")
-    board.render_board()
+    if tracer.enabled():
+        print(f"Tracing {', '.join(tracer.enabled())}: type 'trace' to show recent events.")
 
+    recorder = GameRecorder(board, {"White": "human", "Black": "computer" if engine else "human"}) \
+        if record_path else None
+    try:
+        play(board, dev_mode, engine, recorder)
+    finally:
+        if board.renderer is not None:
+            board.renderer.close()
+        if recorder is not None:
+            result, reason = game_result(board)
+            with GameLogWriter(record_path) as writer:
+                writer.append(recorder.finish(result, reason or "quit"))
+            print(f"Game recorded to {record_path}")
+
+def play(board, dev_mode, engine, recorder=None):
+    """
+    Run the move loop until the game ends or the player quits, logging moves and
+    upgrades to `recorder` if given.
+    """
     while True:
         print(f"\n{board.current_turn.capitalize()}'s turn.")
+
+        if engine is not None and board.current_turn == COMPUTER_COLOR:
+            move = engine.best_move(board, time_ms=COMPUTER_TIME_MS)
+            if move is None or not board.move_piece(*move):
+                print("The computer has no move to play.")
+                break
+            if recorder is not None:
+                recorder.record_move(board, move)
+            start, end = move
+            print(f"\nComputer plays {board.pos_to_notation(start)} {board.pos_to_notation(end)}")
+            board.render_board()
+            if report_game_state(board):
+                break
+            continue
+
         user_input = input("Enter your move: ").strip().lower()
 
         if user_input == "quit":
             print("Thanks for playing!")
             break
         elif dev_mode and user_input == "upgrade":
-            dev_upgrade_piece(board)
+            dev_upgrade_piece(board, recorder)
+            continue
+        elif user_input == "trace":
+            show_trace()
             continue
 
         start, end = parse_chess_notation(user_input)
         if start and end:
             if board.move_piece(start, end):
+                if recorder is not None:
+                    recorder.record_move(board, (start, end))
                 print("\nMove successful!")
                 board.render_board()
+                if report_game_state(board):
+                    break
             else:
                 print("\nInvalid move!")
 
-def dev_upgrade_piece(board):
+async def play_online(host, port, game=None):
+    """
+    Thin client for server.py: send the moves typed here and draw every state the server
+    pushes. All rules are checked by the server.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    def send(message):
+        writer.write(json.dumps(message).encode() + b"\n")
+
+    send({"type": "join"} if game is None else {"type": "join", "game": game})
+    renderer = BoardRenderer(Console())
+
+    async def receive():
+        async for line in reader:
+            message = json.loads(line)
+            if message["type"] == "joined":
+                print(f"Joined game {message['game']} as {message['color']}.")
+            elif message["type"] == "error":
+                print(f"\n{message['reason']}")
+            elif message["type"] == "state":
+                renderer.render(Board(message["fen"]))
+                if message["players"] < 2:
+                    print("Waiting for an opponent...")
+                elif message["result"] != "*":
+                    print(f"Game over: {message['result']} ({message['reason']})")
+                    return
+                else:
+                    if message["last"]:
+                        print(f"\nLast move: {message['last'][:2]} {message['last'][2:]}")
+                    print(f"{message['turn'].capitalize()}'s turn." + (" Check!" if message["check"] else ""))
+        print("Disconnected from the server.")
+
+    receiving = asyncio.create_task(receive())
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    def read_stdin():
+        # A daemon thread: a read still blocked when the game ends can't keep the client alive
+        try:
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)  # End of input
+        except RuntimeError:
+            pass  # The loop closed while waiting for a line
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+    print("Enter moves as 'e2 e4' (the same square twice activates an ability). Type 'quit' to leave.")
+    try:
+        while True:
+            typed = asyncio.ensure_future(lines.get())
+            done, _ = await asyncio.wait((typed, receiving), return_when=asyncio.FIRST_COMPLETED)
+            if receiving in done:
+                typed.cancel()
+                print("The game is over; exiting.")
+                break
+            text = typed.result()
+            if text is None:
+                break
+            text = text.strip().lower()
+            if text == "quit":
+                break
+            parts = text.split()
+            if len(parts) == 2:
+                send({"type": "move", "from": parts[0], "to": parts[1]})
+            elif text:
+                print("Invalid input. Use format 'e2 e4'.")
+    finally:
+        renderer.close()
+        receiving.cancel()
+        writer.close()
+
+async def watch_online(host, port, game):
+    """
+    Spectate a game on a server.py server, rebuilding the board from its keyframes and deltas.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps({"type": "watch", "game": game}).encode() + b"\n")
+    renderer = BoardRenderer(Console())
+    view = SpectatorView()
+    try:
+        async for line in reader:
+            message = json.loads(line)
+            if message["type"] == "error" or message["type"] == "closed":
+                print(message.get("reason", "The game has ended."))
+                return
+            if not view.apply(message):
+                writer.write(json.dumps({"type": "watch", "game": game}).encode() + b"\n")  # Missed a delta
+                continue
+            renderer.render(Board.from_snapshot(view.snapshot()))
+            header = view.header
+            if header["result"] != "*":
+                print(f"Game over: {header['result']} ({header['reason']})")
+            elif header["last"]:
+                print(f"{header['last'][:2]} {header['last'][2:]}, {header['turn']} to move")
+    finally:
+        renderer.close()
+        writer.close()
+
+def show_trace(count=20):
+    """
+    Print the most recent trace events.
+    """
+    events = tracer.recent(count)
+    if not events:
+        print("No trace events recorded.")
+    for record in events:
+        print(format_event(record))
+
+def dev_upgrade_piece(board, recorder=None):
     """
     Enables instant piece upgrades in Dev Mode.
     """
@@ -120,9 +313,8 @@ def dev_upgrade_piece(board):
 
     if choice in upgrades:
         piece.upgrade(upgrades[choice], board)
-
-        # Force cooldowns or ability state to initialize
-        _ = piece.valid_moves(board)
+        if recorder is not None:
+            recorder.record_upgrade(board, piece)
 
         print(f"\n{piece.__class__.__name__} at {pos} upgraded to {upgrades[choice].capitalize()}!")
         board.render_board()
@@ -130,5 +322,28 @@ def dev_upgrade_piece(board):
         print("Invalid choice.")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Play Chessvania.")
+    parser.add_argument("--trace", help=f"comma-separated trace categories ({', '.join(CATEGORIES)}) or 'all'")
+    parser.add_argument("--trace-sample", type=int, help="keep one trace event in every N")
+    parser.add_argument("--trace-echo", action="store_true", default=None, help="print trace events to stderr as they happen")
+    parser.add_argument("--book", metavar="PATH", help="opening book for the computer opponent (see book.py)")
+    parser.add_argument("--tablebases", metavar="DIR", help="endgame tablebases for the computer opponent (see tablebase.py)")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="play online against another player via server.py")
+    parser.add_argument("--game", help="with --connect, join this named game instead of the next free opponent")
+    parser.add_argument("--watch", metavar="GAME", help="with --connect, spectate this game")
+    parser.add_argument("--record", metavar="PATH", help="append the game to a binary game log (.cvgl, see gamelog.py)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    # Command-line settings override CHESSVANIA_TRACE* from the environment
+    tracer.configure(args.trace, args.trace_sample, args.trace_echo)
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        if args.watch:
+            asyncio.run(watch_online(host or "127.0.0.1", int(port), args.watch))
+        else:
+            asyncio.run(play_online(host or "127.0.0.1", int(port), args.game))
+    else:
+        main(args.record, args.book, args.tablebases)
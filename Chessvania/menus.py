@@ -3,9 +3,10 @@
 from rich.console import Console
 from rich.text import Text
 
-def show_main_menu(dev_mode = False):
+def show_main_menu(dev_mode = False, vs_computer = False):
     """
     Display the main menu and handle user input.
+    Returns (dev_mode, vs_computer) when a game is started, or None to quit.
     """
     print("\nWelcome to:")
     print(" _____ _____ _____ _____ _____ _____ _____ _____ _____ _____ ")
@@ -17,22 +18,27 @@ def show_main_menu(dev_mode = False):
         print(f"1. Start Game {'(Dev Abilities Activated)' if dev_mode else ''}")
         print("2. Instructions")
         print(f"3. Toggle Dev Mode (Currently: {'ON' if dev_mode else 'OFF'})")
-        print("4. Quit")
+        print(f"4. Toggle Computer Opponent (Currently: {'ON' if vs_computer else 'OFF'})")
+        print("5. Quit")
 
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
-            return dev_mode  # Return the dev mode state
+            return dev_mode, vs_computer  # Return the chosen game options
         elif choice == "2":
             print("\nInstructions:")
             print(" - Enter moves in standard chess notation (e.g., 'e2 e4').")
             print(" - Type 'quit' to exit the game.")
-            print(" - If Dev Mode is enabled, type 'upgrade' to instantly upgrade a piece.\n")
+            print(" - If Dev Mode is enabled, type 'upgrade' to instantly upgrade a piece.")
+            print(" - With the Computer Opponent on, you play White against the built-in engine.\n")
         elif choice == "3":
             dev_mode = not dev_mode  # Toggle Dev Mode
             print("\nDev Mode is now " + ("ON" if dev_mode else "OFF") + "!")
         elif choice == "4":
+            vs_computer = not vs_computer  # Toggle the computer opponent
+            print("\nComputer Opponent is now " + ("ON" if vs_computer else "OFF") + "!")
+        elif choice == "5":
             print("Goodbye!")
             return None  # Quit game
         else:
-            print("Invalid choice. Please enter a number between 1 and 4.")
+            print("Invalid choice. Please enter a number between 1 and 5.")
@@ -0,0 +1,187 @@
+# perft.py
+
+# Move-generation correctness and throughput tool.
+# perft(board, depth) counts the leaf nodes of the legal move tree; divide() breaks that
+# count down per root move. The fixtures below are the node-count oracle any change to
+# move generation must keep passing.
+#
+# Usage:
+#   python perft.py                               # Run every fixture at its listed depths
+#   python perft.py --fixture start --depth 4     # One fixture, one depth
+#   python perft.py --fen "<fen>" --depth 3 --divide
+#   python perft.py --verify                      # Also cross-check legal_moves by brute force
+
+import argparse
+import time
+
+from board import Board
+
+# Standard positions only use rules Chessvania shares with chess at the listed depths
+# (no castling, en passant or promotion occurs), so their published counts apply.
+# The Chessvania fixtures were recorded from this generator after cross-checking every
+# node with --verify.
+FIXTURES = [
+    {
+        "name": "start",
+        "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1",
+        "counts": {1: 20, 2: 400, 3: 8902, 4: 197281},
+    },
+    {
+        "name": "endgame-rook",  # Reference position 3; its depth-3 count drops the 2 en passant captures
+        "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "counts": {1: 14, 2: 191, 3: 2810},
+    },
+    {
+        "name": "pawn-tiers",  # One pawn per tier, diagonal abilities at different cooldowns
+        "fen": "4k3/pppppppp/8/8/8/8/PPPPPPPP/4K3 w - - 0 4 a2:1,b2:2,c2:3,d2:4,e2:5,f2:2c3,g2:4c1,b7:5c2,d7:2,f7:3,h7:1",
+        "counts": {1: 37, 2: 1046, 3: 35981},
+    },
+    {
+        "name": "knight-tiers",  # One knight per tier, invulnerability ready, cooling down and active
+        "fen": "1n2k1n1/3n4/8/4N3/8/2N5/8/1N2K1N1 w - - 0 6 b1:1,g1:2,c3:3,e5:5,b8:4c2,g8:5i1c3,d7:2",
+        "counts": {1: 56, 2: 1444, 3: 74578},
+    },
+    {
+        "name": "mixed-upgrades",  # Upgraded pawns and knights in a middlegame
+        "fen": "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w - - 0 5 e4:5,f3:5c1,c6:3,f6:2,d7:4c2,a2:1",
+        "counts": {1: 44, 2: 1563, 3: 69633},
+    },
+]
+
+# ---
+
+def perft(board, depth):
+    """
+    Count the leaf nodes of the legal move tree to the given depth.
+    """
+    if depth == 0:
+        return 1
+    moves = list(board.legal_moves())
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move(undo)
+    return nodes
+
+def divide(board, depth):
+    """
+    Return {move notation: leaf count} for every legal root move.
+    """
+    counts = {}
+    for move in list(board.legal_moves()):
+        undo = board.make_move(move)
+        counts[move_notation(board, move)] = perft(board, depth - 1)
+        board.unmake_move(undo)
+    return counts
+
+def move_notation(board, move):
+    """
+    Coordinate notation for a move, e.g. "e2e4" (same-square ability activations read "b1b1").
+    """
+    from_pos, to_pos = move
+    return board.pos_to_notation(from_pos) + board.pos_to_notation(to_pos)
+
+def brute_force_moves(board):
+    """
+    Legal moves found the slow way: every valid_moves target plus manual activations,
+    played and undone, keeping those that leave the king safe.
+    """
+    color = board.current_turn
+    moves = set()
+    for piece in board.pieces(color):
+        candidates = [(piece.position, target) for target in piece.valid_moves(board)]
+        if piece.manual_ability is not None and piece.cooldown_remaining(piece.manual_ability, board) <= 0:
+            candidates.append((piece.position, piece.position))
+        for move in candidates:
+            undo = board.make_move(move)
+            if not board.is_check(color):
+                moves.add(move)
+            board.unmake_move(undo)
+    return moves
+
+def verify(board, depth):
+    """
+    Walk the tree comparing legal_moves with brute_force_moves at every node.
+    Returns the first mismatching (fen, missing, extra) or None.
+    """
+    moves = set(board.legal_moves())
+    expected = brute_force_moves(board)
+    if moves != expected:
+        return board.fen(), expected - moves, moves - expected
+    if depth > 1:
+        for move in moves:
+            undo = board.make_move(move)
+            mismatch = verify(board, depth - 1)
+            board.unmake_move(undo)
+            if mismatch:
+                return mismatch
+    return None
+
+# ---
+
+def run(fen, depth, expected=None, show_divide=False, check=False, name=None):
+    """
+    Run perft on one position and print nodes, nodes/second and the optional breakdown.
+    Returns False if the count doesn't match `expected` or verification fails.
+    """
+    board = Board(fen)
+    start = time.perf_counter()
+    if show_divide:
+        breakdown = divide(board, depth)
+        nodes = sum(breakdown.values())
+    else:
+        nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+
+    ok = expected is None or nodes == expected
+    status = "" if expected is None else (" OK" if ok else f" FAIL (expected {expected})")
+    print(f"{name or fen} depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nps:,.0f} nodes/s){status}")
+
+    if show_divide:
+        for notation, count in sorted(breakdown.items()):
+            print(f"  {notation}: {count}")
+
+    if check:
+        mismatch = verify(board, depth)
+        if mismatch:
+            mismatch_fen, missing, extra = mismatch
+            print(f"  VERIFY FAIL at {mismatch_fen}: missing {sorted(missing)}, extra {sorted(extra)}")
+            ok = False
+        else:
+            print("  verified against brute force")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania perft: move-generation node counts and throughput.")
+    parser.add_argument("--fen", help="position to search (defaults to the fixture library)")
+    parser.add_argument("--fixture", help="run only the named fixture")
+    parser.add_argument("--depth", type=int, help="search depth (fixtures default to every recorded depth)")
+    parser.add_argument("--divide", action="store_true", help="print the per-move breakdown")
+    parser.add_argument("--verify", action="store_true", help="cross-check legal_moves by brute force")
+    parser.add_argument("--list", action="store_true", help="list the fixtures and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for fixture in FIXTURES:
+            print(f"{fixture['name']}: {fixture['fen']}")
+        return 0
+
+    if args.fen:
+        ok = run(args.fen, args.depth or 3, show_divide=args.divide, check=args.verify)
+        return 0 if ok else 1
+
+    ok = True
+    for fixture in FIXTURES:
+        if args.fixture and fixture["name"] != args.fixture:
+            continue
+        depths = [args.depth] if args.depth else sorted(fixture["counts"]) or [3]
+        for depth in depths:
+            ok &= run(fixture["fen"], depth, fixture["counts"].get(depth), args.divide, args.verify, fixture["name"])
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
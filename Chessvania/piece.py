@@ -2,10 +2,33 @@
 
 from rich.text import Text
 from rich import print  # Import Rich print
-
-DEBUG = True # Flag for debug output control (change here to enable/disable debug messages)
+from attacks import (
+    KNIGHT_ATTACKS, KING_ATTACKS, DIAGONAL_OFFSETS, CARDINAL_OFFSETS, EXTENDED_KNIGHT_OFFSETS,
+    PAWN_ATTACKS, PAWN_JUMPS, mask_to_positions, rook_attacks, bishop_attacks, queen_attacks
+)
+from abilities import Ability, compile_abilities, ability_targets, ability_attacks
+
+
+# Integer piece kinds (used by Board to index its per-type bitboards)
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# Upgrade levels in order (a piece's tier is its index here + 1) and their render colors
+UPGRADE_ORDER = ["rare", "super_rare", "epic", "mythic", "legendary"]
+UPGRADE_COLORS = {
+    "rare": "green",
+    "super_rare": "blue",
+    "epic": "purple",
+    "mythic": "red",
+    "legendary": "yellow"
+}
 
 class Piece:
+    __slots__ = ("color", "position", "has_moved", "tier", "unlocked", "cooldown_until")
+    kind = None  # Set by each subclass to one of the piece kinds above
+    abilities = ()  # Upgrade abilities in tier order, declared by each subclass (see abilities.py)
+    ability_tables = None  # Compiled from `abilities` at import: [color][unlocked] -> AbilityTable
+    invulnerable_until = 0  # Only pieces with an invulnerability ability store their own
+
     def __init__(self, color):
         """
         Initialize a generic chess piece.
@@ -13,469 +36,313 @@ class Piece:
         self.color = color  # 'white' or 'black'
         self.position = None  # Position on the board (e.g., (row, col))
         self.has_moved = False
-        self.ability_cooldown = {}  # Track cooldowns per ability
+        self.tier = 0  # Upgrade tier: 0 = none, 1..5 = rare..legendary
+        self.unlocked = 0  # Number of `abilities` unlocked so far
+        self.cooldown_until = None  # move_count at which the timed ability is ready again (None: never used)
 
-    def valid_moves(self, board):
+    def move_mask(self, board):
         """
-        Calculate valid moves for the piece (to be overridden by subclasses).
+        Bitboard of the piece's standard (non-ability) target squares.
         """
         raise NotImplementedError("This method should be implemented in the subclass.")
 
-    def move(self, new_position):
+    def base_attack_mask(self, board, occupied):
         """
-        Move the piece to a new position.
+        Bitboard of squares the piece's standard moves attack given an occupancy.
         """
-        self.position = new_position
-        self.has_moved = True
+        raise NotImplementedError("This method should be implemented in the subclass.")
 
-    def __repr__(self):
-        return f"{self.__class__.__name__}({self.color}, Position: {self.position})"
+    def attack_mask(self, board, occupied):
+        """
+        Bitboard of squares this piece attacks (could capture on) given an occupancy,
+        regardless of what stands there. Used for check detection.
+        """
+        mask = self.base_attack_mask(board, occupied)
+        if self.unlocked:
+            mask |= ability_attacks(self, board)
+        return mask
 
-# ---
+    def target_mask(self, board):
+        """
+        Bitboard of every square the piece can move to, including upgrade abilities.
+        """
+        mask = self.move_mask(board)
+        if self.unlocked:
+            mask |= ability_targets(self, board)
+        return mask
 
-class Pawn(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.upgraded_abilities = {}  # Store ability functions
-        self.upgrade_color = None     # For rendering purposes
-        self.ability_default_cooldowns = {}  # e.g., {"super_rare_diagonal": 5}
-        # ability_cooldown is inherited from Piece
+    def dependency_mask(self, board):
+        """
+        Squares whose occupancy target_mask() depends on: the standard move's rays (up to
+        and including the first blocker) or steps, plus every unlocked ability's targets and paths.
+        """
+        mask = self.base_attack_mask(board, board.occupied)
+        if self.unlocked:
+            mask |= self.ability_table.depends[self.square()]
+        return mask
 
     def valid_moves(self, board):
-        moves = []
-        direction = -1 if self.color == 'white' else 1
-        row, col = self.position  # Unpack position tuple
+        """
+        Every (row, col) the piece can move to, including upgrade abilities.
+        """
+        return mask_to_positions(self.target_mask(board))
 
-        # Standard forward move (1 square ahead)
-        if board.is_empty(row + direction, col):
-            moves.append((row + direction, col))
-        # Initial two-square move (only if it hasn't moved yet)
-        if not self.has_moved:
-            if board.is_empty(row + direction, col) and board.is_empty(row + direction * 2, col):
-                moves.append((row + direction * 2, col))
-        # Capture moves diagonally
-        for diag in [-1, 1]:
-            target = (row + direction, col + diag)
-            if board.is_enemy_piece(target, self.color):
-                moves.append(target)
-        # Include any upgrade moves
-        self.generated_ability_moves = {}  # Reset before generating moves
-
-        for ability_name, ability_function in self.upgraded_abilities.items():
-            if callable(ability_function):
-                new_moves = ability_function(board, {}, simulate=True)
-                for m in new_moves:
-                    self.generated_ability_moves[m] = ability_name
-                moves.extend(new_moves)
-
-        return moves
-
-    # RARE: Pawn can start with a 3-jump  
-    def rare_three_jump(self, board, state, simulate=False):
-        direction = -1 if self.color == "white" else 1
-        row, col = self.position
-        if not self.has_moved and all(board.is_empty(row + i * direction, col) for i in range(1, 4)):
-            return [(row + 3 * direction, col)]
-        return []
-
-    # SUPER RARE: Pawn can move diagonally even if no piece (with a cooldown)
-    def super_rare_diagonal(self, board, state, simulate=False):
-        ability_name = "super_rare_diagonal"
-        # Retrieve the last-used move count (or -10 by default)
-        last_used = self.ability_cooldown.get(ability_name, -10)
-        default_cooldown = self.ability_default_cooldowns.get(ability_name, 5)
-
-        if board.move_count - last_used < default_cooldown:
-            return []  # Ability is still on cooldown
-
-        moves = []
-        direction = -1 if self.color == "white" else 1
-        row, col = self.position
-        for diag in [-1, 1]:
-            target = (row + direction, col + diag)
-            if board.is_valid_position(target):
-                moves.append(target)
+    @property
+    def ability_table(self):
+        return self.ability_tables[self.color][self.unlocked]
 
-        # Only register cooldown if this is a real move usage
-        if not simulate:
-            self.ability_cooldown[ability_name] = board.move_count
+    @property
+    def tier_unlocked(self):
+        """
+        Number of abilities a piece upgraded straight to its tier has unlocked. `unlocked` is
+        higher after a downgrade, which keeps the abilities of the earlier, higher level.
+        """
+        return min(self.tier, len(self.abilities))
 
-        return moves
+    def has_ability(self, name):
+        """
+        Whether the named upgrade ability has been unlocked.
+        """
+        return name in self.ability_table.names
 
-    # EPIC: Pawn can start with a 4-jump  
-    def epic_four_jump(self, board, state, simulate=False):
-        direction = -1 if self.color == "white" else 1
-        row, col = self.position
-        if not self.has_moved and all(board.is_empty(row + i * direction, col) for i in range(1, 5)):
-            return [(row + 4 * direction, col)]
-        return []
-
-    # MYTHIC: Reduce special move cooldown (affects super_rare_diagonal)
-    def mythic_cooldown_reduction(self, board, state, simulate=False):
-        # Update the default cooldown for super_rare_diagonal if it exists
-        if "super_rare_diagonal" in self.ability_default_cooldowns:
-            self.ability_default_cooldowns["super_rare_diagonal"] = 3
-        return []
-
-    # LEGENDARY: Pawn can move backwards  
-    def legendary_move_backward(self, board, state, simulate=False):
-        direction = -1 if self.color == "white" else 1
-        row, col = self.position
-        if board.is_valid_position((row - direction, col)) and board.is_empty(row - direction, col):
-            return [(row - direction, col)]
-        return []
-
-    def upgrade(self, ability, board=None):
-        """
-        Upgrade the Pawn so that it gains new abilities.
-        """
-        upgrade_order = ["rare", "super_rare", "epic", "mythic", "legendary"]
-        upgrade_colors = {
-            "rare": "green",
-            "super_rare": "blue",
-            "epic": "purple",
-            "mythic": "red",
-            "legendary": "yellow"
-        }
-    
-        if ability not in upgrade_order:
-            print(f"[ERROR] Invalid upgrade: {ability}")
-            return
+    @property
+    def timed_ability(self):
+        """
+        Name of the unlocked ability with a cooldown, if any.
+        """
+        return self.ability_table.timed
 
-        current_index = upgrade_order.index(ability)
-    
-        for i in range(current_index + 1):
-            level = upgrade_order[i]
-            if level not in self.upgraded_abilities:
-                if level == "rare":
-                    self.upgraded_abilities["rare_three_jump"] = lambda board, state, simulate=False: self.rare_three_jump(board, state, simulate)
-                elif level == "super_rare":
-                    self.ability_default_cooldowns["super_rare_diagonal"] = 5
-                    self.upgraded_abilities["super_rare_diagonal"] = lambda board, state, simulate=False: self.super_rare_diagonal(board, state, simulate)
-                    if board:
-                        self.ability_cooldown["super_rare_diagonal"] = board.move_count
-                elif level == "epic":
-                    self.upgraded_abilities["epic_four_jump"] = lambda board, state, simulate=False: self.epic_four_jump(board, state, simulate)
-                elif level == "mythic":
-                    self.upgraded_abilities["mythic_cooldown_reduction"] = lambda board, state, simulate=False: self.mythic_cooldown_reduction(board, state, simulate)
-                    if board:
-                        self.mythic_cooldown_reduction(board, None)
-                elif level == "legendary":
-                    self.upgraded_abilities["legendary_move_backward"] = lambda board, state, simulate=False: self.legendary_move_backward(board, state, simulate)
-                
-                self.upgrade_color = upgrade_colors[level]
-
-        print(f"[bold {upgrade_colors[ability]}]{self.__class__.__name__} upgraded to {ability.upper()} with all prior abilities![/bold {upgrade_colors[ability]}]")
+    @property
+    def manual_ability(self):
+        """
+        Name of the unlocked same-square activation, if any.
+        """
+        return self.ability_table.manual
 
-    def get_cooldown_status(self, board):
+    @property
+    def cooldown_length(self):
+        return self.ability_table.cooldown or 5  # Full moves; 5 unless an ability says otherwise
+
+    def cooldown_remaining(self, ability_name, board):
         """
-        Returns a list of strings reporting the cooldown status for each ability.
-        For example: ["super_rare_diagonal: ready", "other_ability: 2 moves"]
+        Number of full moves until the given ability can be used again (0 or less means ready).
         """
-        statuses = []
-        for ability, last_used in self.ability_cooldown.items():
-            if ability in self.ability_default_cooldowns:
-                default = self.ability_default_cooldowns[ability]
-                remaining = default - (board.move_count - last_used)
-                if remaining <= 0:
-                    status = "ready"
-                else:
-                    status = f"{remaining} move{'s' if remaining != 1 else ''}"
-                statuses.append(f"{ability}: {status}")
-        return statuses
+        if self.cooldown_until is None or ability_name != self.timed_ability:
+            return 0
+        return self.cooldown_until - board.move_count
 
-# ---
+    def invulnerable_remaining(self, board):
+        """
+        Number of full moves the piece stays invulnerable (0 or less: it can be captured).
+        """
+        return self.invulnerable_until - board.move_count
 
-class Knight(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.upgraded_abilities = {}
-        self.upgrade_color = None
-        self.ability_default_cooldowns = {}
-        self.generated_ability_moves = {}
+    @property
+    def upgrade_color(self):
+        """
+        Render color of the current tier (None before any upgrade).
+        """
+        return UPGRADE_COLORS[UPGRADE_ORDER[self.tier - 1]] if self.tier else None
 
-    def valid_moves(self, board):
-        moves = []
-        row, col = self.position
-        base_offsets = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        for dr, dc in base_offsets:
-            new_pos = (row + dr, col + dc)
-            if board.is_valid_position(new_pos) and not board.is_friendly_piece(new_pos, self.color):
-                moves.append(new_pos)
-
-        # Include ability-based moves
-        self.generated_ability_moves = {}
-        for ability_name, ability_fn in self.upgraded_abilities.items():
-            if callable(ability_fn):
-                new_moves = ability_fn(board, {}, simulate=True)
-                for m in new_moves:
-                    self.generated_ability_moves[m] = ability_name
-                moves.extend(new_moves)
-
-        return moves
-
-    # --- Abilities ---
-
-    # RARE: One-square diagonal moves
-    def rare_diagonal(self, board, state, simulate=False):
-        row, col = self.position
-        diagonals = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        return [
-            (row + dr, col + dc)
-            for dr, dc in diagonals
-            if board.is_valid_position((row + dr, col + dc)) and not board.is_friendly_piece((row + dr, col + dc), self.color)
-        ]
+    @property
+    def upgraded_abilities(self):
+        """
+        Unlocked abilities as {name: Ability}, in the order they were unlocked.
+        """
+        return {ability.name: ability for ability in self.abilities[:self.unlocked]}
 
-    # SUPER RARE: Temporary invulnerability (manual trigger with same square)
-    def super_rare_invulnerability(self, board, state, simulate=False):
-        ability_name = "super_rare_invulnerability"
-        last_used = self.ability_cooldown.get(ability_name, -10)
-        default_cooldown = self.ability_default_cooldowns.get(ability_name, 5)
+    def upgrade(self, ability, board=None, announce=True):
+        """
+        Upgrade the piece so that it gains the abilities of every level up to `ability`.
+        Unlocking (or re-applying) a level with a timed ability while on a board starts its
+        cooldown; choosing a lower level than before lowers the tier (and color) but keeps the
+        abilities already unlocked.
+        """
+        if ability not in UPGRADE_ORDER:
+            print(f"[ERROR] Invalid upgrade: {ability}")
+            return
 
-        # Cooldown enforcement
-        if not simulate and board.move_count - last_used < default_cooldown:
-            if DEBUG: print(f"[DEBUG] Knight - {ability_name} is still on cooldown.")
-            print(f"{self.__class__.__name__} cannot activate {ability_name} for {default_cooldown - (board.move_count - last_used)} more move(s).")
-            return []
+        level = UPGRADE_ORDER.index(ability) + 1
+        self.unlocked = max(self.unlocked, min(level, len(self.abilities)))
+        self.tier = level
+        if board and any(spec.cooldown is not None for spec in self.abilities[:level]):
+            self.cooldown_until = board.move_count + self.cooldown_length
+            board.schedule_timers(self)
 
-        if not simulate:
-            self.invulnerable_turns = 2
-            self.ability_cooldown[ability_name] = board.move_count
-            if DEBUG: print(f"[DEBUG] Knight - {ability_name} activated! Knight is invulnerable for 2 turns.")
+        if board is not None and self.position is not None and board.squares[self.square()] is self:
+            board.refresh_piece(self)  # Keep the board's position key in sync
 
-        return []
+        if announce:
+            color = UPGRADE_COLORS[ability]
+            print(f"[bold {color}]{self.__class__.__name__} upgraded to {ability.upper()} with all prior abilities![/bold {color}]")
 
+    def get_cooldown_status(self, board):
+        """
+        Returns a list of strings reporting the cooldown status for each ability.
+        For example: ["super_rare_diagonal: ready", "invulnerable: 2 moves"]
+        """
+        statuses = []
+        if self.cooldown_until is not None and self.timed_ability is not None:
+            remaining = self.cooldown_remaining(self.timed_ability, board)
+            status = "ready" if remaining <= 0 else f"{remaining} move{'s' if remaining != 1 else ''}"
+            statuses.append(f"{self.timed_ability}: {status}")
+        remaining = self.invulnerable_remaining(board)
+        if remaining > 0:
+            statuses.append(f"invulnerable: {remaining} move{'s' if remaining != 1 else ''}")
+        return statuses
 
-    # EPIC: Extended knight move (e.g., L+diagonal)
-    def epic_diagonal_extension(self, board, state, simulate=False):
+    def square(self):
         """
-        Extends the knight's movement one square further in the same direction as each normal L-shaped move.
+        Square index (row * 8 + col) of the piece's current position.
         """
         row, col = self.position
-        extended_moves = []
-
-        # Vector directions of standard knight moves
-        knight_vectors = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
+        return row * 8 + col
 
-        for dr, dc in knight_vectors:
-            # Extend the vector by 1 unit (so 2→3, 1→2, etc.)
-            ext_row = row + dr + (1 if dr > 0 else -1 if dr < 0 else 0)
-            ext_col = col + dc + (1 if dc > 0 else -1 if dc < 0 else 0)
-            new_pos = (ext_row, ext_col)
+    def move(self, new_position):
+        """
+        Move the piece to a new position.
+        """
+        self.position = new_position
+        self.has_moved = True
 
-            if board.is_valid_position(new_pos) and not board.is_friendly_piece(new_pos, self.color):
-                extended_moves.append(new_pos)
+    def clone(self):
+        """
+        Return an independent copy of this piece (used by Board.copy()).
+        Every field is immutable, so copying the slots is enough.
+        """
+        new_piece = self.__class__.__new__(self.__class__)
+        for name in self.fields:
+            setattr(new_piece, name, getattr(self, name))
+        return new_piece
 
-        return extended_moves
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.color}, Position: {self.position})"
 
-    # MYTHIC: Reduce invulnerability cooldown
-    def mythic_reduce_invuln_cd(self, board, state, simulate=False):
-        if "super_rare_invulnerability" in self.ability_default_cooldowns:
-            self.ability_default_cooldowns["super_rare_invulnerability"] = 3
-        return []
+# ---
 
-    # LEGENDARY: One-square cardinal movement
-    def legendary_cardinal(self, board, state, simulate=False):
-        row, col = self.position
-        deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        return [
-            (row + dr, col + dc)
-            for dr, dc in deltas
-            if board.is_valid_position((row + dr, col + dc)) and not board.is_friendly_piece((row + dr, col + dc), self.color)
-        ]
-
-    # --- Upgrade Mechanism ---
-    def upgrade(self, ability, board=None):
-        upgrade_order = ["rare", "super_rare", "epic", "mythic", "legendary"]
-        upgrade_colors = {
-            "rare": "green",
-            "super_rare": "blue",
-            "epic": "purple",
-            "mythic": "red",
-            "legendary": "yellow"
-        }
-
-        if ability not in upgrade_order:
-            print(f"[ERROR] Invalid upgrade: {ability}")
-            return
+class Pawn(Piece):
+    __slots__ = ()
+    kind = PAWN
+    abilities = (
+        Ability("rare_three_jump", 1, [(3, 0)], mode="path", unmoved=True),  # Start with a 3-jump
+        Ability("super_rare_diagonal", 2, [(1, -1), (1, 1)], cooldown=5),  # Diagonal even onto an empty square
+        Ability("epic_four_jump", 3, [(4, 0)], mode="path", unmoved=True),  # Start with a 4-jump
+        Ability("mythic_cooldown_reduction", 4, activation="passive", effect=("cooldown", 3)),
+        Ability("legendary_move_backward", 5, [(-1, 0)], mode="quiet"),  # One square back
+    )
+
+    def move_mask(self, board):
+        sq = self.square()
+        jumps = PAWN_JUMPS[self.color][sq]
+        occupied = board.occupied
+        mask = 0
 
-        current_index = upgrade_order.index(ability)
-
-        for i in range(current_index + 1):
-            level = upgrade_order[i]
-            if level not in self.upgraded_abilities:
-                if level == "rare":
-                    self.upgraded_abilities["rare_diagonal"] = lambda board, state, simulate=False: self.rare_diagonal(board, state, simulate)
-                elif level == "super_rare":
-                    self.ability_default_cooldowns["super_rare_invulnerability"] = 5
-                    self.upgraded_abilities["super_rare_invulnerability"] = lambda board, state, simulate=False: self.super_rare_invulnerability(board, state, simulate)
-                    if board:
-                        self.ability_cooldown["super_rare_invulnerability"] = board.move_count
-                elif level == "epic":
-                    self.upgraded_abilities["epic_diagonal_extension"] = lambda board, state, simulate=False: self.epic_diagonal_extension(board, state, simulate)
-                elif level == "mythic":
-                    self.upgraded_abilities["mythic_reduce_invuln_cd"] = lambda board, state, simulate=False: self.mythic_reduce_invuln_cd(board, state, simulate)
-                    if board:
-                        self.mythic_reduce_invuln_cd(board, None)
-                elif level == "legendary":
-                    self.upgraded_abilities["legendary_cardinal"] = lambda board, state, simulate=False: self.legendary_cardinal(board, state, simulate)
-                
-                self.upgrade_color = upgrade_colors[level]
-
-        print(f"[bold {upgrade_colors[ability]}]{self.__class__.__name__} upgraded to {ability.upper()} with all prior abilities![/bold {upgrade_colors[ability]}]")
+        # Standard forward move (1 square ahead)
+        target, path = jumps[1]
+        if target and not path & occupied:
+            mask |= target
+            # Initial two-square move (only if it hasn't moved yet)
+            target, path = jumps[2]
+            if not self.has_moved and target and not path & occupied:
+                mask |= target
+        # Capture moves diagonally
+        mask |= PAWN_ATTACKS[self.color][sq] & (occupied & ~board.color_bb[self.color])
+        return mask
 
-    def get_cooldown_status(self, board):
-        statuses = []
-        for ability, last_used in self.ability_cooldown.items():
-            if ability in self.ability_default_cooldowns:
-                default = self.ability_default_cooldowns[ability]
-                remaining = default - (board.move_count - last_used)
-                if remaining <= 0:
-                    status = "ready"
-                else:
-                    status = f"{remaining} move{'s' if remaining != 1 else ''}"
-                statuses.append(f"{ability}: {status}")
-        return statuses
+    def base_attack_mask(self, board, occupied):
+        return PAWN_ATTACKS[self.color][self.square()]
 
-    def is_invulnerable(self, board):
-        return hasattr(self, "invulnerable_until") and board.move_count < self.invulnerable_until
+    def dependency_mask(self, board):
+        sq = self.square()
+        mask = PAWN_ATTACKS[self.color][sq] | PAWN_JUMPS[self.color][sq][2][1]
+        if self.unlocked:
+            mask |= self.ability_table.depends[sq]
+        return mask
 
 # ---
 
-class Bishop(Piece):
+class Knight(Piece):
+    __slots__ = ("invulnerable_until",)
+    kind = KNIGHT
+    abilities = (
+        Ability("rare_diagonal", 1, DIAGONAL_OFFSETS),  # One-square diagonal moves
+        Ability("super_rare_invulnerability", 2, cooldown=5, activation="manual", effect=("invulnerable", 2)),
+        Ability("epic_diagonal_extension", 3, EXTENDED_KNIGHT_OFFSETS),  # Each L move one square further
+        Ability("mythic_reduce_invuln_cd", 4, activation="passive", effect=("cooldown", 3)),
+        Ability("legendary_cardinal", 5, CARDINAL_OFFSETS),  # One-square cardinal moves
+    )
+
     def __init__(self, color):
         super().__init__(color)
-        self.upgraded_abilities = []
+        self.invulnerable_until = 0  # move_count at which invulnerability wears off
 
-    def valid_moves(self, board):
-        moves = []
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # Diagonal directions
+    def move_mask(self, board):
+        return KNIGHT_ATTACKS[self.square()] & ~board.color_bb[self.color]
 
-        for direction in directions:
-            for i in range(1, 8):  # Bishop can move up to 7 squares in any diagonal direction
-                target = (self.position[0] + direction[0] * i, self.position[1] + direction[1] * i)
-                row, col = target  # Unpack the tuple
-                if board.is_valid_position(target) and not board.is_occupied(row, col):
-                    moves.append(target)
-                elif board.is_enemy_piece(target, self.color):
-                    moves.append(target)
-                    break
-                else:
-                    break
+    def base_attack_mask(self, board, occupied):
+        return KNIGHT_ATTACKS[self.square()]
 
-        # Include upgrades' moves
-        for ability in self.upgraded_abilities:
-            moves.extend(ability.generate_moves(self, board))
-
-        return moves
-
-    def upgrade(self, ability):
-        """
-        Add a new ability to this bishop.
-        """
-        self.upgraded_abilities.append(ability)
+    def is_invulnerable(self, board):
+        return board.move_count < self.invulnerable_until
 
 # ---
 
-class Rook(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.upgraded_abilities = []
+class Bishop(Piece):
+    __slots__ = ()
+    kind = BISHOP
+    abilities = ()  # No upgrades yet; declare them like Pawn's and Knight's
 
-    def valid_moves(self, board):
-        moves = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Vertical and Horizontal directions
+    def move_mask(self, board):
+        return bishop_attacks(self.square(), board.occupied) & ~board.color_bb[self.color]
 
-        for direction in directions:
-            for i in range(1, 8):  # Rook can move up to 7 squares in any direction
-                target = (self.position[0] + direction[0] * i, self.position[1] + direction[1] * i)
-                row, col = target  # Unpack the tuple
-                if board.is_valid_position(target) and not board.is_occupied(row, col):
-                    moves.append(target)
-                elif board.is_enemy_piece(target, self.color):
-                    moves.append(target)
-                    break
-                else:
-                    break
+    def base_attack_mask(self, board, occupied):
+        return bishop_attacks(self.square(), occupied)
 
-        # Include upgrades' moves
-        for ability in self.upgraded_abilities:
-            moves.extend(ability.generate_moves(self, board))
+# ---
 
-        return moves
+class Rook(Piece):
+    __slots__ = ()
+    kind = ROOK
+    abilities = ()
 
-    def upgrade(self, ability):
-        """
-        Add a new ability to this rook.
-        """
-        self.upgraded_abilities.append(ability)
+    def move_mask(self, board):
+        return rook_attacks(self.square(), board.occupied) & ~board.color_bb[self.color]
+
+    def base_attack_mask(self, board, occupied):
+        return rook_attacks(self.square(), occupied)
 
 # ---
 
 class Queen(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.upgraded_abilities = []
-
-    def valid_moves(self, board):
-        moves = []
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]  # All 8 directions (diagonal, vertical, horizontal)
+    __slots__ = ()
+    kind = QUEEN
+    abilities = ()
 
-        for direction in directions:
-            for i in range(1, 8):  # Queen can move up to 7 squares in any direction
-                target = (self.position[0] + direction[0] * i, self.position[1] + direction[1] * i)
-                row, col = target  # Unpack the tuple
-                if board.is_valid_position(target) and not board.is_occupied(row, col):
-                    moves.append(target)
-                elif board.is_enemy_piece(target, self.color):
-                    moves.append(target)
-                    break
-                else:
-                    break
+    def move_mask(self, board):
+        return queen_attacks(self.square(), board.occupied) & ~board.color_bb[self.color]
 
-        # Include upgrades' moves
-        for ability in self.upgraded_abilities:
-            moves.extend(ability.generate_moves(self, board))
-
-        return moves
-
-    def upgrade(self, ability):
-        """
-        Add a new ability to this queen.
-        """
-        self.upgraded_abilities.append(ability)
+    def base_attack_mask(self, board, occupied):
+        return queen_attacks(self.square(), occupied)
 
 # ---
 
 class King(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.upgraded_abilities = []
-
-    def valid_moves(self, board):
-        moves = []
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]  # 8 possible king directions
+    __slots__ = ()
+    kind = KING
+    abilities = ()
 
-        for direction in directions:
-            target = (self.position[0] + direction[0], self.position[1] + direction[1])
-            row, col = target  # Unpack the tuple
-            if board.is_valid_position(target) and (board.is_empty(row, col) or board.is_enemy_piece((row, col), self.color)):
-                moves.append(target)
+    def move_mask(self, board):
+        return KING_ATTACKS[self.square()] & ~board.color_bb[self.color]
 
-        # Include upgrades' moves
-        for ability in self.upgraded_abilities:
-            moves.extend(ability.generate_moves(self, board))
+    def base_attack_mask(self, board, occupied):
+        return KING_ATTACKS[self.square()]
 
-        return moves
+# ---
 
-    def upgrade(self, ability):
-        """
-        Add a new ability to this king.
-        """
-        self.upgraded_abilities.append(ability)
+for _piece_class in (Pawn, Knight, Bishop, Rook, Queen, King):
+    # Every slot, for Piece.clone
+    _piece_class.fields = tuple(
+        name for klass in reversed(_piece_class.__mro__) for name in klass.__dict__.get("__slots__", ())
+    )
+    # Ability declarations -> per-square masks for every (color, unlocked count)
+    _piece_class.ability_tables = compile_abilities(_piece_class.abilities)
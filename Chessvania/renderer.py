@@ -0,0 +1,170 @@
+# renderer.py
+
+# Incremental board renderer. Every cell is drawn from a pre-styled Text cached per
+# (piece kind, color, tier), and each frame is diffed against the previous one: only rows
+# whose squares changed and panel lines whose text changed are rewritten.
+#
+# On a terminal the board and Abilities/Cooldowns panel are pinned to the top of the
+# screen and the prompts scroll in the region below them, so changed lines can be
+# rewritten in place. Anywhere else (pipes, logs, dumb terminals) every frame is printed
+# in full, still from the cached cells.
+
+from rich.panel import Panel
+from rich.segment import Segment, Segments
+from rich.text import Text
+from rich.control import Control
+
+from piece import PAWN, KNIGHT, UPGRADE_ORDER, UPGRADE_COLORS
+
+PIECE_SYMBOLS = ["♟", "♞", "♝", "♜", "♛", "♚"]  # Indexed by piece kind
+BORDER = Text("  " + "+ - " * 8 + "+", style="white")
+COLUMN_LABELS = Text("    a   b   c   d   e   f   g   h", style="bold white")
+EMPTY_CELL = Text(" ", style="white")
+SEPARATOR = Text(" | ", style="white")
+BOARD_LINES = 18  # Top border, 8 rows each followed by a border, column labels
+MIN_SCROLL_LINES = 4  # Fall back to full frames when fewer lines would be left for prompts
+
+_cell_cache = {}  # (kind, color, tier) -> Text
+
+def cell_text(piece):
+    """
+    The styled Text for a piece's cell, built once per (kind, color, tier).
+    """
+    key = (piece.kind, piece.color, piece.tier)
+    text = _cell_cache.get(key)
+    if text is None:
+        symbol = PIECE_SYMBOLS[piece.kind]
+        symbol = symbol.upper() if piece.color == "white" else symbol.lower()
+        style = UPGRADE_COLORS[UPGRADE_ORDER[piece.tier - 1]] if piece.tier else piece.color
+        text = _cell_cache[key] = Text(symbol, style=style)
+    return text
+
+def cell_key(piece):
+    return None if piece is None else (piece.kind, piece.color, piece.tier)
+
+# ---
+
+class BoardRenderer:
+    def __init__(self, console, incremental=None):
+        self.console = console
+        # Diff in place only on a real terminal unless told otherwise
+        self.incremental = console.is_terminal if incremental is None else incremental
+        self.cells = None  # Cell keys of the last frame, one per square
+        self.panel_lines = None  # Rendered panel lines of the last frame
+        self.screen_size = None  # Terminal size the pinned frame was laid out for
+
+    def render(self, board):
+        cells = [cell_key(piece) for piece in board.squares]
+        panel_lines = self.render_panel(board)
+
+        if not self.incremental:
+            self.print_frame(board, panel_lines)
+        elif self.cells is None or len(panel_lines) != len(self.panel_lines) \
+                or self.screen_size != tuple(self.console.size):
+            self.draw_pinned(board, panel_lines)
+        else:
+            self.update_pinned(board, cells, panel_lines)
+
+        self.cells = cells
+        self.panel_lines = panel_lines
+
+    def close(self):
+        """
+        Release the pinned region so the terminal scrolls normally again.
+        """
+        if self.incremental and self.screen_size is not None:
+            self.write_escape("\x1b[r")
+            self.console.control(Control.move_to(0, self.screen_size[1] - 1))
+            self.console.line()
+        self.cells = None
+        self.panel_lines = None
+        self.screen_size = None
+
+    # ---
+
+    def row_text(self, board, row):
+        parts = [Text(f"{8 - row} | ", style="white")]
+        for col in range(8):
+            if col:
+                parts.append(SEPARATOR)
+            piece = board.squares[row * 8 + col]
+            parts.append(EMPTY_CELL if piece is None else cell_text(piece))
+        parts.append(Text(" |", style="white"))
+        return Text.assemble(*parts)
+
+    def panel_text(self, board):
+        """
+        One line per piece that has used an ability. Only pawns and knights track
+        cooldowns, so only their piece lists are visited.
+        """
+        lines = []
+        for color in ("white", "black"):
+            for kind in (PAWN, KNIGHT):
+                for piece in board.pieces(color, kind):
+                    if piece.cooldown_until is not None or piece.invulnerable_until > board.move_count:
+                        statuses = piece.get_cooldown_status(board)
+                        if statuses:
+                            position = piece.position
+                            lines.append((position, f"{piece.__class__.__name__} at {board.pos_to_notation(position)}: " + ", ".join(statuses)))
+        lines.sort()  # Board order, as a full square scan would list them
+        if not lines:
+            return "No active abilities/cooldowns."
+        return "\n".join(line for _, line in lines)
+
+    def render_panel(self, board):
+        panel = Panel(self.panel_text(board), title="Abilities/Cooldowns", style="cyan")
+        return [tuple(line) for line in self.console.render_lines(panel, pad=False)]
+
+    def print_frame(self, board, panel_lines):
+        console = self.console
+        console.print(BORDER)
+        for row in range(8):
+            console.print(self.row_text(board, row))
+            console.print(BORDER)
+        console.print(COLUMN_LABELS)
+        for line in panel_lines:
+            console.print(Segments(line + (Segment.line(),)))
+
+    def draw_pinned(self, board, panel_lines):
+        """
+        Clear the screen, draw the whole frame at the top and confine scrolling to the lines below it.
+        """
+        width, height = self.console.size
+        header = BOARD_LINES + len(panel_lines)
+        if height - header < MIN_SCROLL_LINES:
+            # No room to pin the frame: print it in full this time
+            self.write_escape("\x1b[r")
+            self.screen_size = None
+            self.print_frame(board, panel_lines)
+            return
+        self.write_escape("\x1b[r")
+        self.console.control(Control.clear(), Control.home())
+        self.print_frame(board, panel_lines)
+        self.write_escape(f"\x1b[{header + 1};{height}r")
+        self.console.control(Control.move_to(0, height - 1))
+        self.screen_size = (width, height)
+
+    def update_pinned(self, board, cells, panel_lines):
+        """
+        Rewrite only the board rows and panel lines that differ from the last frame.
+        """
+        console = self.console
+        dirty_rows = [row for row in range(8) if cells[row * 8:row * 8 + 8] != self.cells[row * 8:row * 8 + 8]]
+        dirty_lines = [index for index, line in enumerate(panel_lines) if line != self.panel_lines[index]]
+        if not dirty_rows and not dirty_lines:
+            return
+        self.write_escape("\x1b7")  # Save the prompt's cursor position
+        for row in dirty_rows:
+            console.control(Control.move_to(0, 1 + row * 2))
+            self.write_escape("\x1b[2K")
+            console.print(self.row_text(board, row), end="")
+        for index in dirty_lines:
+            console.control(Control.move_to(0, BOARD_LINES + index))
+            self.write_escape("\x1b[2K")
+            console.print(Segments(panel_lines[index]), end="")
+        self.write_escape("\x1b8")
+
+    def write_escape(self, sequence):
+        # Scroll regions and cursor save/restore have no rich Control equivalent
+        self.console.file.write(sequence)
+        self.console.file.flush()
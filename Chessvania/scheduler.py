@@ -0,0 +1,62 @@
+# scheduler.py
+
+# Timer wheel for ability cooldowns and status effects, keyed by Board.move_count.
+# Pieces store when each timer runs out as an absolute move count (cooldown_until,
+# invulnerable_until), so "how long until ready" is a subtraction; the wheel only has to
+# say which timers run out when move_count advances, so nobody polls every cooldown.
+#
+# Timers are hashed into WHEEL_SIZE slots by move count. advance() fires the timers due
+# at exactly that move count once and hands them back, so Board.unmake_move can rewind()
+# them when a move is taken back. Entries whose piece was re-timed since (a take-back, a
+# re-applied upgrade) no longer match the piece's field and are dropped without firing.
+
+COOLDOWN = "cooldown"
+INVULNERABLE = "invulnerable"
+TIMER_FIELDS = {COOLDOWN: "cooldown_until", INVULNERABLE: "invulnerable_until"}  # Piece field per timer kind
+WHEEL_SIZE = 8  # Longer than any built-in timer, so most slots hold a single round
+
+class TimerWheel:
+    def __init__(self, size=WHEEL_SIZE):
+        self.size = size
+        self.slots = [{} for _ in range(size)]  # (piece, kind) -> move count it fires at
+
+    def schedule(self, piece, kind, when):
+        """
+        Register a timer that runs out when move_count reaches `when`.
+        """
+        self.slots[when % self.size][(piece, kind)] = when
+
+    def advance(self, move_count):
+        """
+        Return the (piece, kind) timers that run out at `move_count`, removing them from
+        the wheel. Stale entries (the piece's timer has since changed) are discarded.
+        """
+        slot = self.slots[move_count % self.size]
+        fired = []
+        for (piece, kind), when in list(slot.items()):
+            if when > move_count:
+                continue  # Due on a later turn of the wheel
+            del slot[(piece, kind)]
+            if when == move_count and getattr(piece, TIMER_FIELDS[kind]) == move_count:
+                fired.append((piece, kind))
+        return fired
+
+    def rewind(self, move_count, fired):
+        """
+        Put back timers returned by advance(move_count) after the move count was rewound.
+        """
+        for piece, kind in fired:
+            self.schedule(piece, kind, move_count)
+
+    def pending(self):
+        """
+        Every scheduled (piece, kind, when), soonest first.
+        """
+        return sorted(
+            ((piece, kind, when) for slot in self.slots for (piece, kind), when in slot.items()),
+            key=lambda entry: entry[2],
+        )
+
+    def clear(self):
+        for slot in self.slots:
+            slot.clear()
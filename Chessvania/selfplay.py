@@ -0,0 +1,217 @@
+# selfplay.py
+
+# Headless self-play: plays N games between configurable policies across a process pool,
+# with no rendering, and streams each finished game to disk: one JSON line per game, or a
+# binary game log record (see gamelog.py) when the output file ends in .cvgl.
+#
+# Usage:
+#   python selfplay.py --games 1000 --white random --black greedy --output games.jsonl
+#   python selfplay.py --games 100000 --output games.cvgl
+#   python selfplay.py --games 200 --white engine --black engine --engine-depth 2 \
+#       --white-loadout pawn=legendary,knight=epic --workers 8
+#   python selfplay.py --games 100 --white engine --black engine --tablebases tablebases
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from board import Board
+from book import open_book
+from engine import Engine, evaluate
+from gamelog import GameLogWriter, GameRecorder
+from piece import UPGRADE_ORDER
+
+POLICIES = ["random", "greedy", "engine"]
+LOADOUT_PIECES = {"pawn": "Pawn", "knight": "Knight"}  # Piece types that can be upgraded
+
+def parse_loadout(text):
+    """
+    Parse a loadout such as "pawn=rare,knight=legendary" into {"Pawn": "rare", "Knight": "legendary"}.
+    """
+    loadout = {}
+    if not text:
+        return loadout
+    for entry in text.split(","):
+        name, _, level = entry.partition("=")
+        name, level = name.strip().lower(), level.strip().lower()
+        if name not in LOADOUT_PIECES or level not in UPGRADE_ORDER:
+            raise ValueError(f"Invalid loadout entry: {entry!r}")
+        loadout[LOADOUT_PIECES[name]] = level
+    return loadout
+
+def apply_loadout(board, color, loadout):
+    """
+    Upgrade every piece of `color` named in the loadout through its own upgrade() method.
+    """
+    for piece in board.pieces(color):
+        if piece.__class__.__name__ in loadout:
+            piece.upgrade(loadout[piece.__class__.__name__], board, announce=False)
+
+# ---
+
+def choose_random(board, moves, rng, engine):
+    return rng.choice(moves)
+
+def choose_greedy(board, moves, rng, engine):
+    """
+    One-ply lookahead: play the move with the best static evaluation, ties broken at random.
+    """
+    best_score = None
+    best_moves = []
+    for move in moves:
+        undo = board.make_move(move)
+        score = -evaluate(board)
+        board.unmake_move(undo)
+        if best_score is None or score > best_score:
+            best_score = score
+            best_moves = [move]
+        elif score == best_score:
+            best_moves.append(move)
+    return rng.choice(best_moves)
+
+def choose_engine(board, moves, rng, engine):
+    searcher, depth, time_ms = engine
+    return searcher.best_move(board, time_ms=time_ms, depth=depth) or rng.choice(moves)
+
+POLICY_FUNCTIONS = {"random": choose_random, "greedy": choose_greedy, "engine": choose_engine}
+
+def play_game(game_index, seed, policies, loadouts, max_plies, engine_depth, engine_time_ms, binary=False,
+              book=None, tablebases=None):
+    """
+    Play one game to completion and return its result record.
+    `policies` and `loadouts` are {"white": ..., "black": ...}. With binary=True the record
+    also holds the encoded game log entry under "log". Every policy plays from the opening
+    book at path `book` while the position is in it. With a `tablebases` directory, engines
+    play from the tables and a game is adjudicated as soon as it reaches a tabled position.
+    """
+    rng = random.Random(seed)
+    board = Board()
+    if book:
+        board.book = open_book(book)
+    if tablebases:
+        from tablebase import open_tablebases  # Needs numpy, so only imported when asked for
+        tablebases = open_tablebases(tablebases)
+    recorder = None
+    if binary:
+        recorder = GameRecorder(board, {"Game": game_index, "Seed": seed,
+                                        "White": policies["white"], "Black": policies["black"]})
+    for color in ("white", "black"):
+        apply_loadout(board, color, loadouts[color])
+    if recorder is not None:
+        for piece in board.upgraded_pieces():
+            recorder.record_upgrade(board, piece)
+
+    engines = {}  # color -> (Engine, depth, time_ms) for engine-driven sides
+    for color in ("white", "black"):
+        if policies[color] == "engine":
+            engines[color] = (Engine(tt_bits=16, tablebases=tablebases or None), engine_depth, engine_time_ms)
+
+    moves_played = []
+    result, reason = "1/2-1/2", "max_plies"
+    for _ in range(max_plies):
+        moves = list(board.legal_moves())
+        if not moves:
+            if board.is_check():
+                result = "0-1" if board.current_turn == "white" else "1-0"
+                reason = "checkmate"
+            else:
+                reason = "stalemate"
+            break
+        if board.is_repetition(3):
+            reason = "repetition"
+            break
+        if board.is_fifty_move_draw():
+            reason = "fifty_moves"
+            break
+        probed = tablebases.probe(board) if tablebases else None
+        if probed is not None:
+            outcome, _ = probed
+            if outcome != "draw":
+                white_wins = (outcome == "win") == (board.current_turn == "white")
+                result = "1-0" if white_wins else "0-1"
+            reason = "tablebase"
+            break
+        color = board.current_turn
+        move = board.book_move(rng) or POLICY_FUNCTIONS[policies[color]](board, moves, rng, engines.get(color))
+        board.make_move(move)
+        moves_played.append(board.pos_to_notation(move[0]) + board.pos_to_notation(move[1]))
+        if recorder is not None:
+            recorder.record_move(board, move)
+
+    record = {
+        "game": game_index,
+        "seed": seed,
+        "white": policies["white"],
+        "black": policies["black"],
+        "loadouts": loadouts,
+        "result": result,
+        "reason": reason,
+        "plies": len(moves_played),
+        "moves": moves_played,
+    }
+    if recorder is not None:
+        record["log"] = recorder.finish(result, reason)
+    return record
+
+# ---
+
+def run_selfplay(games, output, policies, loadouts, workers=None, seed=0,
+                 max_plies=300, engine_depth=2, engine_time_ms=None, book=None, tablebases=None):
+    """
+    Play `games` games across a process pool, appending each result to `output`
+    (JSON lines, or a binary game log for a .cvgl file) as soon as it finishes. Game i
+    always uses seed + i, so results are reproducible whatever the worker count or
+    completion order. Returns {result: count}.
+    """
+    totals = {"1-0": 0, "0-1": 0, "1/2-1/2": 0}
+    binary = output.endswith(".cvgl")
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor, \
+            (GameLogWriter(output) if binary else open(output, "a")) as out:
+        futures = [
+            executor.submit(play_game, index, seed + index, policies, loadouts, max_plies, engine_depth,
+                            engine_time_ms, binary, book, tablebases)
+            for index in range(games)
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            if binary:
+                out.append(record["log"])
+            else:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            totals[record["result"]] += 1
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Chessvania self-play.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--white", choices=POLICIES, default="random")
+    parser.add_argument("--black", choices=POLICIES, default="random")
+    parser.add_argument("--white-loadout", default="", help='upgrades applied before move 1, e.g. "pawn=rare,knight=epic"')
+    parser.add_argument("--black-loadout", default="")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; game i uses seed + i")
+    parser.add_argument("--max-plies", type=int, default=300, help="adjudicate a draw after this many plies")
+    parser.add_argument("--engine-depth", type=int, default=2)
+    parser.add_argument("--engine-time-ms", type=int, default=None)
+    parser.add_argument("--output", default="selfplay.jsonl")
+    parser.add_argument("--book", help="opening book (see book.py) both sides play from while in book")
+    parser.add_argument("--tablebases", help="tablebase directory (see tablebase.py) used to adjudicate endgames")
+    args = parser.parse_args()
+
+    policies = {"white": args.white, "black": args.black}
+    loadouts = {"white": parse_loadout(args.white_loadout), "black": parse_loadout(args.black_loadout)}
+
+    start = time.perf_counter()
+    totals = run_selfplay(args.games, args.output, policies, loadouts, args.workers, args.seed,
+                          args.max_plies, args.engine_depth, args.engine_time_ms, args.book,
+                          args.tablebases)
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games in {elapsed:.1f}s ({args.games / elapsed * 3600:,.0f} games/hour): "
+          f"white {totals['1-0']}, black {totals['0-1']}, draws {totals['1/2-1/2']} -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+# server.py
+
+# Asyncio multiplayer server: any number of games in one process and one event loop. Each
+# game is a plain Board; moves are validated and played with Board.try_move(), so the
+# server never prints. Players get the full state after every change. Each state is
+# encoded once per game and queued on both players' connections, and every connection's
+# queue goes out as one write per event loop tick however many messages piled up in it.
+#
+# Protocol: JSON messages, one per line over plain TCP, or one per text frame over
+# WebSocket on the same port (a connection opening with an HTTP GET is upgraded).
+#   client -> server
+#     {"type": "join"}                                   play the next opponent to join
+#     {"type": "join", "game": "name"}                   play in a named game
+#     {"type": "rejoin", "game": id, "token": token}     take a seat back after a disconnect
+#     {"type": "move", "from": "e2", "to": "e4"}         same square: manual ability
+#     {"type": "upgrade", "square": "e2", "level": "rare"}  on your turn, with --allow-upgrades
+#     {"type": "resign"}
+#     {"type": "watch", "game": id}                      spectate (see spectator.py)
+#   server -> client
+#     {"type": "joined", "game": id, "color": "white", "token": token}
+#     {"type": "state", "game": id, "fen": fen, "turn": color, "last": "e2e4", "check": bool,
+#      "result": "*", "reason": "", "players": 2}
+#     {"type": "error", "reason": text}
+#     {"type": "keyframe", ...}, {"type": "delta", ...}  to spectators (see spectator.py)
+#     {"type": "closed", "game": id}                     to spectators, when the game goes away
+#
+# Spectators get a delta per change instead of the full state, encoded once per game. One
+# whose socket can't keep up (write buffer past SPECTATOR_BUFFER) is skipped instead of
+# queued for, and sent a fresh keyframe once its buffer drains.
+# A game lives until both players have left; a player who drops can rejoin with the token
+# from "joined".
+#
+# Usage:
+#   python server.py --host 127.0.0.1 --port 8765
+#   python main.py --connect 127.0.0.1:8765
+#   python main.py --connect 127.0.0.1:8765 --watch 1   # Spectate game 1
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import secrets
+
+from board import Board
+from gamelog import game_result
+from piece import UPGRADE_ORDER
+from spectator import SpectatorFeed, encode
+
+DEFAULT_PORT = 8765
+MAX_MESSAGE = 4096  # Bytes; a longer line or frame closes the connection
+SPECTATOR_BUFFER = 64 * 1024  # Bytes of unsent data at which a spectator is paused
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+COLORS = ("white", "black")
+
+def parse_square(text):
+    """
+    "e2" -> (6, 4), or None.
+    """
+    if not isinstance(text, str) or len(text) != 2 or text[0] not in "abcdefgh" or text[1] not in "12345678":
+        return None
+    return 8 - int(text[1]), ord(text[0]) - ord("a")
+
+def websocket_frame(payload, opcode=1):
+    """
+    An unmasked, unfragmented server frame.
+    """
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 65536:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, "big")
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, "big")
+    return header + payload
+
+def unmask(payload, mask):
+    if not payload:
+        return payload
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+# ---
+
+class Game:
+    __slots__ = ("id", "board", "players", "tokens", "last", "result", "reason", "spectators", "feed")
+
+    def __init__(self, game_id):
+        self.id = game_id
+        self.board = Board()
+        self.players = {"white": None, "black": None}  # color -> Connection, None while the seat is empty
+        self.tokens = {"white": None, "black": None}  # color -> rejoin token, once the seat was taken
+        self.last = ""  # Last move, e.g. "e2e4"
+        self.result = "*"
+        self.reason = ""
+        self.spectators = set()
+        self.feed = None  # SpectatorFeed, from the first spectator on
+
+    def open_seat(self):
+        for color in COLORS:
+            if self.tokens[color] is None:
+                return color
+        return None
+
+    def connected(self):
+        return sum(1 for connection in self.players.values() if connection is not None)
+
+    def state_message(self):
+        board = self.board
+        return json.dumps({
+            "type": "state", "game": self.id, "fen": board.fen(), "turn": board.current_turn,
+            "last": self.last, "check": board.is_check(), "result": self.result, "reason": self.reason,
+            "players": self.connected(),
+        }, separators=(",", ":")).encode()
+
+    def update_result(self):
+        result, reason = game_result(self.board)
+        if result != "*":
+            self.result, self.reason = result, reason
+
+# ---
+
+class Connection(asyncio.Protocol):
+    """
+    One client socket. Incoming bytes are split into messages (lines, or WebSocket frames
+    after an upgrade); outgoing messages are queued until the server's end-of-tick flush.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = bytearray()
+        self.mode = None  # None until the first bytes arrive, then "tcp", "handshake" or "websocket"
+        self.fragments = bytearray()  # Payload of an unfinished fragmented WebSocket message
+        self.outgoing = []
+        self.game = None
+        self.color = None
+        self.watching = None  # Game being spectated
+        self.paused = False  # Transport past its high-water mark
+        self.stale = False  # A spectator that missed deltas while paused
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+        self.server.leave(self)
+        self.server.stop_watching(self)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        if self.stale:
+            self.server.resync(self)
+
+    def data_received(self, data):
+        self.buffer += data
+        if self.mode is None:
+            if len(self.buffer) < 4:
+                return
+            self.mode = "handshake" if self.buffer.startswith(b"GET ") else "tcp"
+        if self.mode == "tcp":
+            self.read_lines()
+        else:
+            if self.mode == "handshake" and not self.read_handshake():
+                return
+            self.read_frames()
+        if len(self.buffer) > MAX_MESSAGE:
+            self.transport.close()
+
+    def read_lines(self):
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                return
+            line = bytes(self.buffer[:end])
+            del self.buffer[:end + 1]
+            if line.strip():
+                self.server.receive(self, line)
+
+    def read_handshake(self):
+        end = self.buffer.find(b"\r\n\r\n")
+        if end < 0:
+            return False
+        lines = bytes(self.buffer[:end]).decode("latin-1").split("\r\n")
+        del self.buffer[:end + 4]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            self.transport.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            self.transport.close()
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.transport.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        self.mode = "websocket"
+        return True
+
+    def read_frames(self):
+        buffer = self.buffer
+        while len(buffer) >= 2:
+            opcode = buffer[0] & 0x0F
+            final = buffer[0] & 0x80
+            length = buffer[1] & 0x7F
+            offset = 2
+            if length == 126:
+                if len(buffer) < 4:
+                    return
+                length = int.from_bytes(buffer[2:4], "big")
+                offset = 4
+            elif length == 127:
+                if len(buffer) < 10:
+                    return
+                length = int.from_bytes(buffer[2:10], "big")
+                offset = 10
+            if length > MAX_MESSAGE:
+                self.transport.close()
+                return
+            if len(buffer) < offset + 4 + length:
+                return
+            mask = bytes(buffer[offset:offset + 4])
+            payload = unmask(bytes(buffer[offset + 4:offset + 4 + length]), mask)
+            del buffer[:offset + 4 + length]
+
+            if opcode == 8:  # Close: echo it and hang up
+                self.transport.write(websocket_frame(payload[:2], 8))
+                self.transport.close()
+                return
+            if opcode == 9:  # Ping
+                self.transport.write(websocket_frame(payload, 10))
+                continue
+            if opcode in (0, 1, 2):
+                self.fragments += payload
+                if len(self.fragments) > MAX_MESSAGE:
+                    self.transport.close()
+                    return
+                if final:
+                    message = bytes(self.fragments)
+                    self.fragments.clear()
+                    self.server.receive(self, message)
+
+    def send(self, payload):
+        """
+        Queue an encoded JSON message for this tick's flush.
+        """
+        if self.transport is None or self.transport.is_closing():
+            return
+        if not self.outgoing:
+            self.server.dirty.append(self)
+            self.server.schedule_flush()
+        self.outgoing.append(payload)
+
+    def flush(self):
+        outgoing = self.outgoing
+        self.outgoing = []
+        if self.transport.is_closing():
+            return
+        if self.mode == "websocket":
+            self.transport.write(b"".join(websocket_frame(payload) for payload in outgoing))
+        else:
+            self.transport.write(b"\n".join(outgoing) + b"\n")
+
+# ---
+
+class GameServer:
+    def __init__(self, allow_upgrades=False):
+        self.allow_upgrades = allow_upgrades
+        self.games = {}  # id -> Game
+        self.waiting = None  # Game with an open seat for the next "join" without a name
+        self.connections = set()
+        self.dirty = []  # Connections with queued messages
+        self.flush_scheduled = False
+        self.next_id = 1
+        self.moves = 0  # Moves played since start
+
+    def schedule_flush(self):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        """
+        End of tick: write every queued message, one write per connection.
+        """
+        self.flush_scheduled = False
+        dirty = self.dirty
+        self.dirty = []
+        for connection in dirty:
+            connection.flush()
+
+    def stats(self):
+        return {"connections": len(self.connections), "games": len(self.games), "moves": self.moves,
+                "spectators": sum(len(game.spectators) for game in self.games.values())}
+
+    # ---
+
+    def receive(self, connection, data):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            message = None
+        kind = message.get("type") if isinstance(message, dict) else None
+        if not isinstance(kind, str):
+            self.error(connection, "Malformed message")
+            return
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self.error(connection, f"Unknown message type {kind!r}")
+            return
+        handler(self, connection, message)
+
+    def error(self, connection, reason):
+        connection.send(json.dumps({"type": "error", "reason": reason}).encode())
+
+    def broadcast(self, game):
+        payload = game.state_message()  # Encoded once for both players
+        for connection in game.players.values():
+            if connection is not None:
+                connection.send(payload)
+        if game.spectators:
+            delta = game.feed.delta(game)  # Encoded once for every spectator
+            if delta is not None:
+                for spectator in game.spectators:
+                    if spectator.paused:
+                        spectator.stale = True
+                    else:
+                        spectator.send(delta)
+
+    def resync(self, spectator):
+        """
+        A paused spectator drained its buffer: the deltas it missed are replaced by a keyframe.
+        """
+        spectator.stale = False
+        game = spectator.watching
+        if game is not None:
+            spectator.send(game.feed.keyframe(game))
+
+    def stop_watching(self, connection):
+        game = connection.watching
+        if game is not None:
+            game.spectators.discard(connection)
+            connection.watching = None
+
+    def seat(self, connection, game, color):
+        if connection.game is not None:
+            self.leave(connection)
+        token = game.tokens[color] or secrets.token_hex(8)
+        game.tokens[color] = token
+        game.players[color] = connection
+        connection.game, connection.color = game, color
+        connection.send(json.dumps({"type": "joined", "game": game.id, "color": color, "token": token}).encode())
+        self.broadcast(game)
+
+    def leave(self, connection):
+        game = connection.game
+        if game is None:
+            return
+        if game.players[connection.color] is connection:
+            game.players[connection.color] = None
+        connection.game = connection.color = None
+        if not game.connected():
+            if self.games.get(game.id) is game:
+                del self.games[game.id]
+            if self.waiting is game:
+                self.waiting = None
+            closed = encode({"type": "closed", "game": game.id})
+            for spectator in game.spectators:
+                spectator.watching = None
+                spectator.send(closed)
+            game.spectators.clear()
+        else:
+            self.broadcast(game)
+
+    def new_game(self, game_id=None):
+        if game_id is None:
+            while str(self.next_id) in self.games:  # Taken by a game someone named
+                self.next_id += 1
+            game_id = str(self.next_id)
+            self.next_id += 1
+        game = self.games[game_id] = Game(game_id)
+        return game
+
+    # ---
+
+    def on_join(self, connection, message):
+        name = message.get("game")
+        if name is not None:
+            game = self.games.get(str(name)) or self.new_game(str(name))
+        else:
+            game = self.waiting
+            if game is None or game.id not in self.games or game.open_seat() is None:
+                game = self.waiting = self.new_game()
+        color = game.open_seat()
+        if color is None:
+            self.error(connection, f"Game {game.id} is full")
+            return
+        self.seat(connection, game, color)
+        if game is self.waiting and game.open_seat() is None:
+            self.waiting = None
+
+    def on_rejoin(self, connection, message):
+        game = self.games.get(str(message.get("game")))
+        token = message.get("token")
+        color = next((color for color in COLORS if game is not None and game.tokens[color] == token), None)
+        if color is None:
+            self.error(connection, "No such game or seat")
+            return
+        previous = game.players[color]
+        if previous is not None and previous is not connection:
+            previous.game = previous.color = None  # Replaced by the new connection
+            previous.transport.close()
+        self.seat(connection, game, color)
+
+    def on_move(self, connection, message):
+        game = self.playing(connection)
+        if game is None:
+            return
+        start, end = parse_square(message.get("from")), parse_square(message.get("to"))
+        if start is None or end is None:
+            self.error(connection, "Squares look like 'e2'")
+            return
+        reason = game.board.try_move(start, end)
+        if reason is not None:
+            self.error(connection, reason)
+            return
+        self.moves += 1
+        game.last = message["from"] + message["to"]
+        game.update_result()
+        self.broadcast(game)
+
+    def on_upgrade(self, connection, message):
+        if not self.allow_upgrades:
+            self.error(connection, "Upgrades are disabled on this server")
+            return
+        game = self.playing(connection)
+        if game is None:
+            return
+        position = parse_square(message.get("square"))
+        level = message.get("level")
+        piece = game.board.squares[position[0] * 8 + position[1]] if position is not None else None
+        if piece is None or piece.color != connection.color:
+            self.error(connection, "No piece of yours on that square")
+            return
+        if level not in UPGRADE_ORDER or not piece.abilities:
+            self.error(connection, f"{piece.__class__.__name__} can't be upgraded to {level!r}")
+            return
+        piece.upgrade(level, game.board, announce=False)
+        game.update_result()
+        self.broadcast(game)
+
+    def on_resign(self, connection, message):
+        game = self.playing(connection, any_turn=True)
+        if game is None:
+            return
+        game.result = "0-1" if connection.color == "white" else "1-0"
+        game.reason = "resignation"
+        self.broadcast(game)
+
+    def on_watch(self, connection, message):
+        game = self.games.get(str(message.get("game")))
+        if game is None:
+            self.error(connection, "No such game")
+            return
+        self.stop_watching(connection)
+        if game.feed is None:
+            game.feed = SpectatorFeed()
+        connection.transport.set_write_buffer_limits(high=SPECTATOR_BUFFER)
+        connection.watching = game
+        connection.stale = False
+        game.spectators.add(connection)
+        connection.send(game.feed.keyframe(game))
+
+    def playing(self, connection, any_turn=False):
+        """
+        The connection's game if it is in progress and (unless any_turn) the player is to move.
+        """
+        game = connection.game
+        if game is None:
+            self.error(connection, "Join a game first")
+        elif game.result != "*":
+            self.error(connection, f"The game is over ({game.result}, {game.reason})")
+        elif game.open_seat() is not None:
+            self.error(connection, "Waiting for an opponent")
+        elif not any_turn and game.board.current_turn != connection.color:
+            self.error(connection, f"It's {game.board.current_turn}'s turn")
+        else:
+            return game
+        return None
+
+    handlers = {"join": on_join, "rejoin": on_rejoin, "move": on_move, "upgrade": on_upgrade, "resign": on_resign,
+                "watch": on_watch}
+
+# ---
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, allow_upgrades=False, ready=None):
+    """
+    Run a GameServer until cancelled. `ready`, if given, is a Future that receives the
+    GameServer and bound port once it is listening.
+    """
+    game_server = GameServer(allow_upgrades)
+    loop = asyncio.get_running_loop()
+    listener = await loop.create_server(lambda: Connection(game_server), host, port, backlog=4096)
+    bound_port = listener.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.set_result((game_server, bound_port))
+    else:
+        print(f"Chessvania server listening on {host}:{bound_port}")
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania multiplayer server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--allow-upgrades", action="store_true", help="let players upgrade their pieces (like dev mode)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.allow_upgrades))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+# snapshot.py
+
+# Immutable Board snapshots. Board.snapshot() captures everything that decides play -- each
+# piece's square, kind, color, upgrade tier and unlocked abilities, first-move flag, cooldown
+# and invulnerability stamps, plus the side to move, move count and halfmove clock -- as a
+# compact hashable tuple; Board.from_snapshot() builds a live board from one. A snapshot
+# shares nothing with the board it came from, so it can be kept, compared, used as a dict
+# key or handed to another process as is.
+#
+# Two serialized forms: the extended FEN of Board.from_snapshot(snapshot).fen() for people,
+# and to_bytes()/from_bytes() for save files, which keeps the exact stamps (a FEN only has
+# the time left on each timer).
+#
+# Repetition history is not part of a snapshot: a restored board starts a fresh one.
+
+import struct
+
+SNAPSHOT_VERSION = 1
+COLORS = ("white", "black")
+HEADER = struct.Struct(">BBIHB")  # version, side to move, move_count, halfmove clock, piece count
+PIECE = struct.Struct(">BBBiI")  # square, kind | color << 3 | has_moved << 4, tier | unlocked << 4, cooldown, invulnerability
+NO_COOLDOWN = -1  # cooldown_until of a piece that never used its timed ability
+
+class BoardSnapshot(tuple):
+    """
+    (pieces, turn, move_count, halfmove_clock), where pieces holds one
+    (square, kind, color, tier, unlocked, has_moved, cooldown_until, invulnerable_until)
+    tuple per piece in square order.
+    """
+    __slots__ = ()
+
+    def __new__(cls, pieces, turn, move_count, halfmove_clock=0):
+        return tuple.__new__(cls, (tuple(pieces), turn, move_count, halfmove_clock))
+
+    @property
+    def pieces(self):
+        return self[0]
+
+    @property
+    def turn(self):
+        return self[1]
+
+    @property
+    def move_count(self):
+        return self[2]
+
+    @property
+    def halfmove_clock(self):
+        return self[3]
+
+    def __getnewargs__(self):
+        return tuple(self)  # Pickling (e.g. handing a snapshot to a worker process) goes through __new__
+
+    def __repr__(self):
+        return f"BoardSnapshot({len(self.pieces)} pieces, {self.turn} to move, move {self.move_count + 1})"
+
+    def to_bytes(self):
+        """
+        Stable binary form: a header, then 11 bytes per piece.
+        """
+        out = bytearray(HEADER.pack(SNAPSHOT_VERSION, COLORS.index(self.turn), self.move_count,
+                                    self.halfmove_clock, len(self.pieces)))
+        for sq, kind, color, tier, unlocked, has_moved, cooldown_until, invulnerable_until in self.pieces:
+            out += PIECE.pack(sq, kind | COLORS.index(color) << 3 | has_moved << 4, tier | unlocked << 4,
+                              NO_COOLDOWN if cooldown_until is None else cooldown_until, invulnerable_until)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, turn, move_count, halfmove_clock, count = HEADER.unpack_from(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        if len(data) != HEADER.size + count * PIECE.size:
+            raise ValueError(f"Snapshot of {count} pieces should be {HEADER.size + count * PIECE.size} bytes, got {len(data)}")
+        pieces = []
+        for offset in range(HEADER.size, len(data), PIECE.size):
+            sq, code, tiers, cooldown_until, invulnerable_until = PIECE.unpack_from(data, offset)
+            pieces.append((sq, code & 7, COLORS[code >> 3 & 1], tiers & 15, tiers >> 4, bool(code >> 4 & 1),
+                           None if cooldown_until == NO_COOLDOWN else cooldown_until, invulnerable_until))
+        return cls(pieces, COLORS[turn], move_count, halfmove_clock)
@@ -0,0 +1,121 @@
+# spectator.py
+
+# Delta-encoded spectator stream for server.py. A spectator gets one keyframe when it starts
+# watching -- every piece plus the game header -- and after that one delta per change: the
+# squares whose piece changed (moved, captured, upgraded, a cooldown or invulnerability
+# stamp set) and the header fields that changed. A quiet move is two squares and a turn.
+#
+# Pieces are sent as their Board.snapshot() entries, [square, kind, color (0 white, 1 black),
+# tier, unlocked, has_moved, cooldown_until, invulnerable_until]. The stamps are absolute
+# move counts, so a running cooldown costs nothing until it is set again; the remaining time
+# follows from the header's move count. The server encodes each delta once per game and
+# queues the same bytes on every spectator (see GameServer.broadcast).
+#
+# Messages (server -> spectator):
+#   {"type": "keyframe", "game": id, "seq": n, "pieces": [...], "header": {...}}
+#   {"type": "delta", "game": id, "seq": n, "set": [...], "clear": [squares], "header": {changed fields}}
+# `seq` counts deltas; a spectator that sees a gap has missed one and needs a new keyframe
+# (sent again on "watch", and by the server when a slow spectator catches up).
+
+import json
+
+from snapshot import BoardSnapshot
+
+COLORS = ("white", "black")
+
+def encode(message):
+    return json.dumps(message, separators=(",", ":")).encode()
+
+def snapshot_entries(snapshot):
+    """
+    {square: entry list} for a BoardSnapshot.
+    """
+    return {entry[0]: [entry[0], entry[1], COLORS.index(entry[2]), entry[3], entry[4], int(entry[5]), entry[6], entry[7]]
+            for entry in snapshot.pieces}
+
+def game_header(game, snapshot):
+    return {"turn": snapshot.turn, "move": snapshot.move_count, "halfmove": snapshot.halfmove_clock,
+            "last": game.last, "result": game.result, "reason": game.reason, "players": game.connected()}
+
+class SpectatorFeed:
+    """
+    Per-game encoder: remembers what the spectators were last sent and turns the next
+    state into a delta against it.
+    """
+    __slots__ = ("seq", "entries", "header")
+
+    def __init__(self):
+        self.seq = 0
+        self.entries = {}
+        self.header = {}
+
+    def keyframe(self, game):
+        """
+        Full state for a new (or resynchronizing) spectator. It also becomes the delta base,
+        which is safe because every change made while anyone watches goes out as a delta.
+        """
+        snapshot = game.board.snapshot()
+        self.entries = snapshot_entries(snapshot)
+        self.header = game_header(game, snapshot)
+        return encode({"type": "keyframe", "game": game.id, "seq": self.seq,
+                       "pieces": list(self.entries.values()), "header": self.header})
+
+    def delta(self, game):
+        """
+        The changes since the last keyframe or delta, or None if nothing changed.
+        """
+        snapshot = game.board.snapshot()
+        entries = snapshot_entries(snapshot)
+        header = game_header(game, snapshot)
+        previous = self.entries
+        changed = [entry for sq, entry in entries.items() if previous.get(sq) != entry]
+        cleared = [sq for sq in previous if sq not in entries]
+        header_changes = {name: value for name, value in header.items() if self.header.get(name) != value}
+        if not changed and not cleared and not header_changes:
+            return None
+        self.entries, self.header = entries, header
+        self.seq += 1
+        message = {"type": "delta", "game": game.id, "seq": self.seq, "header": header_changes}
+        if changed:
+            message["set"] = changed
+        if cleared:
+            message["clear"] = cleared
+        return encode(message)
+
+# ---
+
+class SpectatorView:
+    """
+    Client side: applies keyframes and deltas and rebuilds the position as a BoardSnapshot
+    (Board.from_snapshot() turns it into a board to render).
+    """
+    def __init__(self):
+        self.entries = {}
+        self.header = {}
+        self.seq = None  # None until a keyframe arrives, or after a missed delta
+
+    def apply(self, message):
+        """
+        Apply one keyframe or delta. Returns False if a delta was skipped because of a gap.
+        """
+        if message["type"] == "keyframe":
+            self.entries = {entry[0]: entry for entry in message["pieces"]}
+            self.header = dict(message["header"])
+            self.seq = message["seq"]
+            return True
+        if self.seq is None or message["seq"] != self.seq + 1:
+            self.seq = None  # Out of sync until the next keyframe
+            return False
+        for sq in message.get("clear", ()):
+            self.entries.pop(sq, None)
+        for entry in message.get("set", ()):
+            self.entries[entry[0]] = entry
+        self.header.update(message["header"])
+        self.seq = message["seq"]
+        return True
+
+    def snapshot(self):
+        pieces = [(sq, kind, COLORS[color], tier, unlocked, bool(moved), cooldown_until, invulnerable_until)
+                  for sq, kind, color, tier, unlocked, moved, cooldown_until, invulnerable_until
+                  in sorted(self.entries.values())]
+        return BoardSnapshot(pieces, self.header["turn"], self.header["move"], self.header["halfmove"])
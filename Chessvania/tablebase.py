@@ -0,0 +1,491 @@
+# tablebase.py
+
+# Endgame tablebases for small material configurations, upgraded pieces included, built by
+# retrograde analysis and probed through a memory map.
+#
+# A configuration is named by its pieces, White's then Black's, with each piece's tier
+# after its letter: "KN5vK" is King and legendary Knight against a lone King, "KP5vK" the
+# same with a legendary Pawn. Every state of a configuration gets one slot in a mixed-radix
+# index: the side to move, then per piece its square, whether it has moved (pawns only,
+# which decides their jumps) and its cooldown (pieces with a timed ability; 0..cooldown
+# length full moves). Invulnerability never changes which moves are legal, so it is not
+# part of a state.
+#
+# Generation:
+#   1. Every state is set up on a real Board and its legal moves are played with
+#      make_move() across a process pool, so the tables follow exactly the rules play uses.
+#      Captures lead into the configuration without the captured piece, which is generated
+#      (or loaded) first; capturing down to the bare kings is a draw.
+#   2. The move graph is solved with NumPy, one ply at a time: mated states are lost in 0,
+#      a state with a successor lost in n-1 is won in n, a state whose successors are all
+#      won (the longest in n-1) is lost in n. Whatever is left when nothing changes is drawn.
+#
+# File (.cvtb): MAGIC, a length-prefixed configuration name, then one byte per state:
+# 0 draw, 255 not a legal position, otherwise 1 + plies to mate (odd: the side to move wins).
+#
+# Usage:
+#   python tablebase.py generate KN5vK KP5vK --directory tablebases --workers 8
+#   python tablebase.py probe "8/8/8/4k3/8/8/8/1N2K3 w - - 0 1 b1:5" --directory tablebases
+
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from attacks import SQUARE_POSITIONS
+from board import Board
+from piece import Pawn, Knight, Bishop, Rook, Queen, King, PAWN, KING
+
+MAGIC = b"CVTB\x01"
+DRAW, ILLEGAL = 0, 255
+MAX_PLIES = 253  # Longest mate a byte can hold
+COLORS = ("white", "black")
+PIECE_LETTERS = "PNBRQK"  # Indexed by piece kind
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+BASE_MOVE_COUNT = 8  # Move count of every generated position (only timer differences matter)
+CHUNK_SIZE = 20000  # States per worker task
+
+UNKNOWN, WIN, LOSS, DRAWN, INVALID = range(5)  # Solver status of a state, for its side to move
+
+def new_piece(color, kind, tier):
+    piece = PIECE_CLASSES[kind](color)
+    piece.tier = tier
+    piece.unlocked = min(tier, len(piece.abilities))
+    return piece
+
+class Configuration:
+    """
+    The pieces of one configuration, as (color, kind, tier) with the kings first on each
+    side, and the layout of its state index.
+    """
+    def __init__(self, pieces):
+        self.pieces = tuple(sorted(pieces, key=lambda spec: (COLORS.index(spec[0]), spec[1] != KING, spec[1], spec[2])))
+        self.name = "v".join(
+            "".join(PIECE_LETTERS[kind] + (str(tier) if tier else "") for piece_color, kind, tier in self.pieces
+                    if piece_color == color)
+            for color in COLORS
+        )
+        # Per piece: (has a moved flag, cooldown values), from the piece's own rules
+        self.dims = []
+        for color, kind, tier in self.pieces:
+            piece = new_piece(color, kind, tier)
+            cooldowns = piece.cooldown_length + 1 if piece.timed_ability is not None else 1
+            self.dims.append((kind == PAWN, cooldowns))
+        self.size = 2
+        for has_moved_flag, cooldowns in self.dims:
+            self.size *= 64 * (2 if has_moved_flag else 1) * cooldowns
+
+    @classmethod
+    def parse(cls, name):
+        """
+        "KN5vK" -> Configuration.
+        """
+        sides = name.split("v")
+        if len(sides) != 2:
+            raise ValueError(f"Configuration {name!r} needs one 'v' between White's and Black's pieces")
+        pieces = []
+        for color, text in zip(COLORS, sides):
+            index = 0
+            while index < len(text):
+                letter = text[index].upper()
+                if letter not in PIECE_LETTERS:
+                    raise ValueError(f"Unknown piece letter {text[index]!r} in {name!r}")
+                index += 1
+                tier = 0
+                if index < len(text) and text[index].isdigit():
+                    tier = int(text[index])
+                    index += 1
+                pieces.append((color, PIECE_LETTERS.index(letter), tier))
+            if sum(1 for piece_color, kind, _ in pieces if piece_color == color and kind == KING) != 1:
+                raise ValueError(f"Each side needs exactly one king in {name!r}")
+        return cls(pieces)
+
+    @classmethod
+    def of_board(cls, board):
+        """
+        The configuration of a board's pieces, with the pieces in configuration order.
+        Returns (configuration, pieces).
+        """
+        pieces = [piece for piece in board.squares if piece is not None]
+        config = cls((piece.color, piece.kind, piece.tier) for piece in pieces)
+        pieces.sort(key=lambda piece: (COLORS.index(piece.color), piece.kind != KING, piece.kind, piece.tier))
+        return config, pieces
+
+    def without(self, index):
+        return Configuration(self.pieces[:index] + self.pieces[index + 1:])
+
+    def only_kings(self):
+        return len(self.pieces) == 2
+
+    def has_kings(self):
+        return sum(1 for _, kind, _ in self.pieces if kind == KING) == 2
+
+    def index(self, side, states):
+        """
+        Slot of a state: side to move (0 white, 1 black) and (square, moved, cooldown) per piece.
+        """
+        index = side
+        for (has_moved_flag, cooldowns), (sq, moved, cooldown) in zip(self.dims, states):
+            index = index * 64 + sq
+            if has_moved_flag:
+                index = index * 2 + moved
+            if cooldowns > 1:
+                index = index * cooldowns + cooldown
+        return index
+
+    def state(self, index):
+        """
+        Inverse of index(): (side, [(square, moved, cooldown), ...]).
+        """
+        states = []
+        for has_moved_flag, cooldowns in reversed(self.dims):
+            cooldown = moved = 0
+            if cooldowns > 1:
+                index, cooldown = divmod(index, cooldowns)
+            if has_moved_flag:
+                index, moved = divmod(index, 2)
+            index, sq = divmod(index, 64)
+            states.append((sq, moved, cooldown))
+        states.reverse()
+        return index, states
+
+    def board_state(self, board, pieces):
+        """
+        Slot of a board position whose pieces are in configuration order, or None if a piece's
+        abilities or cooldown fall outside the table (e.g. a cooldown started before an upgrade
+        shortened it).
+        """
+        states = []
+        for (color, kind, tier), piece, (_, cooldowns) in zip(self.pieces, pieces, self.dims):
+            if piece.unlocked != min(tier, len(piece.abilities)):
+                return None
+            cooldown = 0
+            if piece.timed_ability is not None:
+                cooldown = max(piece.cooldown_remaining(piece.timed_ability, board), 0)
+                if cooldown >= cooldowns:
+                    return None
+            states.append((piece.square(), int(piece.has_moved), cooldown))
+        return self.index(COLORS.index(board.current_turn), states)
+
+# ---
+
+_worker_state = {}  # Per process: configuration name -> (Configuration, Board, pieces, sub-configurations)
+
+def _setup(name):
+    cached = _worker_state.get(name)
+    if cached is None:
+        config = Configuration.parse(name)
+        board = Board("8/8/8/8/8/8/8/8 w - - 0 1")
+        pieces = [new_piece(*spec) for spec in config.pieces]
+        subs = [config.without(index) for index in range(len(config.pieces))]
+        cached = _worker_state[name] = (config, board, pieces, subs)
+    return cached
+
+def generate_chunk(name, start, stop):
+    """
+    Play every legal move of states [start, stop). Returns numpy arrays:
+    status (INVALID/UNKNOWN, or LOSS for mated and DRAWN for stalemated states),
+    internal edges (owner, target) and capture edges (owner, captured piece, slot in the
+    configuration without it).
+    """
+    config, board, pieces, subs = _setup(name)
+    status = np.full(stop - start, UNKNOWN, dtype=np.int8)
+    owners, targets = [], []
+    capture_owners, captured_pieces, capture_targets = [], [], []
+
+    for index in range(start, stop):
+        side, states = config.state(index)
+        squares = [sq for sq, _, _ in states]
+        if len(set(squares)) != len(squares):
+            status[index - start] = INVALID
+            continue
+
+        for piece in pieces:
+            if piece.position is not None and board.squares[piece.square()] is piece:
+                board.remove_piece(piece.position)
+        for piece, (sq, moved, cooldown), (has_moved_flag, cooldowns) in zip(pieces, states, config.dims):
+            piece.has_moved = bool(moved)
+            piece.cooldown_until = BASE_MOVE_COUNT + cooldown if cooldowns > 1 else None
+            if piece.invulnerable_until:
+                piece.invulnerable_until = 0
+            board.place_piece(piece, SQUARE_POSITIONS[sq])
+        board.current_turn = COLORS[side]
+        board.move_count = BASE_MOVE_COUNT
+        board.move_cache.clear()
+        board.timers.clear()
+        for piece in pieces:
+            board.schedule_timers(piece)
+
+        if board.check_info(COLORS[1 - side])[0]:
+            status[index - start] = INVALID  # The side that just moved can't be in check
+            continue
+
+        moves = list(board.legal_moves())
+        if not moves:
+            status[index - start] = LOSS if board.is_check() else DRAWN
+            continue
+        for move in moves:
+            undo = board.make_move(move)
+            captured = undo[2]
+            next_states = []
+            for piece, (has_moved_flag, cooldowns) in zip(pieces, config.dims):
+                if piece is captured:
+                    continue
+                cooldown = max(piece.cooldown_until - board.move_count, 0) if cooldowns > 1 else 0
+                next_states.append((piece.square(), int(piece.has_moved), cooldown))
+            if captured is None:
+                owners.append(index)
+                targets.append(config.index(1 - side, next_states))
+            else:
+                captured_index = pieces.index(captured)
+                capture_owners.append(index)
+                captured_pieces.append(captured_index)
+                capture_targets.append(subs[captured_index].index(1 - side, next_states))
+            board.unmake_move(undo)
+
+    return (status, np.array(owners, dtype=np.int64), np.array(targets, dtype=np.int64),
+            np.array(capture_owners, dtype=np.int64), np.array(captured_pieces, dtype=np.int64),
+            np.array(capture_targets, dtype=np.int64))
+
+def decode(values):
+    """
+    Table bytes -> (status, plies) arrays.
+    """
+    values = np.asarray(values)
+    status = np.where(values == ILLEGAL, INVALID, np.where(values == DRAW, DRAWN, np.where(values % 2 == 0, WIN, LOSS)))
+    return status.astype(np.int8), np.where((values == DRAW) | (values == ILLEGAL), 0, values.astype(np.int32) - 1)
+
+def solve(size, status, owners, targets, capture_owners, capture_status, capture_plies):
+    """
+    Retrograde solver over the move graph. Returns (status, plies) per state; states still
+    unresolved once a ply past the longest capture result changes nothing are drawn.
+    """
+    plies = np.zeros(size, dtype=np.int32)
+    out_degree = np.bincount(owners, minlength=size) + np.bincount(capture_owners, minlength=size)
+    longest_capture = int(capture_plies.max(initial=0))
+
+    # Captures into solved configurations: their results are known from the start
+    capture_wins = np.bincount(capture_owners[capture_status == WIN], minlength=size)
+    capture_win_plies = np.zeros(size, dtype=np.int32)
+    np.maximum.at(capture_win_plies, capture_owners[capture_status == WIN], capture_plies[capture_status == WIN])
+
+    ply = 0
+    quiet = 0
+    while quiet < 2 or ply <= longest_capture + 1:
+        ply += 1
+        unknown = status == UNKNOWN
+        target_status = status[targets]
+        if ply % 2:
+            # Won in `ply`: some move reaches a position lost in ply - 1
+            hits = (target_status == LOSS) & (plies[targets] == ply - 1)
+            found = np.bincount(owners[hits], minlength=size) > 0
+            capture_hits = (capture_status == LOSS) & (capture_plies == ply - 1)
+            found |= np.bincount(capture_owners[capture_hits], minlength=size) > 0
+            found &= unknown
+            status[found] = WIN
+        else:
+            # Lost in `ply`: every move reaches a won position, the longest won in ply - 1
+            wins = np.bincount(owners[target_status == WIN], minlength=size) + capture_wins
+            found = unknown & (wins == out_degree) & (capture_win_plies <= ply - 1)
+            status[found] = LOSS
+        plies[found] = ply
+        quiet = 0 if found.any() else quiet + 1
+        if not quiet and ply > MAX_PLIES:
+            raise ValueError(f"Mates longer than {MAX_PLIES} plies don't fit the table format")
+
+    status[status == UNKNOWN] = DRAWN
+    return status, plies
+
+def generate(name, directory, workers=None, log=print):
+    """
+    Generate the table for a configuration (and any missing ones it captures into) into
+    `directory`. Returns the table's path.
+    """
+    config = Configuration.parse(name)
+    path = os.path.join(directory, config.name + ".cvtb")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    subs = [config.without(index) for index in range(len(config.pieces))]
+    for sub in subs:
+        if sub.has_kings() and not sub.only_kings():
+            generate(sub.name, directory, workers, log)
+
+    start = time.perf_counter()
+    chunks = [(start_index, min(start_index + CHUNK_SIZE, config.size)) for start_index in range(0, config.size, CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = list(executor.map(generate_chunk, [config.name] * len(chunks),
+                                    [chunk[0] for chunk in chunks], [chunk[1] for chunk in chunks]))
+    status = np.concatenate([result[0] for result in results])
+    owners = np.concatenate([result[1] for result in results])
+    targets = np.concatenate([result[2] for result in results])
+    capture_owners = np.concatenate([result[3] for result in results])
+    captured_pieces = np.concatenate([result[4] for result in results])
+    capture_targets = np.concatenate([result[5] for result in results])
+    generated = time.perf_counter() - start
+
+    # Results of the captures, from the configurations they lead into
+    capture_status = np.full(len(capture_owners), DRAWN, dtype=np.int8)
+    capture_plies = np.zeros(len(capture_owners), dtype=np.int32)
+    for index, sub in enumerate(subs):
+        selected = captured_pieces == index
+        if not selected.any() or sub.only_kings() or not sub.has_kings():
+            continue  # Down to the bare kings (or a king was "captured", which legal play never does)
+        table = Tablebase(os.path.join(directory, sub.name + ".cvtb"))
+        capture_status[selected], capture_plies[selected] = decode(np.asarray(table.values)[capture_targets[selected]])
+        table.close()
+
+    illegal = status == INVALID
+    status, plies = solve(config.size, status, owners, targets, capture_owners, capture_status, capture_plies)
+    values = np.where(status == DRAWN, DRAW, plies + 1).astype(np.uint8)
+    values[illegal] = ILLEGAL
+
+    encoded = config.name.encode("ascii")
+    with open(path, "wb") as out:
+        out.write(MAGIC + bytes([len(encoded)]) + encoded)
+        out.write(values.tobytes())
+    legal = ~illegal
+    log(f"{config.name}: {config.size:,} states ({legal.sum():,} legal), {len(owners) + len(capture_owners):,} moves; "
+        f"won {(legal & (status == WIN)).sum():,}, lost {(legal & (status == LOSS)).sum():,}, "
+        f"drawn {(legal & (status == DRAWN)).sum():,}; longest mate {plies[legal].max(initial=0)} plies; "
+        f"{generated:.1f}s moves + {time.perf_counter() - start - generated:.1f}s solving")
+    return path
+
+# ---
+
+class Tablebase:
+    """
+    One memory-mapped table file.
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Chessvania tablebase")
+        length = self.data[len(MAGIC)]
+        offset = len(MAGIC) + 1
+        self.config = Configuration.parse(self.data[offset:offset + length].decode("ascii"))
+        self.offset = offset + length
+        self.values = memoryview(self.data)[self.offset:]
+
+    def value(self, index):
+        return self.values[index]
+
+    def close(self):
+        self.values.release()
+        self.data.close()
+        self.file.close()
+
+class Tablebases:
+    """
+    The tables in a directory, opened on first use. probe() and best_move() are what the
+    engine and the self-play runner call.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}  # Configuration name -> Tablebase, or None when there is no file
+
+    def table(self, name):
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + ".cvtb")
+            self.tables[name] = Tablebase(path) if os.path.exists(path) else None
+        return self.tables[name]
+
+    def probe(self, board):
+        """
+        ("win" | "loss" | "draw", plies to mate) for the side to move, or None when the
+        position isn't covered.
+        """
+        if board.occupied.bit_count() > 6:
+            return None  # Cheap exit before building a configuration name
+        config, pieces = Configuration.of_board(board)
+        if config.only_kings():
+            return "draw", 0
+        table = self.table(config.name)
+        if table is None:
+            return None
+        index = config.board_state(board, pieces)
+        if index is None:
+            return None
+        value = table.value(index)
+        if value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return "draw", 0
+        return ("win" if value % 2 == 0 else "loss"), value - 1
+
+    def best_move(self, board):
+        """
+        The move that keeps the best result: the fastest win, a draw, or the longest loss.
+        None when the position isn't covered.
+        """
+        result = self.probe(board)
+        if result is None:
+            return None
+        best, best_rank = None, None
+        for move in list(board.legal_moves()):
+            undo = board.make_move(move)
+            reply = self.probe(board)
+            board.unmake_move(undo)
+            if reply is None:
+                continue
+            outcome, plies = reply
+            # Lower is better for the mover: opponent lost fast, then draws, then opponent wins slowly
+            rank = (0, plies) if outcome == "loss" else (1, 0) if outcome == "draw" else (2, -plies)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = move, rank
+        return best
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables = {}
+
+_open_tablebases = {}
+
+def open_tablebases(directory):
+    """
+    Shared Tablebases per directory for this process.
+    """
+    tablebases = _open_tablebases.get(directory)
+    if tablebases is None:
+        tablebases = _open_tablebases[directory] = Tablebases(directory)
+    return tablebases
+
+# ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Chessvania endgame tablebases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate", help="generate tables for configurations such as KN5vK")
+    generate_parser.add_argument("configurations", nargs="+")
+    generate_parser.add_argument("--directory", default="tablebases")
+    generate_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    probe_parser = commands.add_parser("probe", help="look up a position and its best move")
+    probe_parser.add_argument("fen")
+    probe_parser.add_argument("--directory", default="tablebases")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        for name in args.configurations:
+            generate(name, args.directory, args.workers)
+        return 0
+
+    board = Board(args.fen)
+    tablebases = Tablebases(args.directory)
+    result = tablebases.probe(board)
+    if result is None:
+        print("Position not covered by the tablebases.")
+        return 1
+    outcome, plies = result
+    move = tablebases.best_move(board)
+    notation = board.pos_to_notation(move[0]) + board.pos_to_notation(move[1]) if move else "-"
+    print(f"{board.current_turn} to move: {outcome}" + (f" in {plies} plies" if outcome != "draw" else "") + f", best move {notation}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
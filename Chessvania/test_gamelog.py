@@ -0,0 +1,36 @@
+from board import Board
+from gamelog import MAGIC, GameLogWriter, GameRecorder, encode_record, export_pgn, import_pgn, read_games
+
+def write_log(path, extra=b""):
+    board = Board()
+    recorder = GameRecorder(board)
+    move = ((6, 4), (4, 4))
+    board.make_move(move)
+    recorder.record_move(board, move)
+    with GameLogWriter(path) as writer:
+        writer.append(recorder.finish("1-0", "quit"))
+    with open(path, "ab") as file:
+        file.write(extra)
+
+def test_truncated_length_prefix_alone(tmp_path):
+    path = tmp_path / "games.cvgl"
+    path.write_bytes(MAGIC + b"\x80")
+    assert list(read_games(str(path))) == []
+
+def test_truncated_length_prefix_after_a_game(tmp_path):
+    path = str(tmp_path / "games.cvgl")
+    write_log(path, b"\xff\xff")
+    records = list(read_games(path))
+    assert [record.result for record in records] == ["1-0"]
+
+def test_foreign_termination_survives_a_log_round_trip(tmp_path):
+    pgn = '[Event "Casual"]\n[Termination "time forfeit"]\n[Result "1-0"]\n\n1. e2e4 e7e5 1-0\n'
+    record = next(import_pgn(pgn))
+    assert record.reason == ""
+    path = str(tmp_path / "games.cvgl")
+    with GameLogWriter(path) as writer:
+        writer.append(encode_record(record))
+    restored = next(read_games(path))
+    assert restored.result == "1-0"
+    assert restored.tags["Termination"] == "time forfeit"
+    assert '[Termination "time forfeit"]' in export_pgn(restored)
@@ -0,0 +1,18 @@
+import argparse
+import asyncio
+
+from loadtest import run_load
+
+def options(players, duration):
+    return argparse.Namespace(players=players, duration=duration, think_ms=0, upgrade_rate=0.02,
+                              ability_rate=0.5, reconnect_rate=0.005, max_plies=200, seed=0, connect=None)
+
+def test_unpaired_player_finishes_at_the_deadline():
+    report = asyncio.run(asyncio.wait_for(run_load(options(1, 0.5)), 10))
+    assert report["player_failures"] == 0
+    assert report["moves"] == 0
+
+def test_odd_player_count_finishes_at_the_deadline():
+    report = asyncio.run(asyncio.wait_for(run_load(options(3, 1)), 10))
+    assert report["player_failures"] == 0
+    assert report["moves"] > 0
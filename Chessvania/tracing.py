@@ -0,0 +1,102 @@
+# tracing.py
+
+# Structured tracing with named categories, replacing the old per-call DEBUG prints.
+# Call sites guard every event with the category flag:
+#
+#     if tracer.movegen: tracer.event("movegen", "valid_moves", piece=name, moves=moves)
+#
+# so a disabled category costs one attribute check -- no string formatting, no I/O.
+# Events are (time, category, name, fields) tuples kept in a ring buffer; sampling keeps
+# one event in every N, and echo mode also prints them as they arrive.
+#
+# Enable from the environment (CHESSVANIA_TRACE=movegen,abilities or =all,
+# CHESSVANIA_TRACE_SAMPLE=10, CHESSVANIA_TRACE_ECHO=1) or call tracer.configure().
+
+import os
+import sys
+import time
+from collections import deque
+
+CATEGORIES = ("movegen", "abilities", "cooldowns", "input")
+
+class Tracer:
+    def __init__(self, capacity=4096):
+        self.movegen = False
+        self.abilities = False
+        self.cooldowns = False
+        self.input = False
+        self.events = deque(maxlen=capacity)
+        self.sample_every = 1  # Keep one event in every N (1 keeps them all)
+        self.echo = False  # Also print each kept event to stderr
+        self._seen = 0
+
+    def configure(self, categories=None, sample_every=None, echo=None, capacity=None):
+        """
+        Enable the given categories (comma-separated string or list; "all" or "none"
+        are accepted) and adjust sampling, echo and buffer size. None leaves a setting alone.
+        """
+        if categories is not None:
+            if isinstance(categories, str):
+                categories = [name.strip() for name in categories.split(",") if name.strip()]
+            if "all" in categories:
+                categories = CATEGORIES
+            for name in categories:
+                if name not in CATEGORIES and name != "none":
+                    raise ValueError(f"Unknown trace category: {name} (choose from {', '.join(CATEGORIES)})")
+            for name in CATEGORIES:
+                setattr(self, name, name in categories)
+        if sample_every is not None:
+            self.sample_every = max(1, int(sample_every))
+        if echo is not None:
+            self.echo = bool(echo)
+        if capacity is not None:
+            self.events = deque(self.events, maxlen=capacity)
+
+    def configure_from_env(self, environ=None):
+        environ = os.environ if environ is None else environ
+        self.configure(
+            categories=environ.get("CHESSVANIA_TRACE"),
+            sample_every=environ.get("CHESSVANIA_TRACE_SAMPLE"),
+            echo=environ.get("CHESSVANIA_TRACE_ECHO", "") not in ("", "0") or None,
+        )
+
+    def enabled(self):
+        """
+        Names of the categories currently enabled.
+        """
+        return [name for name in CATEGORIES if getattr(self, name)]
+
+    def event(self, category, name, **fields):
+        """
+        Record one event. Callers check the category flag first, so this only runs when tracing.
+        """
+        if self.sample_every > 1:
+            self._seen += 1
+            if self._seen % self.sample_every:
+                return
+        record = (time.perf_counter(), category, name, fields)
+        self.events.append(record)
+        if self.echo:
+            print(format_event(record), file=sys.stderr)
+
+    def recent(self, count=None, category=None):
+        """
+        Return the most recent events (optionally only one category), oldest first.
+        """
+        events = [record for record in self.events if category is None or record[1] == category]
+        return events if count is None else events[-count:]
+
+    def clear(self):
+        self.events.clear()
+        self._seen = 0
+
+def format_event(record):
+    """
+    Render an event as a single readable line.
+    """
+    timestamp, category, name, fields = record
+    details = " ".join(f"{key}={value}" for key, value in fields.items())
+    return f"[{timestamp:.6f}] {category}.{name} {details}".rstrip()
+
+tracer = Tracer()
+tracer.configure_from_env()
@@ -0,0 +1,238 @@
+# uci_bridge.py
+
+# Pooled asynchronous bridge to external UCI engines (e.g. Stockfish) for standard-rules
+# positions. A fixed number of long-lived engine processes serve queued requests
+# concurrently, and (FEN, depth) results are cached with LRU eviction.
+#
+# Example:
+#   async with EngineBridge(["stockfish"], pool_size=4) as bridge:
+#       bestmove, score = await bridge.analyse(board, depth=12)
+
+import asyncio
+from collections import OrderedDict
+
+class UCIEngineError(Exception):
+    """
+    Raised when an engine process dies or answers something unexpected.
+    """
+    pass
+
+def standard_fen(board):
+    """
+    Return the board's FEN for a UCI engine. Raises ValueError if any Chessvania-only
+    state (upgrades, cooldowns, invulnerability) is present, since a standard engine
+    cannot understand it.
+    """
+    fields = board.fen().split()
+    if len(fields) > 6:
+        raise ValueError("Position has Chessvania upgrades; a UCI engine can't analyse it")
+    return " ".join(fields)
+
+def uci_to_move(uci_move):
+    """
+    Convert a UCI move such as "e2e4" to a ((row, col), (row, col)) move for Board.
+    """
+    columns = "abcdefgh"
+    from_pos = (8 - int(uci_move[1]), columns.index(uci_move[0]))
+    to_pos = (8 - int(uci_move[3]), columns.index(uci_move[2]))
+    return from_pos, to_pos
+
+def parse_score(info_line):
+    """
+    Extract ("cp", n) or ("mate", n) from a UCI "info" line, or None if it has no score.
+    """
+    tokens = info_line.split()
+    if "score" not in tokens:
+        return None
+    index = tokens.index("score")
+    try:
+        return tokens[index + 1], int(tokens[index + 2])
+    except (IndexError, ValueError):
+        return None
+
+# ---
+
+class EngineProcess:
+    """
+    One long-lived UCI engine subprocess driven over stdin/stdout.
+    """
+    def __init__(self, command, options=None):
+        self.command = command
+        self.options = options or {}
+        self.process = None
+
+    async def start(self, timeout):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        await self.send("uci")
+        await asyncio.wait_for(self.read_until("uciok"), timeout)
+        for name, value in self.options.items():
+            await self.send(f"setoption name {name} value {value}")
+        await self.send("isready")
+        await asyncio.wait_for(self.read_until("readyok"), timeout)
+
+    async def send(self, line):
+        if self.process is None or self.process.stdin is None:
+            raise UCIEngineError("Engine process is not running")
+        self.process.stdin.write((line + "\n").encode())
+        await self.process.stdin.drain()
+
+    async def read_line(self):
+        line = await self.process.stdout.readline()
+        if not line:
+            raise UCIEngineError(f"Engine {self.command[0]} exited unexpectedly")
+        return line.decode().strip()
+
+    async def read_until(self, prefix):
+        """
+        Read lines until one starts with `prefix`; returns (that line, lines before it).
+        """
+        lines = []
+        while True:
+            line = await self.read_line()
+            if line.startswith(prefix):
+                return line, lines
+            lines.append(line)
+
+    async def analyse(self, fen, depth):
+        """
+        Search a position to the given depth. Returns (bestmove, score).
+        """
+        await self.send(f"position fen {fen}")
+        await self.send(f"go depth {depth}")
+        bestmove_line, info_lines = await self.read_until("bestmove")
+
+        score = None
+        for line in info_lines:
+            if line.startswith("info"):
+                score = parse_score(line) or score
+        tokens = bestmove_line.split()
+        bestmove = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+        return bestmove, score
+
+    async def close(self):
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            try:
+                await self.send("quit")
+                await asyncio.wait_for(self.process.wait(), 1.0)
+            except (UCIEngineError, ConnectionError, asyncio.TimeoutError):
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
+
+    async def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        self.process = None
+
+# ---
+
+class EngineBridge:
+    """
+    Pool of `pool_size` engine processes behind a request queue.
+    analyse() waits for an idle engine, so at most pool_size searches run at once and
+    the rest queue up. Identical requests in flight share one search, and finished
+    results are kept in an LRU cache of `cache_size` entries.
+    """
+    def __init__(self, command, pool_size=2, cache_size=4096, timeout=30.0, options=None):
+        self.command = list(command)
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.options = options or {}
+        self.cache = OrderedDict()  # (position, depth) -> (bestmove, score)
+        self.pending = {}  # (position, depth) -> Future shared by concurrent identical requests
+        self.idle = None
+        self.engines = []
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        self.idle = asyncio.Queue()
+        self.engines = [EngineProcess(self.command, self.options) for _ in range(self.pool_size)]
+        await asyncio.gather(*(engine.start(self.timeout) for engine in self.engines))
+        for engine in self.engines:
+            self.idle.put_nowait(engine)
+
+    async def close(self):
+        await asyncio.gather(*(engine.close() for engine in self.engines))
+        self.engines = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def analyse(self, position, depth):
+        """
+        Analyse a Board (or a FEN string) to `depth`. Returns (bestmove, score) where
+        bestmove is a UCI string like "e2e4" (None if there is no move) and score is
+        ("cp", n), ("mate", n) or None.
+        """
+        fen = position if isinstance(position, str) else standard_fen(position)
+        # The move counters don't change the analysis, so they aren't part of the key
+        key = (" ".join(fen.split()[:4]), depth)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        if key in self.pending:
+            self.hits += 1
+            return await asyncio.shield(self.pending[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            result = await self._run(fen, depth)
+        except BaseException as error:
+            if not future.done():
+                future.set_exception(error)
+                future.exception()  # Mark retrieved so an unawaited future doesn't warn
+            raise
+        finally:
+            del self.pending[key]
+
+        future.set_result(result)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    async def analyse_many(self, positions, depth):
+        """
+        Analyse several positions concurrently across the pool; results keep input order.
+        """
+        return await asyncio.gather(*(self.analyse(position, depth) for position in positions))
+
+    async def _run(self, fen, depth):
+        engine = await self.idle.get()
+        try:
+            result = await asyncio.wait_for(engine.analyse(fen, depth), self.timeout)
+        except BaseException:
+            # Stuck, gone, or cancelled mid-search (then it is still thinking about this
+            # position): replace it so the pool stays at full size. Shielded, so a second
+            # cancellation can't stop the replacement reaching the idle queue.
+            await asyncio.shield(self._replace(engine))
+            raise
+        self.idle.put_nowait(engine)
+        return result
+
+    async def _replace(self, engine):
+        replacement = EngineProcess(self.command, self.options)
+        self.engines[self.engines.index(engine)] = replacement
+        try:
+            await engine.kill()
+            await replacement.start(self.timeout)
+        finally:
+            self.idle.put_nowait(replacement)
@@ -0,0 +1,70 @@
+# zobrist.py
+
+# 64-bit Zobrist keys for Board positions. Besides piece placement and side to move, the key
+# covers the Chessvania state that changes what a piece can do: its upgrade tier and unlocked
+# abilities, the remaining cooldown of each timed ability and remaining Knight invulnerability.
+
+import random
+
+from piece import PAWN
+
+_rng = random.Random(0xC4E55)  # Fixed seed so every process (and every saved book/table) agrees on the keys
+
+COLOR_INDEX = {"white": 0, "black": 1}
+TIER_COUNT = 6  # Tier 0 is un-upgraded, 1..5 are rare..legendary
+MAX_TIMER_BUCKET = 7  # Remaining cooldown/invulnerability is hashed in buckets 1..7 (0 means ready)
+
+# Abilities whose cooldown is part of the position
+TIMED_ABILITIES = ["super_rare_diagonal", "super_rare_invulnerability"]
+
+def _random_keys(count):
+    return [_rng.getrandbits(64) for _ in range(count)]
+
+PIECE_KEYS = [[[_random_keys(64) for _ in range(TIER_COUNT)] for _ in range(6)] for _ in range(2)]  # [color][kind][tier][sq]
+SIDE_KEY = _rng.getrandbits(64)  # XORed in when black is to move
+COOLDOWN_KEYS = {name: [[0] + _random_keys(MAX_TIMER_BUCKET) for _ in range(64)] for name in TIMED_ABILITIES}  # [name][sq][bucket]
+INVULNERABLE_KEYS = [[0] + _random_keys(MAX_TIMER_BUCKET) for _ in range(64)]  # [sq][bucket]
+MOVED_PAWN_KEYS = _random_keys(64)  # [sq], for a pawn whose has_moved flag differs from what its row implies
+UNLOCKED_KEYS = [_random_keys(64) for _ in range(TIER_COUNT)]  # [unlocked][sq], for abilities kept after a downgrade
+PAWN_START_ROWS = {"white": 6, "black": 1}
+
+def piece_key(piece, sq, board):
+    """
+    Key contribution of `piece` standing on square `sq`.
+    Returns (key, timed) where `timed` is True when the key depends on board.move_count
+    (an ability cooling down or invulnerability running), so it must be refreshed as moves pass.
+    """
+    key = PIECE_KEYS[COLOR_INDEX[piece.color]][piece.kind][piece.tier][sq]
+    timed = False
+
+    # A pawn back on its starting row (or an unmoved one off it) has different jump rights
+    if piece.kind == PAWN and piece.has_moved == (sq // 8 == PAWN_START_ROWS[piece.color]):
+        key ^= MOVED_PAWN_KEYS[sq]
+
+    # A downgraded piece keeps the abilities of its highest level
+    if piece.unlocked != piece.tier_unlocked:
+        key ^= UNLOCKED_KEYS[piece.unlocked][sq]
+
+    ability_name = piece.timed_ability
+    if ability_name is not None and piece.cooldown_until is not None:
+        remaining = piece.cooldown_remaining(ability_name, board)
+        if remaining > 0:
+            key ^= COOLDOWN_KEYS[ability_name][sq][min(remaining, MAX_TIMER_BUCKET)]
+            timed = True
+
+    remaining = piece.invulnerable_remaining(board)
+    if remaining > 0:
+        key ^= INVULNERABLE_KEYS[sq][min(remaining, MAX_TIMER_BUCKET)]
+        timed = True
+
+    return key, timed
+
+def compute_hash(board):
+    """
+    Compute a board's key from scratch (the Board keeps it updated incrementally).
+    """
+    key = SIDE_KEY if board.current_turn == "black" else 0
+    for sq, piece in enumerate(board.squares):
+        if piece is not None:
+            key ^= piece_key(piece, sq, board)[0]
+    return key